@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Git Timesheet Generator.
+
+Generates synthetic repositories (see ``synthetic_repos.py``) and times each
+stage of the pipeline separately, reporting the best wall time over a number
+of runs and the peak memory allocated by the stage (measured with
+tracemalloc in a separate run; peak RSS for the full CLI run). The
+in-process git backends are included when dulwich or pygit2 is installed.
+The ``[churn]`` stages read diff stats in the same git log pass; generate
+the repositories with ``--file-changes`` to give them diffs to count.
+
+Usage:
+    python benchmarks/run_benchmarks.py --repos 20 --commits 5000
+    python benchmarks/run_benchmarks.py --save before.json
+    python benchmarks/run_benchmarks.py --compare before.json
+    python benchmarks/run_benchmarks.py --file-changes
+
+Everything runs offline against local repositories.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from git_timesheet.git_utils import get_git_repos, get_git_log, iter_git_log, estimate_time_spent
+from git_timesheet.cache import load_commits, get_cached_git_log
+from git_timesheet.backends import available_backends, iter_backend_log
+from git_timesheet.formatters import format_timesheet
+from git_timesheet.estimation import EstimationRules
+
+from synthetic_repos import create_repos
+
+PRIMARY_AUTHOR = 'mcgarrah'
+
+def measure(func, repeat):
+    """Run func repeat times and return (best seconds, peak traced bytes, last result)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak, result
+
+def measure_cli(args, cwd, env):
+    """Run the CLI in a child process and return (seconds, peak RSS bytes)."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'git_timesheet.main'] + args, cwd=cwd, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status
+    if process.returncode != 0:
+        raise RuntimeError(f"CLI run failed with exit code {process.returncode}")
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return seconds, rss
+
+def run_benchmarks(base_dir, depth, repeat, work_dir):
+    """Time each pipeline stage against the repositories in base_dir."""
+    results = []
+
+    def record(stage, seconds, peak, items):
+        results.append({'stage': stage, 'seconds': seconds, 'peak_bytes': peak, 'items': items})
+        print(f"{stage:<28} {seconds * 1000:>10.1f} ms {peak / 2 ** 20:>10.1f} MiB {items:>10}")
+
+    print(f"{'stage':<28} {'time':>13} {'peak memory':>14} {'items':>10}")
+
+    seconds, peak, repos = measure(lambda: get_git_repos(base_dir, max_depth=depth), repeat)
+    record('get_git_repos', seconds, peak, len(repos))
+
+    seconds, peak, logs = measure(lambda: [get_git_log(repo) for repo in repos], repeat)
+    record('get_git_log', seconds, peak, sum(len(log) for log in logs))
+
+    seconds, peak, commits = measure(lambda: [list(iter_git_log(repo)) for repo in repos], repeat)
+    record('iter_git_log', seconds, peak, sum(len(c) for c in commits))
+    plain_seconds = seconds
+
+    seconds, peak, churn_commits = measure(lambda: [list(iter_git_log(repo, churn=True)) for repo in repos], repeat)
+    record('iter_git_log[churn]', seconds, peak, sum(len(c) for c in churn_commits))
+    print(f"{'':<28} diff stats: {seconds / plain_seconds:.2f}x the plain log, "
+          f"{sum(commit.churn for c in churn_commits for commit in c)} lines changed")
+
+    for backend in available_backends()[1:]:
+        seconds, peak, backend_commits = measure(
+            lambda: [list(iter_backend_log(repo, backend=backend, date_range=(None, None))) for repo in repos], repeat)
+        record(f'iter_backend_log[{backend}]', seconds, peak, sum(len(c) for c in backend_commits))
+
+    cache_dir = os.path.join(work_dir, 'cache')
+    seconds, peak, loaded = measure(lambda: [load_commits(repo, refresh=True, cache_dir=cache_dir) for repo in repos],
+                                    repeat)
+    record('cache (cold)', seconds, peak, sum(len(c) for c in loaded))
+
+    seconds, peak, cached = measure(lambda: [get_cached_git_log(repo, cache_dir=cache_dir) for repo in repos],
+                                    repeat)
+    record('cache (warm)', seconds, peak, sum(len(c) for c in cached))
+
+    churn_cache_dir = os.path.join(work_dir, 'churn-cache')
+    seconds, peak, loaded = measure(lambda: [load_commits(repo, refresh=True, cache_dir=churn_cache_dir, churn=True)
+                                             for repo in repos], repeat)
+    record('cache (cold)[churn]', seconds, peak, sum(len(c) for c in loaded))
+
+    seconds, peak, cached = measure(lambda: [get_cached_git_log(repo, cache_dir=churn_cache_dir, churn=True)
+                                             for repo in repos], repeat)
+    record('cache (warm)[churn]', seconds, peak, sum(len(c) for c in cached))
+
+    def estimate(all_commits=commits, rules=None):
+        entries = []
+        for repo, repo_commits in zip(repos, all_commits):
+            entries.extend(estimate_time_spent(repo_commits, os.path.basename(repo), rules=rules))
+        entries.sort(key=lambda entry: entry.timestamp)
+        return entries
+
+    seconds, peak, entries = measure(estimate, repeat)
+    record('estimate_time_spent', seconds, peak, len(entries))
+
+    churn_rules = EstimationRules.with_defaults(churn_minutes=5)
+    seconds, peak, churn_entries = measure(lambda: estimate(churn_commits, churn_rules), repeat)
+    record('estimate_time_spent[churn]', seconds, peak, len(churn_entries))
+
+    for output_format in ['text', 'csv', 'markdown']:
+        seconds, peak, report = measure(
+            lambda: format_timesheet(entries, output_format, 'US/Eastern', PRIMARY_AUTHOR), repeat)
+        record(f'format_timesheet[{output_format}]', seconds, peak, report.count('\n') + 1)
+
+    # Full CLI run in a child process with an isolated home directory and no configuration
+    home = os.path.join(work_dir, 'home')
+    os.makedirs(home, exist_ok=True)
+    env = dict(os.environ, HOME=home, XDG_CACHE_HOME=os.path.join(home, '.cache'),
+               PYTHONPATH=os.pathsep.join([os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+                                           os.environ.get('PYTHONPATH', '')]))
+    cli_args = ['--base-dir', base_dir, '--max-depth', str(depth), '--author', PRIMARY_AUTHOR,
+                '--output-file', os.devnull]
+    cli_runs = [('cli (no cache)', ['--no-cache']), ('cli (warm cache)', []),
+                ('cli (no cache)[churn]', ['--no-cache', '--churn-minutes', '5'])]
+    cli_runs += [(f'cli ({backend})', ['--backend', backend]) for backend in available_backends()[1:]]
+    for stage, extra_args in cli_runs:
+        runs = [measure_cli(cli_args + extra_args, home, env) for _ in range(repeat)]
+        record(stage, min(run[0] for run in runs), max(run[1] for run in runs), sum(len(c) for c in commits))
+
+    return results
+
+def compare(results, baseline_path):
+    """Print the change of each stage against previously saved results."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result['stage']: result for result in json.load(f)['results']}
+
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        before = baseline.get(result['stage'])
+        if not before or not before['seconds']:
+            continue
+        change = (result['seconds'] - before['seconds']) / before['seconds'] * 100
+        memory_change = ((result['peak_bytes'] - before['peak_bytes']) / before['peak_bytes'] * 100
+                         if before['peak_bytes'] else 0.0)
+        print(f"{result['stage']:<28} time {change:>+8.1f}%   memory {memory_change:>+8.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each stage of the ggts pipeline')
+    parser.add_argument('--repos', type=int, default=10, help='Number of synthetic repositories')
+    parser.add_argument('--commits', type=int, default=2000, help='Commits per repository')
+    parser.add_argument('--authors', type=int, default=3, help='Number of distinct authors')
+    parser.add_argument('--message-length', type=int, default=40, help='Typical commit subject length')
+    parser.add_argument('--depth', type=int, default=1, help='Directory depth of the repositories')
+    parser.add_argument('--file-changes', action='store_true',
+                        help='Rewrite a file in every commit, so the [churn] stages have diffs to count')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage (best is reported)')
+    parser.add_argument('--work-dir', help='Directory for generated repositories (default: temporary)')
+    parser.add_argument('--save', help='Write results to a JSON file')
+    parser.add_argument('--compare', help='Compare with results saved by a previous --save run')
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='ggts-bench-')
+    base_dir = os.path.join(work_dir, 'repos')
+    try:
+        if not os.path.exists(base_dir):
+            start = time.perf_counter()
+            create_repos(base_dir, args.repos, args.commits, args.authors, message_length=args.message_length,
+                         depth=args.depth, file_changes=args.file_changes)
+            print(f"Generated {args.repos} repositories x {args.commits} commits "
+                  f"in {time.perf_counter() - start:.1f}s\n")
+
+        results = run_benchmarks(base_dir, args.depth, args.repeat, work_dir)
+
+        if args.save:
+            with open(args.save, 'w', encoding='utf-8') as f:
+                json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        if args.compare:
+            compare(results, args.compare)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Synthetic git repository generator for benchmarks.
+
+Repositories are written with ``git fast-import`` so that histories with
+hundreds of thousands of commits can be created in seconds. Commits have
+empty trees; only the metadata ggts reads (dates, authors, subjects) is
+generated, unless file changes are requested for benchmarking diff stats.
+
+Usage:
+    python benchmarks/synthetic_repos.py /tmp/ggts-bench --repos 20 --commits 5000
+"""
+
+import os
+import random
+import argparse
+import subprocess
+
+WORDS = [
+    'update', 'parser', 'config', 'docs', 'tests', 'cache', 'login', 'api', 'schema', 'report',
+    'timezone', 'output', 'handler', 'client', 'server', 'build', 'release', 'typo', 'logging', 'ui',
+]
+
+# Words that trigger the time estimation keyword bonuses
+KEYWORDS = ['fix', 'bug', 'issue', 'feature', 'implement', 'add', 'refactor', 'clean', 'improve']
+
+# Gaps between consecutive commits, in seconds, mixing work sessions and breaks
+GAPS = [60, 300, 600, 900, 1800, 2700, 3600, 5400, 14400, 57600, 86400]
+
+START_TIMESTAMP = 1672531200  # 2023-01-01 00:00:00 UTC
+
+# With file changes, each commit rewrites one of this many files
+CHANGED_FILES = 20
+
+def make_authors(count):
+    """Return (name, email) pairs for synthetic authors; the first is the primary author."""
+    authors = [('Michael McGarrah', 'mcgarrah@example.com')]
+    for i in range(1, count):
+        authors.append((f'Developer {i}', f'dev{i}@example.com'))
+    return authors
+
+def make_message(rng, length):
+    """Return a commit subject of roughly the given length."""
+    words = [rng.choice(KEYWORDS)] if rng.random() < 0.6 else []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    message = ' '.join(words)
+    return message[:1].upper() + message[1:]
+
+def make_file(rng):
+    """Return the contents of a source file of a random number of lines."""
+    lines = [' '.join(rng.choice(WORDS) for _ in range(6)) for _ in range(rng.randint(1, 200))]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+def fast_import_stream(rng, commits, authors, primary_share, message_length, start_timestamp,
+                       file_changes=False):
+    """Yield a git fast-import stream for a linear history, optionally rewriting a file in each commit."""
+    timestamp = start_timestamp
+    for mark in range(1, commits + 1):
+        timestamp += rng.choice(GAPS)
+        if rng.random() < primary_share:
+            name, email = authors[0]
+        else:
+            name, email = rng.choice(authors[1:] or authors)
+        offset = rng.choice(['+0000', '-0400', '-0500', '+0100', '+0530'])
+        message = make_message(rng, rng.randint(max(1, message_length // 2), message_length * 2)).encode('utf-8')
+
+        yield b'commit refs/heads/main\n'
+        yield f'mark :{mark}\n'.encode('utf-8')
+        yield f'author {name} <{email}> {timestamp} {offset}\n'.encode('utf-8')
+        yield f'committer {name} <{email}> {timestamp} {offset}\n'.encode('utf-8')
+        yield f'data {len(message)}\n'.encode('utf-8') + message + b'\n'
+        if mark > 1:
+            yield f'from :{mark - 1}\n'.encode('utf-8')
+        if file_changes:
+            contents = make_file(rng)
+            yield f'M 100644 inline src/file{rng.randrange(CHANGED_FILES)}.txt\n'.encode('utf-8')
+            yield f'data {len(contents)}\n'.encode('utf-8') + contents + b'\n'
+        yield b'\n'
+
+def create_repo(path, commits, authors, primary_share=0.7, message_length=40, seed=0,
+                start_timestamp=START_TIMESTAMP, file_changes=False):
+    """Create a git repository with a synthetic linear history."""
+    os.makedirs(path, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', path], check=True)
+    subprocess.run(['git', 'symbolic-ref', 'HEAD', 'refs/heads/main'], cwd=path, check=True)
+
+    rng = random.Random(seed)
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=path, stdin=subprocess.PIPE)
+    for chunk in fast_import_stream(rng, commits, authors, primary_share, message_length, start_timestamp,
+                                    file_changes):
+        process.stdin.write(chunk)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f"git fast-import failed for {path}")
+
+def create_repos(base_dir, repos=10, commits=1000, authors=3, primary_share=0.7, message_length=40,
+                 depth=1, seed=0, file_changes=False):
+    """Create several synthetic repositories below base_dir and return their paths.
+
+    With ``depth`` greater than 1 the repositories are nested in
+    ``group*/`` directories, like an ``org/team/repo`` checkout layout.
+    """
+    author_list = make_authors(authors)
+    paths = []
+    for i in range(repos):
+        parts = [f'group{i % 3}'] * (depth - 1) + [f'repo{i:04d}']
+        path = os.path.join(base_dir, *parts)
+        create_repo(path, commits, author_list, primary_share, message_length, seed=seed + i,
+                    start_timestamp=START_TIMESTAMP + i * 37, file_changes=file_changes)
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic git repositories for benchmarking')
+    parser.add_argument('base_dir', help='Directory to create the repositories in')
+    parser.add_argument('--repos', type=int, default=10, help='Number of repositories')
+    parser.add_argument('--commits', type=int, default=1000, help='Commits per repository')
+    parser.add_argument('--authors', type=int, default=3, help='Number of distinct authors')
+    parser.add_argument('--primary-share', type=float, default=0.7,
+                        help='Fraction of commits made by the primary author')
+    parser.add_argument('--message-length', type=int, default=40, help='Typical commit subject length')
+    parser.add_argument('--depth', type=int, default=1, help='Directory depth of the repositories')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--file-changes', action='store_true', help='Rewrite a file in every commit')
+    args = parser.parse_args()
+
+    paths = create_repos(args.base_dir, args.repos, args.commits, args.authors, args.primary_share,
+                         args.message_length, args.depth, args.seed, args.file_changes)
+    print(f"Created {len(paths)} repositories with {args.commits} commits each in {args.base_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,11 @@ This allows existing code and tests to continue working with the new module stru
 """
 
 # Import functions from the new module structure
-from git_timesheet.git_utils import get_git_repos, get_git_log, estimate_time_spent
+from git_timesheet.git_utils import get_git_repos, get_git_log, iter_git_log, estimate_time_spent
 from git_timesheet.formatters import format_text, format_csv, format_markdown, format_timesheet
 from git_timesheet.timezone_utils import convert_to_timezone, get_timezone_abbr
 from git_timesheet.config import get_config
+from git_timesheet.models import TimeEntry
 from git_timesheet.cli import main
 
 # For backwards compatibility
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+asyncio collection engine.
+
+Each repository's ``git log`` runs as a child process started with
+``asyncio.create_subprocess_exec``, at most ``jobs`` at a time, and its
+output is parsed as it streams in. Every repository gets a deadline: a git
+that hangs (a locked repository, a huge pack on a slow network filesystem)
+is killed when the timeout expires and the repository is reported as
+skipped instead of blocking the whole run.
+
+``collect_time_entries_async`` is the coroutine counterpart of
+``collector.collect_time_entries``, and ``iter_repo_results`` streams the
+result of each repository as soon as it, and the repositories before it,
+are done. ``collect_entry_runs_async`` keeps each repository's entries as a
+sorted run for a lazy, bounded-memory merge (see ``merge``).
+"""
+import os
+import sys
+import time
+import asyncio
+import functools
+import subprocess
+
+from .git_utils import RecordSplitter, READ_CHUNK_SIZE, git_log_args, commit_from_fields, estimate_time_spent
+from .collector import collect_repo_entries, reads_churn, RepoResult
+from .cache import resolve_date_range
+from .merge import EntryRuns
+from .profiling import stage
+
+def default_jobs():
+    """Return the default number of repositories processed at once."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+async def aiter_git_records(repo_path, args, num_fields):
+    """Run a NUL-delimited git command and yield each record's fields as they arrive.
+
+    Raises ``subprocess.CalledProcessError`` once the output is exhausted if
+    git exited with an error. git is killed if the consumer stops early or
+    is cancelled, for example by a timeout.
+    """
+    cmd = ['git'] + args
+    process = await asyncio.create_subprocess_exec(*cmd, cwd=repo_path, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.DEVNULL)
+    splitter = RecordSplitter(num_fields)
+    try:
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            for fields in splitter.feed(chunk):
+                yield fields
+        for fields in splitter.close():
+            yield fields
+        if await process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+async def aiter_git_log(repo_path, since=None, until=None, author=None, churn=False):
+    """Stream parsed commits from git log for a repository without blocking the event loop."""
+    try:
+        async for fields in aiter_git_records(repo_path, git_log_args(since, until, author, churn), 5):
+            commit = commit_from_fields(fields, churn)
+            if commit is not None:
+                yield commit
+    except subprocess.CalledProcessError:
+        return
+    except Exception as e:
+        print(f"Error getting git log for {repo_path}: {e}", file=sys.stderr)
+
+async def collect_repo_entries_async(repo, since=None, until=None, author=None, session_timeout_minutes=60,
+                                     use_cache=False, refresh_cache=False, rules=None, profiler=None,
+                                     backend='git', date_range=None, timeout=None, by_author=False):
+    """Collect and estimate time entries for a single repository.
+
+    With the ``git`` backend and no cache, git log runs as an asyncio child
+    process. The commit cache and the in-process backends are synchronous,
+    so ``collect_repo_entries`` runs in a worker thread, with its git
+    commands stopped after ``timeout`` seconds.
+    """
+    if backend != 'git' or use_cache:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(
+            collect_repo_entries, repo, since, until, author, session_timeout_minutes, use_cache=use_cache,
+            refresh_cache=refresh_cache, rules=rules, profiler=profiler, backend=backend, date_range=date_range,
+            timeout=timeout, by_author=by_author))
+
+    # Coroutines interleave on one thread, so only wall time is recorded for reading
+    start = time.perf_counter()
+    commits = [commit async for commit in aiter_git_log(repo, since, until, author, reads_churn(rules))]
+    if profiler is not None:
+        profiler.add('git_log', repo, time.perf_counter() - start, items=len(commits))
+    with stage(profiler, 'estimate', repo) as timing:
+        time_entries = estimate_time_spent(commits, os.path.basename(repo), session_timeout_minutes, rules,
+                                           by_author)
+        timing.items = len(time_entries)
+    return time_entries
+
+async def iter_repo_results(repos, since=None, until=None, author=None, session_timeout_minutes=60, jobs=None,
+                            timeout=None, use_cache=False, refresh_cache=False, rules=None, profiler=None,
+                            backend='git', by_author=False):
+    """Collect repositories concurrently and yield a ``RepoResult`` for each, in the order of ``repos``.
+
+    At most ``jobs`` repositories are processed at once (``None`` or ``0``
+    picks a default based on the CPU count). A repository that takes longer
+    than ``timeout`` seconds is stopped and yielded with ``time_entries``
+    set to None and the reason in ``error``.
+    """
+    date_range = None
+    if backend != 'git' and repos:
+        date_range = resolve_date_range(repos[0], since, until, timeout)
+    semaphore = asyncio.Semaphore(jobs or default_jobs())
+
+    async def collect(repo):
+        async with semaphore:
+            try:
+                time_entries = await asyncio.wait_for(collect_repo_entries_async(
+                    repo, since, until, author, session_timeout_minutes, use_cache=use_cache,
+                    refresh_cache=refresh_cache, rules=rules, profiler=profiler, backend=backend,
+                    date_range=date_range, timeout=timeout, by_author=by_author), timeout)
+            except (asyncio.TimeoutError, subprocess.TimeoutExpired):
+                return RepoResult(repo, None, f"timed out after {timeout:g}s")
+            return RepoResult(repo, time_entries, None)
+
+    tasks = [asyncio.ensure_future(collect(repo)) for repo in repos]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        # Stop the remaining repositories, killing their git processes, if the caller stops early
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def collect_time_entries_async(repos, since=None, until=None, author=None, session_timeout_minutes=60,
+                                     jobs=None, timeout=None, progress=None, use_cache=False, refresh_cache=False,
+                                     rules=None, profiler=None, backend='git', by_author=False):
+    """Collect time entries from several repositories concurrently.
+
+    Returns ``(time_entries, skipped)``: the entries merged in the order of
+    ``repos``, as ``collect_time_entries`` returns them, and a
+    ``RepoResult`` for each repository skipped because it timed out.
+    ``progress`` is called with each repository name, in order, as its
+    results are merged. ``by_author`` estimates each author's commits
+    separately.
+    """
+    all_time_entries = []
+    skipped = await _collect_results(all_time_entries.extend, repos, since, until, author,
+                                     session_timeout_minutes, jobs, timeout, progress, use_cache, refresh_cache,
+                                     rules, profiler, backend, by_author)
+    return all_time_entries, skipped
+
+async def collect_entry_runs_async(repos, since=None, until=None, author=None, session_timeout_minutes=60,
+                                   jobs=None, timeout=None, progress=None, use_cache=False, refresh_cache=False,
+                                   rules=None, profiler=None, backend='git', by_author=False, memory_budget=None):
+    """Collect time entries from several repositories concurrently into ``merge.EntryRuns``.
+
+    Like ``collect_time_entries_async``, but returns ``(runs, skipped)``:
+    ``runs.merged()`` yields the entries in date order without holding
+    them in one list, and runs beyond ``memory_budget`` bytes are spilled
+    to temporary files as repositories finish.
+    """
+    runs = EntryRuns(memory_budget)
+    try:
+        skipped = await _collect_results(runs.add, repos, since, until, author, session_timeout_minutes, jobs,
+                                         timeout, progress, use_cache, refresh_cache, rules, profiler, backend,
+                                         by_author)
+    except BaseException:
+        runs.close()
+        raise
+    return runs, skipped
+
+async def _collect_results(add, repos, since, until, author, session_timeout_minutes, jobs, timeout, progress,
+                           use_cache, refresh_cache, rules, profiler, backend, by_author):
+    """Pass each repository's entries to ``add`` in the order of ``repos``; returns the skipped results."""
+    skipped = []
+    async for result in iter_repo_results(repos, since, until, author, session_timeout_minutes, jobs=jobs,
+                                          timeout=timeout, use_cache=use_cache, refresh_cache=refresh_cache,
+                                          rules=rules, profiler=profiler, backend=backend,
+                                          by_author=by_author):
+        if progress:
+            progress(os.path.basename(result.repo))
+        if result.time_entries is None:
+            skipped.append(result)
+        else:
+            add(result.time_entries)
+    return skipped
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+In-process git backends.
+
+``iter_git_log`` starts a ``git log`` process for every repository, and
+for short histories the process start-up dominates the run time. The
+backends here read the object database in-process with dulwich or pygit2
+(whichever is installed) and walk the history the way ``git log`` does:
+newest commit date first, pruning at commits older than ``--since``,
+skipping commits newer than ``--until`` and filtering on the author line
+with the same regular expression semantics. They yield the same ``Commit``
+records, in the same order, as ``iter_git_log``.
+
+Dates passed as ``since``/``until`` are resolved to timestamps with
+``git rev-parse`` once per run (see ``resolve_date_range``) so approxidate
+strings such as "2 weeks ago" mean exactly what they mean to git.
+"""
+import os
+import sys
+import heapq
+import struct
+from itertools import islice
+
+from .git_utils import Commit, author_matcher, iter_git_log
+
+BACKENDS = ('git', 'dulwich', 'pygit2')
+
+# git's minimum abbreviated hash length
+MIN_ABBREV = 7
+
+def available_backends():
+    """Return the backends that can be used in this environment."""
+    available = ['git']
+    for backend, module in (('dulwich', 'dulwich'), ('pygit2', 'pygit2')):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        available.append(backend)
+    return available
+
+def abbrev_length(object_count, configured=None):
+    """Return the abbreviated hash length git uses for a repository.
+
+    Mirrors git's automatic ``core.abbrev``: enough hex digits for the
+    approximate number of packed objects, and at least seven.
+    """
+    if configured is not None:
+        return max(4, min(40, configured))
+    return max(MIN_ABBREV, (object_count.bit_length() + 1) // 2)
+
+def unique_abbrev(hex_id, length, is_ambiguous):
+    """Abbreviate a hash to ``length`` digits, extended until no other object shares it, as git does.
+
+    ``is_ambiguous`` tells whether more than one object has a hex prefix.
+    """
+    while length < len(hex_id) and is_ambiguous(hex_id[:length]):
+        length += 1
+    return hex_id[:length]
+
+def parse_ident(ident):
+    """Split a raw ``Name <email>`` identity into name and email bytes."""
+    start = ident.find(b'<')
+    if start < 0:
+        return ident.strip(), b''
+    end = ident.find(b'>', start)
+    return ident[:start].rstrip(), ident[start + 1:end if end >= 0 else len(ident)]
+
+def format_subject(message):
+    """Return the subject of a raw commit message as ``git log --pretty=%s`` prints it.
+
+    Leading blank lines are skipped and the lines of the first paragraph are
+    joined with spaces.
+    """
+    lines = []
+    for line in message.split('\n'):
+        line = line.rstrip()
+        if not line:
+            if lines:
+                break
+            continue
+        lines.append(line)
+    return ' '.join(lines)
+
+def _decode(value, encoding):
+    """Decode a commit field like git re-encoding it to UTF-8 for log output."""
+    try:
+        return value.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return value.decode('utf-8', errors='replace')
+
+def walk_commits(head, read_commit, max_age=None, min_age=None, author=None):
+    """Walk a history newest first like ``git log`` and yield the selected commits.
+
+    ``read_commit`` maps a commit id to ``(commit_time, parents, record)``
+    where ``record`` is ``(author_time, author_offset, author, message,
+    encoding, hex_id)`` with ``author`` and ``message`` as raw bytes.
+    Commits older than ``max_age`` are not shown and their parents are not
+    visited, as git does without history limiting.
+    """
+    matches_author = author_matcher(author) if author else None
+    seen = {head}
+    counter = 0
+    commit_time, parents, record = read_commit(head)
+    queue = [(-commit_time, counter, parents, record)]
+    while queue:
+        negative_time, _, parents, record = heapq.heappop(queue)
+        commit_time = -negative_time
+        if max_age is not None and commit_time < max_age:
+            continue
+        for parent in parents:
+            if parent not in seen:
+                seen.add(parent)
+                counter += 1
+                parent_time, parent_parents, parent_record = read_commit(parent)
+                heapq.heappush(queue, (-parent_time, counter, parent_parents, parent_record))
+        if min_age is not None and commit_time > min_age:
+            continue
+        author_time, author_offset, ident, message, encoding, hex_id = record
+        name, email = parse_ident(ident)
+        author_name, author_email = _decode(name, encoding), _decode(email, encoding)
+        if matches_author and not matches_author(author_name, author_email):
+            continue
+        yield Commit(author_time, author_offset, author_name, author_email, format_subject(_decode(message, encoding)),
+                     hex_id)
+
+def count_packed_objects(git_dir):
+    """Return the number of objects in a repository's pack indexes."""
+    pack_dir = os.path.join(git_dir, 'objects', 'pack')
+    try:
+        names = os.listdir(pack_dir)
+    except OSError:
+        return 0
+    count = 0
+    for name in names:
+        if not name.endswith('.idx'):
+            continue
+        try:
+            with open(os.path.join(pack_dir, name), 'rb') as f:
+                header = f.read(8 + 256 * 4)
+        except OSError:
+            continue
+        # The last entry of the fan-out table is the object count; version 2
+        # indexes start with a magic number and version before the table
+        offset = 8 if header[:4] == b'\xfftOc' else 0
+        if len(header) >= offset + 256 * 4:
+            count += struct.unpack('>I', header[offset + 255 * 4:offset + 256 * 4])[0]
+    return count
+
+def read_shallow(git_dir):
+    """Return the hex ids of the shallow boundary commits of a repository."""
+    try:
+        with open(os.path.join(git_dir, 'shallow'), 'r', encoding='ascii') as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+def _iter_dulwich_log(repo_path, max_age, min_age, author):
+    """Yield commits of a repository read with dulwich."""
+    from dulwich.repo import Repo
+    from dulwich.errors import NotGitRepository
+
+    try:
+        repo = Repo.discover(repo_path)
+    except NotGitRepository:
+        return
+    try:
+        try:
+            head = repo.head()
+        except KeyError:
+            return
+        try:
+            configured = int(repo.get_config().get(b'core', b'abbrev'))
+        except (KeyError, ValueError):
+            configured = None
+        git_dir = repo.controldir()
+        length = abbrev_length(count_packed_objects(git_dir), configured)
+        shallow = {commit_id.encode('ascii') for commit_id in read_shallow(git_dir)}
+        object_store = repo.object_store
+
+        def is_ambiguous(prefix):
+            return next(islice(object_store.iter_prefix(prefix.encode('ascii')), 1, None), None) is not None
+
+        def read_commit(commit_id):
+            commit = object_store[commit_id]
+            encoding = commit.encoding.decode('ascii', errors='replace') if commit.encoding else None
+            record = (commit.author_time, commit.author_timezone, commit.author, commit.message, encoding,
+                      unique_abbrev(commit_id.decode('ascii'), length, is_ambiguous))
+            return commit.commit_time, () if commit_id in shallow else commit.parents, record
+
+        yield from walk_commits(head, read_commit, max_age, min_age, author)
+    finally:
+        repo.close()
+
+def _iter_pygit2_log(repo_path, max_age, min_age, author):
+    """Yield commits of a repository read with pygit2."""
+    import pygit2
+
+    git_dir = pygit2.discover_repository(repo_path)
+    if git_dir is None:
+        return
+    repo = pygit2.Repository(git_dir)
+    if repo.head_is_unborn:
+        return
+    try:
+        configured = repo.config.get_int('core.abbrev')
+    except (KeyError, ValueError, pygit2.GitError):
+        configured = None
+    length = abbrev_length(count_packed_objects(repo.path), configured)
+    shallow = read_shallow(repo.path)
+
+    def is_ambiguous(prefix):
+        try:
+            repo[prefix]
+        except ValueError:
+            return True
+        return False
+
+    def read_commit(commit_id):
+        commit = repo[commit_id]
+        signature = commit.author
+        hex_id = str(commit_id)
+        record = (signature.time, signature.offset * 60, signature.raw_name + b' <' + signature.raw_email + b'>',
+                  commit.raw_message, commit.message_encoding, unique_abbrev(hex_id, length, is_ambiguous))
+        return commit.commit_time, () if hex_id in shallow else commit.parent_ids, record
+
+    yield from walk_commits(repo.head.target, read_commit, max_age, min_age, author)
+
+_READERS = {
+    'dulwich': _iter_dulwich_log,
+    'pygit2': _iter_pygit2_log,
+}
+
+def iter_backend_log(repo_path, since=None, until=None, author=None, backend='git', date_range=None):
+    """Stream parsed commits for a repository using the given backend.
+
+    The ``git`` backend is ``iter_git_log``. For the in-process backends,
+    pass ``date_range`` as returned by ``resolve_date_range`` to avoid
+    resolving ``since``/``until`` with git again for every repository.
+    """
+    if backend == 'git':
+        yield from iter_git_log(repo_path, since, until, author)
+        return
+    if backend not in _READERS:
+        raise ValueError(f"Unknown git backend: {backend}")
+    if date_range is None:
+        from .cache import resolve_date_range
+        date_range = resolve_date_range(repo_path, since, until)
+    max_age, min_age = date_range
+
+    try:
+        yield from _READERS[backend](repo_path, max_age, min_age, author)
+    except ImportError:
+        raise
+    except Exception as e:
+        print(f"Error getting git log for {repo_path}: {e}", file=sys.stderr)
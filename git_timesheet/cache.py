@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Persistent per-repository commit cache.
+
+The full history reachable from HEAD is stored once per repository under
+``~/.cache/git-timesheet`` (or ``$XDG_CACHE_HOME/git-timesheet``) together
+with the HEAD commit it was built from. Later runs only ask git for the
+commits added since that tip, and apply the since/until/author filters in
+Python using the same rules as ``git log``. The whole history is stored
+even when only a short ``--since`` range is asked for, so a first run
+costs a full ``git log``, and every run reads the whole cache file.
+
+Diff stats are only read, in the same ``git log`` pass, once a run weights
+estimates by churn; from then on the repository's cache keeps them, and
+new commits are read with them too.
+"""
+import os
+import sys
+import json
+import heapq
+import hashlib
+import subprocess
+import threading
+from pathlib import Path
+
+from .git_utils import Commit, author_matcher, iter_git_records, parse_raw_date, split_shortstat
+
+CACHE_VERSION = 4
+
+# Full hash, abbreviated hash, committer timestamp, author date, author name,
+# author email, parent hashes and subject; the subject goes last so it may
+# contain anything. The author date is cached as its timestamp and UTC offset
+# in seconds, and each record ends with the commit's churn (null when stats
+# were not read) and the list of its parents.
+CACHE_LOG_FORMAT = '%H%x1f%h%x1f%ct%x1f%ad%x1f%an%x1f%ae%x1f%P%x1f%s'
+
+def get_cache_dir():
+    """Return the directory used to store cached git log data."""
+    base = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    return Path(base) / 'git-timesheet'
+
+def _cache_file(repo_path, cache_dir):
+    """Return the cache file used for a repository."""
+    key = hashlib.sha1(os.path.realpath(repo_path).encode('utf-8')).hexdigest()
+    return Path(cache_dir) / f'{key}.json'
+
+def _run_git(repo_path, args, timeout=None):
+    """Run a git command in a repository and return the completed process."""
+    return subprocess.run(['git'] + args, cwd=repo_path, capture_output=True, text=True, timeout=timeout)
+
+def get_head(repo_path, timeout=None):
+    """Return the commit hash HEAD points to, or None for an empty repository."""
+    result = _run_git(repo_path, ['rev-parse', '--verify', '-q', 'HEAD^{commit}'], timeout)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+def _read_commits(repo_path, rev_range=None, timeout=None, churn=False):
+    """Read commit records from git log, optionally limited to a revision range and with diff stats."""
+    cmd = ['log', '-z', f'--pretty=format:{CACHE_LOG_FORMAT}', '--date=raw']
+    if churn:
+        cmd.append('--shortstat')
+    if rev_range:
+        cmd.append(rev_range)
+    records = []
+    try:
+        for fields in iter_git_records(repo_path, cmd, 8, timeout):
+            try:
+                fields[3] = list(parse_raw_date(fields[3]))
+            except ValueError:
+                continue
+            fields[2] = int(fields[2])
+            parents = fields.pop(6).split()
+            if churn:
+                fields[6], lines = split_shortstat(fields[6])
+                fields.append(lines)
+            else:
+                fields.append(None)
+            fields.append(parents)
+            records.append(fields)
+    except subprocess.CalledProcessError:
+        return None
+    return records
+
+def _load(cache_path):
+    """Load a cache file, returning None if it is missing or unusable."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+        return None
+    return data
+
+def _save(cache_path, data):
+    """Atomically write a cache file."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+
+def load_commits(repo_path, refresh=False, cache_dir=None, timeout=None, churn=False):
+    """Return all commit records reachable from HEAD, updating the cache incrementally.
+
+    Cached records are reused when the cached tip is still HEAD. When HEAD
+    has moved forward, only the new commits are read from git; when history
+    was rewritten, or ``refresh`` is set, the cache is rebuilt from scratch.
+    With ``churn``, a cache built without diff stats is rebuilt with them.
+    Each git command is stopped after ``timeout`` seconds, raising
+    ``subprocess.TimeoutExpired``.
+    """
+    head = get_head(repo_path, timeout)
+    if head is None:
+        return []
+
+    cache_path = _cache_file(repo_path, cache_dir or get_cache_dir())
+    data = None if refresh else _load(cache_path)
+    if data and churn and not data['churn']:
+        data = None
+    if data:
+        churn = data['churn']
+
+    if data and data['tip'] == head:
+        return data['commits']
+
+    commits = None
+    if data:
+        is_ancestor = _run_git(repo_path, ['merge-base', '--is-ancestor', data['tip'], head], timeout)
+        if is_ancestor.returncode == 0:
+            new_commits = _read_commits(repo_path, f"{data['tip']}..{head}", timeout, churn)
+            if new_commits is not None:
+                # New commits, say from a merged branch, may fall between cached ones in git log order
+                commits = list(walk_since(new_commits + data['commits']))
+    if commits is None:
+        commits = _read_commits(repo_path, head, timeout, churn)
+        if commits is None:
+            return []
+
+    try:
+        _save(cache_path, {'version': CACHE_VERSION, 'repo': os.path.realpath(repo_path),
+                           'tip': head, 'churn': churn, 'commits': commits})
+    except OSError as e:
+        print(f"Warning: could not write git log cache for {repo_path}: {e}", file=sys.stderr)
+    return commits
+
+def resolve_date_range(repo_path, since=None, until=None, timeout=None):
+    """Resolve since/until to committer timestamps exactly as git log would."""
+    args = []
+    if since:
+        args.append(f'--since={since}')
+    if until:
+        args.append(f'--until={until}')
+    if not args:
+        return None, None
+
+    result = _run_git(repo_path, ['rev-parse'] + args, timeout)
+    max_age = min_age = None
+    for line in result.stdout.split('\n'):
+        if line.startswith('--max-age='):
+            max_age = int(line[len('--max-age='):])
+        elif line.startswith('--min-age='):
+            min_age = int(line[len('--min-age='):])
+    return max_age, min_age
+
+def walk_since(commits, max_age=None):
+    """Yield the records ``git log --since`` shows, in its order, from records starting with HEAD.
+
+    git walks the history newest first and stops following a line at its
+    first commit older than ``max_age``, so a later-dated commit behind it
+    (on a history with skewed clocks) is not shown. The walk is replayed
+    over the cached parents, as ``backends.walk_commits`` does over objects.
+    Without ``max_age`` every record is yielded, in ``git log`` order.
+    """
+    if not commits:
+        return
+    by_hash = {record[0]: record for record in commits}
+    head = commits[0]
+    seen = {head[0]}
+    counter = 0
+    queue = [(-head[2], counter, head)]
+    while queue:
+        record = heapq.heappop(queue)[2]
+        if max_age is not None and record[2] < max_age:
+            continue
+        for parent in record[8]:
+            parent_record = by_hash.get(parent)
+            # Parents beyond a shallow clone's boundary are not cached
+            if parent_record is not None and parent not in seen:
+                seen.add(parent)
+                counter += 1
+                heapq.heappush(queue, (-parent_record[2], counter, parent_record))
+        yield record
+
+def get_cached_git_log(repo_path, since=None, until=None, author=None, refresh=False, cache_dir=None,
+                       timeout=None, churn=False):
+    """Get commits for a repository, served from the on-disk cache.
+
+    Returns the same ``Commit`` records, in the same order, as ``iter_git_log``.
+    """
+    try:
+        commits = load_commits(repo_path, refresh=refresh, cache_dir=cache_dir, timeout=timeout, churn=churn)
+        max_age, min_age = resolve_date_range(repo_path, since, until, timeout)
+    except subprocess.TimeoutExpired:
+        raise
+    except Exception as e:
+        print(f"Error getting git log for {repo_path}: {e}", file=sys.stderr)
+        return []
+
+    if max_age is not None:
+        commits = walk_since(commits, max_age)
+    matches_author = author_matcher(author) if author else None
+    result = []
+    for _, short_hash, commit_time, (author_time, utc_offset), author_name, author_email, subject, lines, _ in commits:
+        if min_age is not None and commit_time > min_age:
+            continue
+        if matches_author and not matches_author(author_name, author_email):
+            continue
+        result.append(Commit(author_time, utc_offset, author_name, author_email, subject, short_hash,
+                             lines if churn else None))
+    return result
@@ -1,36 +1,226 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import click
+import time
+import asyncio
+import sqlite3
+import cProfile
 from pathlib import Path
+from contextlib import closing
 from datetime import datetime
 
-from .config import get_config
-from .git_utils import get_git_repos, get_git_log, estimate_time_spent
-from .formatters import format_timesheet
+from .config import get_config, get_estimation_rules
+from .git_utils import get_git_repos
+from .async_collector import collect_entry_runs_async, iter_repo_results
+from .backends import BACKENDS, available_backends
+from .estimation import SESSION_SCOPES, apportion_sessions
+from .profiling import Profiler, stage, timed_iter
+from .collector import collect_entry_runs, partition_by_author, reads_churn
+from .merge import EntrySections
+from .formatters import NO_ACTIVITY, write_timesheet, write_lines, iter_author_timesheets, iter_timesheet
+from . import store
+from .watcher import TimesheetWatcher
+from .server import ReportService, TimesheetServer
+from .cache import resolve_date_range
+from .report_cache import report_fingerprint, load_report, write_report, storing_report
 from . import __version__
 
-@click.command()
+OUTPUT_FORMATS = ['text', 'csv', 'markdown', 'md', 'json', 'ndjson']
+
+# Output formats of ``ggts watch`` output files, by extension
+OUTPUT_EXTENSIONS = {'.csv': 'csv', '.md': 'markdown', '.markdown': 'markdown', '.json': 'json', '.ndjson': 'ndjson',
+                     '.jsonl': 'ndjson'}
+
+# Extensions of the per-author files written with --output-dir, by format
+AUTHOR_FILE_EXTENSIONS = {'text': '.txt', 'csv': '.csv', 'markdown': '.md', 'md': '.md', 'json': '.json',
+                          'ndjson': '.ndjson'}
+
+# Options of the default command, shared with ``ggts generate``
+GENERATE_OPTIONS = [
+    click.option('--base-dir', help='Base directory containing git repositories (default: current directory)'),
+    click.option('--since', help='Show commits more recent than a specific date (e.g., "2 weeks ago")'),
+    click.option('--until', help='Show commits older than a specific date'),
+    click.option('--repos', multiple=True, help='Specific repository names to include (can be used multiple times)'),
+    click.option('--max-depth', type=click.IntRange(min=0), help='How many directory levels below the base directory to search for repositories (0 = unlimited)'),
+    click.option('--exclude', multiple=True, help='Glob pattern for directories to skip when searching for repositories (can be used multiple times)'),
+    click.option('--output', type=click.Choice(OUTPUT_FORMATS), 
+                 help='Output format (text, csv, markdown, md, json, or ndjson)'),
+    click.option('--rollups', is_flag=True, help='Add day and week total records to NDJSON output'),
+    click.option('--author', multiple=True, help='Filter commits by author (can be used multiple times for a section per author)'),
+    click.option('--all-authors', is_flag=True, help='Report every author, with a section per author'),
+    click.option('--timezone', help='Timezone for dates (e.g., "US/Eastern", "EST")'),
+    click.option('--output-file', help='Write output to file instead of stdout'),
+    click.option('--output-dir', help='Write a timesheet file per author to this directory'),
+    click.option('--session-timeout', type=int, help='Minutes between commits to consider them part of the same work session'),
+    click.option('--session-scope', type=click.Choice(SESSION_SCOPES), help='Clamp commit time by the next commit in the same repository (repo) or in any repository (global)'),
+    click.option('--rules-file', help='INI file with [rule:<name>] time estimation rules'),
+    click.option('--churn-minutes', type=click.IntRange(min=0), help='Extra minutes per doubling of the lines a commit changed (0 = ignore diff stats)'),
+    click.option('--jobs', type=click.IntRange(min=0), help='Number of repositories to process in parallel (0 = auto, 1 = serial)'),
+    click.option('--timeout', type=click.FloatRange(min=0), help='Seconds after which a repository whose git process has not finished is skipped (0 = no limit)'),
+    click.option('--memory-budget', type=click.IntRange(min=0), help='Megabytes of time entries to hold in memory before spilling them to temporary files (0 = no limit)'),
+    click.option('--backend', type=click.Choice(BACKENDS), help='How to read repositories: git subprocesses, or in-process with dulwich or pygit2'),
+    click.option('--no-cache', is_flag=True, help='Read git log directly instead of using the commit cache, and render the report again'),
+    click.option('--refresh-cache', is_flag=True, help='Rebuild the commit cache for the processed repositories and render the report again'),
+    click.option('--profile', is_flag=True, help='Print per-stage timings as JSON to stderr'),
+    click.option('--profile-output', help='Write per-stage timings as JSON to a file'),
+    click.option('--profile-pstats', help='Write cProfile statistics to a file (processes repositories serially)'),
+]
+
+def generate_options(function):
+    """Add the timesheet generation options to a command."""
+    for option in reversed(GENERATE_OPTIONS):
+        function = option(function)
+    return function
+
+@click.group(invoke_without_command=True)
 @click.version_option(version=__version__)
+@generate_options
+@click.option('--init', is_flag=True, help='Initialize configuration file')
+@click.pass_context
+def cli(ctx, init, **options):
+    """Generate Git Timesheet - Create timesheets from git commit history
+    
+    Without a command, generates a timesheet like 'ggts generate'.
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+    if init:
+        initialize_config()
+        return
+    run_generate(**options)
+
+@cli.command()
+@generate_options
+def generate(**options):
+    """Generate a timesheet from git commit history"""
+    run_generate(**options)
+
+@cli.command()
+def init():
+    """Initialize configuration file"""
+    initialize_config()
+
+@cli.command()
+@click.option('--database', help='SQLite database to load commits into (default: ~/.local/share/git-timesheet/timesheet.db)')
 @click.option('--base-dir', help='Base directory containing git repositories (default: current directory)')
-@click.option('--since', help='Show commits more recent than a specific date (e.g., "2 weeks ago")')
-@click.option('--until', help='Show commits older than a specific date')
 @click.option('--repos', multiple=True, help='Specific repository names to include (can be used multiple times)')
-@click.option('--output', type=click.Choice(['text', 'csv', 'markdown', 'md']), 
-              help='Output format (text, csv, markdown, or md)')
+@click.option('--max-depth', type=click.IntRange(min=0), help='How many directory levels below the base directory to search for repositories (0 = unlimited)')
+@click.option('--exclude', multiple=True, help='Glob pattern for directories to skip when searching for repositories (can be used multiple times)')
+@click.option('--session-timeout', type=int, help='Minutes between commits to consider them part of the same work session')
+@click.option('--rules-file', help='INI file with [rule:<name>] time estimation rules')
+@click.option('--jobs', type=click.IntRange(min=0), help='Number of repositories to process in parallel (0 = auto, 1 = serial)')
+@click.option('--timeout', type=click.FloatRange(min=0), help='Seconds after which a repository whose git process has not finished is skipped (0 = no limit)')
+@click.option('--backend', type=click.Choice(BACKENDS), help='How to read repositories: git subprocesses, or in-process with dulwich or pygit2')
+@click.option('--no-cache', is_flag=True, help='Read git log directly instead of using the commit cache')
+@click.option('--refresh-cache', is_flag=True, help='Rebuild the commit cache for the processed repositories')
+def ingest(database, base_dir, repos, max_depth, exclude, session_timeout, rules_file, jobs, timeout, backend,
+           no_cache, refresh_cache):
+    """Load commits and estimated minutes into the commit store
+    
+    The whole history of each repository is loaded, for every author, and
+    replaces what was stored for it before.
+    """
+    ingest_repositories(database, base_dir, repos, session_timeout, jobs=jobs, timeout=timeout, backend=backend,
+                        no_cache=no_cache, refresh_cache=refresh_cache, max_depth=max_depth, exclude=exclude,
+                        rules_file=rules_file)
+
+@cli.command()
+@click.option('--database', help='SQLite database to report from (default: ~/.local/share/git-timesheet/timesheet.db)')
+@click.option('--since', help='Show commits more recent than a date (YYYY-MM-DD, or e.g. "2 weeks ago")')
+@click.option('--until', help='Show commits older than a date (YYYY-MM-DD includes the whole day)')
+@click.option('--repos', multiple=True, help='Specific repository names to include (can be used multiple times)')
+@click.option('--output', type=click.Choice(OUTPUT_FORMATS), 
+              help='Output format (text, csv, markdown, md, json, or ndjson)')
 @click.option('--author', help='Filter commits by author')
 @click.option('--timezone', help='Timezone for dates (e.g., "US/Eastern", "EST")')
 @click.option('--output-file', help='Write output to file instead of stdout')
+def report(database, since, until, repos, output, author, timezone, output_file):
+    """Generate a timesheet from the commit store without running git"""
+    report_timesheet(database, since, until, repos, output, author, timezone, output_file)
+
+@cli.command()
+@click.option('--base-dir', help='Base directory containing git repositories (default: current directory)')
+@click.option('--since', help='Show commits more recent than a specific date (e.g., "2 weeks ago"; fixed when the watch starts)')
+@click.option('--until', help='Show commits older than a specific date')
+@click.option('--repos', multiple=True, help='Specific repository names to include (can be used multiple times)')
+@click.option('--max-depth', type=click.IntRange(min=0), help='How many directory levels below the base directory to search for repositories (0 = unlimited)')
+@click.option('--exclude', multiple=True, help='Glob pattern for directories to skip when searching for repositories (can be used multiple times)')
+@click.option('--output', type=click.Choice(OUTPUT_FORMATS), 
+              help='Output format (text, csv, markdown, md, json, or ndjson) for stdout and output files without a .csv, .md, .json or .ndjson extension')
+@click.option('--author', help='Filter commits by author')
+@click.option('--timezone', help='Timezone for dates (e.g., "US/Eastern", "EST")')
+@click.option('--output-file', multiple=True, help='File to keep up to date instead of writing to stdout (can be used multiple times)')
 @click.option('--session-timeout', type=int, help='Minutes between commits to consider them part of the same work session')
-@click.option('--init', is_flag=True, help='Initialize configuration file')
-def cli(base_dir, since, until, repos, output, author, timezone, output_file, session_timeout, init):
-    """Generate Git Timesheet - Create timesheets from git commit history"""
-    if init:
-        initialize_config()
-        return
+@click.option('--rules-file', help='INI file with [rule:<name>] time estimation rules')
+@click.option('--jobs', type=click.IntRange(min=0), help='Number of repositories to process in parallel (0 = auto, 1 = serial)')
+@click.option('--timeout', type=click.FloatRange(min=0), help='Seconds after which a repository whose git process has not finished is skipped (0 = no limit)')
+@click.option('--backend', type=click.Choice(BACKENDS), help='How to read repositories: git subprocesses, or in-process with dulwich or pygit2')
+@click.option('--no-cache', is_flag=True, help='Read git log directly instead of using the commit cache')
+@click.option('--interval', type=click.FloatRange(min=0.1), help='Seconds between checks for new commits (default: 5)')
+def watch(base_dir, since, until, repos, max_depth, exclude, output, author, timezone, output_file, session_timeout,
+          rules_file, jobs, timeout, backend, no_cache, interval):
+    """Keep a timesheet up to date as commits are made
+    
+    Repositories are found once, and only those whose branches moved are
+    read again. Outputs are rewritten only when something changed.
+    """
+    watch_timesheet(base_dir, since, until, repos, output, author, timezone, output_file, session_timeout,
+                    jobs=jobs, timeout=timeout, backend=backend, no_cache=no_cache, max_depth=max_depth,
+                    exclude=exclude, rules_file=rules_file, interval=interval)
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1, this machine only)')
+@click.option('--port', type=click.IntRange(min=0, max=65535), default=8000, help='Port to listen on (default: 8000)')
+@click.option('--base-dir', help='Base directory containing git repositories (default: current directory)')
+@click.option('--repos', multiple=True, help='Specific repository names to include (can be used multiple times)')
+@click.option('--max-depth', type=click.IntRange(min=0), help='How many directory levels below the base directory to search for repositories (0 = unlimited)')
+@click.option('--exclude', multiple=True, help='Glob pattern for directories to skip when searching for repositories (can be used multiple times)')
+@click.option('--author', help='Default author filter for requests without an author parameter')
+@click.option('--timezone', help='Default timezone for requests without a timezone parameter')
+@click.option('--session-timeout', type=int, help='Minutes between commits to consider them part of the same work session')
+@click.option('--rules-file', help='INI file with [rule:<name>] time estimation rules')
+@click.option('--jobs', type=click.IntRange(min=0), help='Number of repositories to process in parallel (0 = auto, 1 = serial)')
+@click.option('--timeout', type=click.FloatRange(min=0), help='Seconds after which a repository whose git process has not finished is skipped (0 = no limit)')
+@click.option('--backend', type=click.Choice(BACKENDS), help='How to read repositories: git subprocesses, or in-process with dulwich or pygit2')
+@click.option('--no-cache', is_flag=True, help='Read git log directly instead of using the commit cache')
+def serve(host, port, base_dir, repos, max_depth, exclude, author, timezone, session_timeout, rules_file, jobs,
+          timeout, backend, no_cache):
+    """Serve timesheets over HTTP
+    
+    GET /timesheet with format, since, until, author, timezone,
+    session_timeout and repos query parameters. Reports are rendered again
+    only when a parameter or a repository's branches changed.
+    """
+    serve_timesheets(host, port, base_dir, repos, author, timezone, session_timeout, jobs=jobs, timeout=timeout,
+                     backend=backend, no_cache=no_cache, max_depth=max_depth, exclude=exclude,
+                     rules_file=rules_file)
+
+def run_generate(base_dir, since, until, repos, max_depth, exclude, output, rollups, author, all_authors, timezone,
+                 output_file, output_dir, session_timeout, session_scope, rules_file, churn_minutes, jobs, timeout,
+                 memory_budget, backend, no_cache, refresh_cache, profile, profile_output, profile_pstats):
+    """Generate a timesheet for the command line options, with profiling if requested"""
+    profiler = Profiler() if profile or profile_output else None
+    if profile_pstats:
+        # cProfile only sees the thread it was enabled in, and one job collects on this thread
+        jobs = 1
+        pstats_profiler = cProfile.Profile()
+        pstats_profiler.enable()
     
     # Generate timesheet (default behavior)
-    generate_timesheet(base_dir, since, until, repos, output, author, timezone, output_file, session_timeout)
+    try:
+        generate_timesheet(base_dir, since, until, repos, output, author, timezone, output_file, session_timeout,
+                           jobs=jobs, timeout=timeout, backend=backend, no_cache=no_cache, refresh_cache=refresh_cache, max_depth=max_depth,
+                           exclude=exclude, rules_file=rules_file, profiler=profiler, all_authors=all_authors,
+                           output_dir=output_dir, rollups=rollups, memory_budget=memory_budget,
+                           session_scope=session_scope, churn_minutes=churn_minutes)
+    finally:
+        if profile_pstats:
+            pstats_profiler.disable()
+            pstats_profiler.dump_stats(profile_pstats)
+        if profiler:
+            profiler.write_json(profile_output)
 
 def initialize_config():
     """Initialize configuration file"""
@@ -58,8 +248,57 @@ author = {author}
 # Default timezone for dates (e.g., US/Eastern, EST, America/New_York)
 timezone = {timezone}
 
+# Timezone database to use: pytz or zoneinfo (Python 3.9+)
+timezone_backend = pytz
+
 # Minutes between commits to consider them part of the same work session
 session_timeout = {session_timeout}
+
+# Clamp commit time by the next commit in the same repository (repo) or in any repository (global)
+session_scope = repo
+
+# Number of repositories to process in parallel (0 = auto, 1 = serial)
+jobs = 0
+
+# Seconds after which a repository whose git process has not finished is skipped (0 = no limit)
+timeout = 0
+
+# Megabytes of time entries held in memory before they are spilled to temporary files (0 = no limit)
+memory_budget = 512
+
+# Extra minutes per doubling of the lines a commit changed (0 = ignore diff stats; git backend only)
+churn_minutes = 0
+
+# How to read repositories: git, dulwich or pygit2 (in-process, if installed)
+backend = git
+
+# Cache parsed git log data under ~/.cache/git-timesheet between runs
+cache = true
+
+# Reuse the last rendered report while no option and no repository's branches changed
+report_cache = true
+
+# Directory levels below the base directory to search for repositories (0 = unlimited)
+max_depth = 1
+
+# Glob patterns for directories to skip when searching for repositories
+exclude =
+
+# SQLite commit store used by 'ggts ingest' and 'ggts report'
+# (empty = ~/.local/share/git-timesheet/timesheet.db)
+database =
+
+# Seconds between checks for new commits in 'ggts watch'
+watch_interval = 5
+
+# INI file with additional time estimation rules
+rules_file =
+
+# Time estimation rules: extra minutes for commit messages matching a pattern.
+# Rules named fix, feature or refactor replace the built-in ones.
+# [rule:docs]
+# pattern = docs?|readme
+# minutes = 10
 """
     
     with open(config_file, 'w') as f:
@@ -68,59 +307,375 @@ session_timeout = {session_timeout}
     click.echo(f"Configuration file created at {config_file}")
     click.echo("You can now run 'ggts' to create timesheets.")
 
-def generate_timesheet(base_dir, since, until, repos, output, author, timezone, output_file, session_timeout):
-    """Generate a timesheet from git commit history"""
+def generate_timesheet(base_dir, since, until, repos, output, author, timezone, output_file, session_timeout,
+                       jobs=None, no_cache=False, refresh_cache=False, max_depth=None, exclude=None,
+                       rules_file=None, profiler=None, backend=None, timeout=None, all_authors=False,
+                       output_dir=None, rollups=False, memory_budget=None, session_scope=None, churn_minutes=None):
+    """Generate a timesheet from git commit history
+    
+    Estimation rules are read from the config files and ``rules_file``.
+    Pass a ``Profiler`` as ``profiler`` to record per-stage timings of the run.
+    
+    ``author`` is a pattern or a list of them. Several authors,
+    ``all_authors`` or ``output_dir`` produce a team timesheet: the
+    repositories are read once for all authors and the entries split into a
+    section, or a file in ``output_dir``, per author.
+    
+    ``rollups`` adds day and week totals to NDJSON output. Progress
+    messages go to stderr for NDJSON, so that stdout holds only records.
+    
+    Each repository's entries are kept as a run sorted by date and the runs
+    merged lazily into the formatters; runs beyond ``memory_budget``
+    megabytes are spilled to temporary files (see ``merge``). With a
+    ``global`` ``session_scope`` the merged entries are re-estimated
+    across repositories (see ``estimation.apportion_sessions``).
+    ``churn_minutes`` overrides the configured weighting by diff stats.
+    ``jobs`` of 1 collects the repositories one at a time on this thread.
+    
+    With the cache enabled, a report whose options and repository refs are
+    unchanged since it was last rendered is written from the report cache
+    (see ``report_cache``); ``refresh_cache`` renders it again.
+    """
     # Load configuration
-    config = get_config()
+    config = get_config(verbose=True)
     
     # Use config values as defaults if not provided via command line
-    base_dir = base_dir or os.getcwd()
     output_format = output or 'text'
-    author_filter = author or config['author']
+    authors = [author] if isinstance(author, str) else list(author or [])
+    if all_authors and authors:
+        raise click.ClickException("--all-authors cannot be combined with --author")
+    author_filter = authors[0] if authors else config['author']
+    team = bool(all_authors or len(authors) > 1 or output_dir)
     timezone_str = timezone or config['timezone']
+    timezone_backend = config['timezone_backend']
     session_timeout_minutes = session_timeout or int(config['session_timeout'])
+    session_scope = session_scope or config['session_scope']
+    if session_scope not in SESSION_SCOPES:
+        raise click.ClickException(f"Unknown session scope '{session_scope}'; use {' or '.join(SESSION_SCOPES)}")
+    jobs = int(config['jobs']) if jobs is None else jobs
+    timeout = float(config['timeout']) if timeout is None else timeout
+    memory_budget = int(config['memory_budget']) if memory_budget is None else memory_budget
+    use_cache = not no_cache and config.getboolean('cache')
+    rules = load_rules(rules_file, config, churn_minutes)
+    backend = resolve_backend(backend, config, rules)
+    # Keep stdout parseable line by line for NDJSON
+    status_to_stderr = output_format == 'ndjson'
     
-    # Get all git repositories in the base directory
-    all_repos = get_git_repos(base_dir)
+    repos_to_process = find_repositories(base_dir, repos, max_depth, exclude, jobs, config, profiler)
+    if not repos_to_process:
+        click.echo("No git repositories found.", err=status_to_stderr)
+        return
     
-    # Filter repositories if specified
-    if repos:
-        filtered_repos = []
-        for repo_name in repos:
-            matching_repos = [r for r in all_repos if os.path.basename(r) == repo_name]
-            filtered_repos.extend(matching_repos)
-        repos_to_process = filtered_repos
+    click.echo(f"Found {len(repos_to_process)} repositories.", err=status_to_stderr)
+    
+    # A report whose inputs and repositories are unchanged is written again without reading git
+    fingerprint = None
+    if use_cache and backend == 'git' and config.getboolean('report_cache') and not output_dir:
+        date_range = resolve_date_range(repos_to_process[0], since, until, timeout or None)
+        fingerprint = report_fingerprint(repos_to_process, {
+            'since': since, 'until': until, 'author': author_filter, 'authors': tuple(authors),
+            'all_authors': all_authors, 'timezone': timezone_str, 'timezone_backend': timezone_backend,
+            'session_timeout': session_timeout_minutes, 'session_scope': session_scope,
+            'rules': (tuple(rules.rules), rules.base_minutes, rules.churn_minutes),
+            'format': output_format, 'rollups': rollups})
+        body = None if refresh_cache else load_report(fingerprint, date_range)
+        if body is not None:
+            click.echo("No repository changed; using the cached report.", err=status_to_stderr)
+            write_output(lambda sink: write_report(body, sink), output_file)
+            return
+        # Read the range the stored report will be valid for, not one git resolves again later
+        max_age, min_age = date_range
+        since = f'@{max_age}' if max_age is not None else since
+        until = f'@{min_age}' if min_age is not None else until
+    
+    # Collect each repository's entries (concurrently) as a run sorted by date
+    collect_options = dict(timeout=timeout or None,
+                           progress=lambda repo_name: click.echo(f"Processing {repo_name}...", err=status_to_stderr),
+                           use_cache=use_cache, refresh_cache=refresh_cache, rules=rules, profiler=profiler,
+                           backend=backend, by_author=team, memory_budget=memory_budget * 1024 * 1024)
+    if jobs == 1:
+        # One at a time on this thread, where --profile-pstats sees the work
+        runs, skipped = collect_entry_runs(repos_to_process, since, until, None if team else author_filter,
+                                           session_timeout_minutes, **collect_options)
     else:
-        repos_to_process = all_repos
+        runs, skipped = asyncio.run(collect_entry_runs_async(
+            repos_to_process, since, until, None if team else author_filter, session_timeout_minutes, jobs=jobs,
+            **collect_options))
+    for result in skipped:
+        click.echo(f"Warning: skipped {result.repo}: {result.error}", err=True)
     
+    def render(write):
+        """Store the report as it is written, unless a repository was skipped"""
+        if fingerprint is None or skipped:
+            return write
+        return storing_report(write, fingerprint, repos_to_process, date_range)
+    
+    with runs:
+        # Merging the runs takes the place of sorting all entries by date
+        merged = timed_iter(profiler, 'merge', runs.merged())
+        if session_scope == 'global':
+            merged = timed_iter(profiler, 'apportion',
+                                apportion_sessions(merged, session_timeout_minutes, rules, by_author=team))
+        if team:
+            # The merged entries are split into a section per author, spilled beyond the memory budget
+            with EntrySections(memory_budget * 1024 * 1024) as author_sections:
+                sections = partition_by_author(merged, None if all_authors else authors or [author_filter],
+                                               author_sections)
+                with stage(profiler, 'format') as timing:
+                    timing.items = len(sections)
+                    if output_dir:
+                        write_author_files(sections, output_dir, output_format, timezone_str, timezone_backend,
+                                           rollups)
+                    else:
+                        write_output(render(lambda sink: write_lines(iter_author_timesheets(sections, output_format,
+                                                                                            timezone_str,
+                                                                                            timezone_backend,
+                                                                                            rollups),
+                                                                     sink)),
+                                     output_file)
+            return
+        
+        # Merge the runs into date order as the timesheet is rendered and written out
+        write_output(render(lambda sink: write_timesheet(merged, sink, output_format, timezone_str, author_filter,
+                                                         timezone_backend, profiler, rollups)), output_file)
+
+def write_author_files(sections, output_dir, output_format, timezone_str, timezone_backend, rollups=False):
+    """Write each author's timesheet to a file in ``output_dir`` named after the author"""
+    os.makedirs(output_dir, exist_ok=True)
+    extension = AUTHOR_FILE_EXTENSIONS[output_format]
+    used_names = set()
+    for author, time_entries, author_filter in sections:
+        name = re.sub(r'[^\w.@+-]+', '_', author).strip('_.') or 'author'
+        unique_name, count = name, 1
+        while unique_name in used_names:
+            count += 1
+            unique_name = f'{name}-{count}'
+        used_names.add(unique_name)
+        path = os.path.join(output_dir, unique_name + extension)
+        with open(path, 'w') as f:
+            write_lines(iter_timesheet(iter(time_entries), output_format, timezone_str, author_filter,
+                                       timezone_backend, rollups=rollups), f)
+        click.echo(f"Timesheet for {author} written to {path}")
+    if not sections:
+        click.echo(NO_ACTIVITY)
+
+def ingest_repositories(database, base_dir, repos, session_timeout, jobs=None, no_cache=False, refresh_cache=False,
+                        max_depth=None, exclude=None, rules_file=None, backend=None, timeout=None):
+    """Load the commits of the repositories, with estimated minutes, into the commit store
+    
+    Each author's commits are estimated separately, so reports for any
+    author can be generated from the store (see ``store``).
+    """
+    config = get_config(verbose=True)
+    
+    session_timeout_minutes = session_timeout or int(config['session_timeout'])
+    jobs = int(config['jobs']) if jobs is None else jobs
+    timeout = float(config['timeout']) if timeout is None else timeout
+    use_cache = not no_cache and config.getboolean('cache')
+    rules = load_rules(rules_file, config)
+    backend = resolve_backend(backend, config, rules)
+    
+    repos_to_process = find_repositories(base_dir, repos, max_depth, exclude, jobs, config)
     if not repos_to_process:
         click.echo("No git repositories found.")
         return
     
     click.echo(f"Found {len(repos_to_process)} repositories.")
+    conn = open_store(database, config)
     
-    # Collect time entries from all repositories
-    all_time_entries = []
-    for repo in repos_to_process:
-        repo_name = os.path.basename(repo)
-        click.echo(f"Processing {repo_name}...")
-        commits = get_git_log(repo, since, until, author_filter)
-        time_entries = estimate_time_spent(commits, repo_name, session_timeout_minutes)
-        all_time_entries.extend(time_entries)
+    async def load():
+        async for result in iter_repo_results(repos_to_process, session_timeout_minutes=session_timeout_minutes,
+                                              jobs=jobs, timeout=timeout or None, use_cache=use_cache,
+                                              refresh_cache=refresh_cache, rules=rules, backend=backend,
+                                              by_author=True):
+            if result.time_entries is None:
+                click.echo(f"Warning: skipped {result.repo}: {result.error}", err=True)
+                continue
+            count = store.ingest(conn, result.repo, result.time_entries)
+            click.echo(f"Ingested {count} commits from {os.path.basename(result.repo)}")
     
-    # Sort all entries by date
-    all_time_entries.sort(key=lambda x: x['date'])
+    try:
+        asyncio.run(load())
+    finally:
+        conn.close()
+
+def report_timesheet(database, since, until, repos, output, author, timezone, output_file):
+    """Generate a timesheet from the commit store
+    
+    Groupings and totals are computed by SQL queries against the store, and
+    the output is identical to generating the timesheet from git.
+    """
+    config = get_config(verbose=True)
     
-    # Format timesheet
-    timesheet = format_timesheet(all_time_entries, output_format, timezone_str, author_filter)
+    output_format = output or 'text'
+    author_filter = author or config['author']
+    timezone_str = timezone or config['timezone']
+    timezone_backend = config['timezone_backend']
+    
+    path = Path(os.path.expanduser(database or config['database'] or str(store.get_database_path())))
+    if not path.exists():
+        raise click.ClickException(f"No commit store at {path}; run 'ggts ingest' first")
+    conn = open_store(path, config)
+    try:
+        try:
+            since_ts, until_ts = store.resolve_report_range(conn, since, until, timezone_str, timezone_backend)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        with closing(store.iter_report(conn, output_format, timezone_str, author_filter, since_ts, until_ts,
+                                       timezone_backend, list(repos))) as lines:
+            write_output(lambda sink: write_lines(lines, sink), output_file)
+    finally:
+        conn.close()
+
+def watch_timesheet(base_dir, since, until, repos, output, author, timezone, output_files, session_timeout,
+                    jobs=None, no_cache=False, max_depth=None, exclude=None, rules_file=None, backend=None,
+                    timeout=None, interval=None, iterations=None):
+    """Poll the repositories for new commits and re-render the timesheet whenever they change
+    
+    Each output file is written in the format its extension names (.csv,
+    .md, .markdown, .json, .ndjson or .jsonl), or ``output``. Without output files the timesheet is
+    written to stdout. Runs until interrupted, or for ``iterations`` polls.
+    """
+    config = get_config(verbose=True)
+    
+    output_format = output or 'text'
+    author_filter = author or config['author']
+    session_timeout_minutes = session_timeout or int(config['session_timeout'])
+    jobs = int(config['jobs']) if jobs is None else jobs
+    timeout = float(config['timeout']) if timeout is None else timeout
+    interval = float(config['watch_interval']) if interval is None else interval
+    use_cache = not no_cache and config.getboolean('cache')
+    rules = load_rules(rules_file, config)
+    backend = resolve_backend(backend, config, rules)
+    outputs = [(path, OUTPUT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), output_format))
+               for path in output_files]
+    
+    repos_to_process = find_repositories(base_dir, repos, max_depth, exclude, jobs, config)
+    if not repos_to_process:
+        click.echo("No git repositories found.")
+        return
+    
+    watcher = TimesheetWatcher(repos_to_process, since, until, author_filter, session_timeout_minutes,
+                               timezone or config['timezone'], config['timezone_backend'], jobs=jobs,
+                               timeout=timeout or None, use_cache=use_cache, rules=rules, backend=backend)
+    click.echo(f"Watching {len(repos_to_process)} repositories every {interval:g}s. Press Ctrl+C to stop.", err=True)
+    
+    def on_skip(result):
+        click.echo(f"Warning: skipped {result.repo}: {result.error}", err=True)
+    
+    polls = 0
+    try:
+        while True:
+            updated = watcher.poll(on_skip)
+            if updated:
+                names = ', '.join(os.path.basename(repo) for repo in updated[:5])
+                if len(updated) > 5:
+                    names += f" and {len(updated) - 5} more"
+                for path, path_format in outputs:
+                    watcher.write(path, path_format)
+                if not outputs:
+                    write_output(lambda sink: write_lines(watcher.iter_timesheet(output_format), sink), None)
+                click.echo(f"[{datetime.now():%H:%M:%S}] Updated {names}", err=True)
+            polls += 1
+            if iterations is not None and polls >= iterations:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        click.echo("Stopped watching.", err=True)
+
+def serve_timesheets(host, port, base_dir, repos, author, timezone, session_timeout, jobs=None, no_cache=False,
+                     max_depth=None, exclude=None, rules_file=None, backend=None, timeout=None):
+    """Serve timesheets for the repositories over HTTP until interrupted"""
+    config = get_config(verbose=True)
+    
+    jobs = int(config['jobs']) if jobs is None else jobs
+    timeout = float(config['timeout']) if timeout is None else timeout
+    rules = load_rules(rules_file, config)
+    backend = resolve_backend(backend, config, rules)
+    
+    repos_to_process = find_repositories(base_dir, repos, max_depth, exclude, jobs, config)
+    if not repos_to_process:
+        click.echo("No git repositories found.")
+        return
+    
+    service = ReportService(repos_to_process, author or config['author'], timezone or config['timezone'],
+                            config['timezone_backend'], session_timeout or int(config['session_timeout']),
+                            jobs=jobs, timeout=timeout or None, use_cache=not no_cache and config.getboolean('cache'),
+                            rules=rules, backend=backend)
+    try:
+        server = TimesheetServer((host, port), service)
+    except OSError as e:
+        raise click.ClickException(f"Cannot listen on {host}:{port}: {e}")
+    host, port = server.server_address[:2]
+    click.echo(f"Serving timesheets for {len(repos_to_process)} repositories at http://{host}:{port}/timesheet. "
+               "Press Ctrl+C to stop.", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("Stopped serving.", err=True)
+    finally:
+        server.server_close()
+
+def load_rules(rules_file, config, churn_minutes=None):
+    """Load the estimation rules from the config files and ``rules_file``"""
+    try:
+        churn_minutes = int(config['churn_minutes']) if churn_minutes is None else churn_minutes
+        return get_estimation_rules(rules_file or config['rules_file'], churn_minutes)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+def resolve_backend(backend, config, rules=None):
+    """Return the backend to read repositories with, checking it can be used"""
+    backend = backend or config['backend']
+    if backend not in available_backends():
+        if backend in BACKENDS:
+            raise click.ClickException(f"The {backend} backend requires the {backend} package to be installed")
+        raise click.ClickException(f"Unknown backend: {backend}")
+    if backend != 'git' and reads_churn(rules):
+        raise click.ClickException(f"churn_minutes reads diff stats with git and cannot be used with the {backend} backend")
+    return backend
+
+def find_repositories(base_dir, repos, max_depth, exclude, jobs, config, profiler=None):
+    """Find the git repositories to process below the base directory"""
+    base_dir = base_dir or os.getcwd()
+    max_depth = int(config['max_depth']) if max_depth is None else max_depth
+    exclude = list(exclude or []) + config['exclude'].replace(',', ' ').split()
+    
+    # Get all git repositories in the base directory
+    with stage(profiler, 'discovery') as timing:
+        all_repos = get_git_repos(base_dir, max_depth=max_depth, exclude=exclude, jobs=jobs)
+        timing.items = len(all_repos)
+    
+    # Filter repositories if specified
+    if repos:
+        filtered_repos = []
+        for repo_name in repos:
+            matching_repos = [r for r in all_repos if os.path.basename(r) == repo_name]
+            filtered_repos.extend(matching_repos)
+        return filtered_repos
+    return all_repos
+
+def open_store(database, config):
+    """Open the commit store at ``database`` or the configured location"""
+    try:
+        return store.connect(database or config['database'] or None)
+    except (ValueError, sqlite3.Error) as e:
+        raise click.ClickException(str(e))
+
+def write_output(write, output_file):
+    """Call ``write`` with the output file, or stdout, to write a timesheet
     
-    # Output the timesheet
+    ``write`` returns the number of lines it wrote; stdout gets a final
+    newline unless that is none, as for NDJSON without records.
+    """
     if output_file:
         with open(output_file, 'w') as f:
-            f.write(timesheet)
+            write(f)
         click.echo(f"Timesheet written to {output_file}")
     else:
-        click.echo(timesheet)
+        if write(sys.stdout) != 0:
+            sys.stdout.write('\n')
+        sys.stdout.flush()
 
 def main():
     cli()
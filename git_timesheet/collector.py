@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .git_utils import iter_git_log, estimate_time_spent, author_matcher
+from .cache import get_cached_git_log, resolve_date_range
+from .backends import iter_backend_log
+from .merge import EntryRuns
+from .profiling import stage
+
+# Outcome of collecting one repository; time_entries is None if it was skipped
+RepoResult = namedtuple('RepoResult', ['repo', 'time_entries', 'error'])
+
+def reads_churn(rules):
+    """Return whether commits must be read with diff stats for the estimation rules."""
+    return bool(rules is not None and rules.churn_minutes)
+
+def collect_repo_entries(repo, since=None, until=None, author=None, session_timeout_minutes=60,
+                         use_cache=False, refresh_cache=False, rules=None, profiler=None, backend='git',
+                         date_range=None, timeout=None, by_author=False):
+    """Collect and estimate time entries for a single repository.
+
+    The commit cache is only used with the ``git`` backend; the in-process
+    backends read the repository directly (see ``backends``). git commands
+    are stopped after ``timeout`` seconds, raising ``subprocess.TimeoutExpired``.
+    ``by_author`` estimates each author's commits separately. When the
+    ``rules`` weight churn, git also reads each commit's diff stats; the
+    in-process backends do not read them.
+    """
+    repo_name = os.path.basename(repo)
+    churn = reads_churn(rules)
+    with stage(profiler, 'git_log', repo) as timing:
+        if backend != 'git':
+            commits = list(iter_backend_log(repo, since, until, author, backend, date_range))
+        elif use_cache:
+            commits = get_cached_git_log(repo, since, until, author, refresh=refresh_cache, timeout=timeout,
+                                         churn=churn)
+        else:
+            commits = list(iter_git_log(repo, since, until, author, timeout, churn))
+        timing.items = len(commits)
+    with stage(profiler, 'estimate', repo) as timing:
+        time_entries = estimate_time_spent(commits, repo_name, session_timeout_minutes, rules, by_author)
+        timing.items = len(time_entries)
+    return time_entries
+
+def collect_time_entries(repos, since=None, until=None, author=None, session_timeout_minutes=60,
+                         jobs=None, progress=None, use_cache=False, refresh_cache=False, rules=None, profiler=None,
+                         backend='git', by_author=False):
+    """Collect time entries from several repositories using a bounded worker pool.
+
+    Repositories are processed concurrently by up to ``jobs`` worker threads
+    (``None`` or ``0`` picks a default based on the CPU count, ``1`` runs
+    serially). Results are merged in the order of ``repos`` so the output is
+    identical to processing them one at a time. ``progress`` is called with
+    each repository name, in order, as its results are merged. ``use_cache``
+    serves git log data from the persistent commit cache (see ``cache``),
+    ``rules`` are the ``EstimationRules`` to apply and ``profiler`` records
+    per-repository timings (see ``profiling``). ``backend`` selects how
+    commits are read (see ``backends``); for the in-process backends the
+    date range is resolved once for all repositories. ``by_author``
+    estimates each author's commits separately.
+    """
+    date_range = None
+    if backend != 'git' and repos:
+        date_range = resolve_date_range(repos[0], since, until)
+
+    def collect(repo):
+        return collect_repo_entries(repo, since, until, author, session_timeout_minutes,
+                                    use_cache=use_cache, refresh_cache=refresh_cache, rules=rules, profiler=profiler,
+                                    backend=backend, date_range=date_range, by_author=by_author)
+
+    all_time_entries = []
+    if jobs == 1 or len(repos) <= 1:
+        for repo in repos:
+            if progress:
+                progress(os.path.basename(repo))
+            all_time_entries.extend(collect(repo))
+        return all_time_entries
+
+    with ThreadPoolExecutor(max_workers=jobs or None) as executor:
+        for repo, time_entries in zip(repos, executor.map(collect, repos)):
+            if progress:
+                progress(os.path.basename(repo))
+            all_time_entries.extend(time_entries)
+    return all_time_entries
+
+def collect_entry_runs(repos, since=None, until=None, author=None, session_timeout_minutes=60, timeout=None,
+                       progress=None, use_cache=False, refresh_cache=False, rules=None, profiler=None, backend='git',
+                       by_author=False, memory_budget=None):
+    """Collect repositories one at a time on the calling thread into ``merge.EntryRuns``.
+
+    Returns ``(runs, skipped)`` as ``async_collector.collect_entry_runs_async``
+    does, but runs git and the commit cache in this thread, where a
+    ``cProfile`` profiler sees the work. A repository whose git commands
+    take longer than ``timeout`` seconds is skipped.
+    """
+    date_range = None
+    if backend != 'git' and repos:
+        date_range = resolve_date_range(repos[0], since, until, timeout)
+    runs = EntryRuns(memory_budget)
+    skipped = []
+    try:
+        for repo in repos:
+            if progress:
+                progress(os.path.basename(repo))
+            try:
+                runs.add(collect_repo_entries(repo, since, until, author, session_timeout_minutes,
+                                              use_cache=use_cache, refresh_cache=refresh_cache, rules=rules,
+                                              profiler=profiler, backend=backend, date_range=date_range,
+                                              timeout=timeout, by_author=by_author))
+            except subprocess.TimeoutExpired:
+                skipped.append(RepoResult(repo, None, f"timed out after {timeout:g}s"))
+    except BaseException:
+        runs.close()
+        raise
+    return runs, skipped
+
+def partition_by_author(time_entries, authors=None, sections=None):
+    """Split time entries collected for all authors into one section per author.
+
+    Returns ``(author, time_entries, author_filter)`` tuples. For each
+    pattern in ``authors`` the section holds the entries git log --author
+    would select, with the pattern as the timesheet's author filter; without
+    ``authors`` there is a section for every author name and email, sorted
+    by name. Entries keep their order within each section. Collect the
+    entries with ``by_author`` so each section is estimated as if that
+    author had been collected alone.
+
+    ``time_entries`` is read once, so it may be a stream such as
+    ``EntryRuns.merged()``. Sections are lists, or sections of
+    ``sections`` (a ``merge.EntrySections``) that spill to temporary files.
+    """
+    new_section = list if sections is None else sections.section
+    if authors:
+        matchers = [(author_matcher(author), new_section()) for author in authors]
+        for entry in time_entries:
+            for matches, section in matchers:
+                if matches(entry.author_name, entry.author_email):
+                    section.append(entry)
+        return [(author, section, author) for author, (matches, section) in zip(authors, matchers)]
+    by_identity = {}
+    for entry in time_entries:
+        identity = (entry.author_name, entry.author_email)
+        section = by_identity.get(identity)
+        if section is None:
+            section = by_identity[identity] = new_section()
+        section.append(entry)
+    return [(f'{name} <{email}>', entries, '')
+            for (name, email), entries in sorted(by_identity.items(),
+                                                 key=lambda item: (item[0][0].lower(), item[0][1].lower()))]
@@ -1,25 +1,51 @@
 #!/usr/bin/env python3
 import os
+import sys
 import configparser
 from pathlib import Path
 
-def get_config():
-    """Load configuration from file and return merged config with defaults"""
-    # Default config values
-    defaults = {
-        'author': 'mcgarrah',
-        'timezone': 'UTC',
-        'session_timeout': '60'
-    }
-    
-    # Config file locations to check (in order of precedence)
-    config_paths = [
+from .estimation import EstimationRules
+
+# Prefix of the config sections defining time estimation rules
+RULE_SECTION_PREFIX = 'rule:'
+
+def get_config_paths():
+    """Return the config file locations to check, in order of precedence"""
+    return [
         Path.cwd() / '.ggtsrc',                      # Current directory rc file
         Path.cwd() / 'ggts.ini',                     # Current directory ini file
         Path.home() / '.ggtsrc',                     # User's home directory rc file
         Path.home() / '.config' / 'ggts.ini',        # XDG config directory
         Path.home() / '.config' / 'git-timesheet' / 'config.ini',  # New XDG config directory
     ]
+
+def get_config(verbose=False):
+    """Load configuration from file and return merged config with defaults
+
+    ``verbose`` prints which config file was loaded to stderr, as the command line does.
+    """
+    # Default config values
+    defaults = {
+        'author': 'mcgarrah',
+        'timezone': 'UTC',
+        'timezone_backend': 'pytz',
+        'session_timeout': '60',
+        'session_scope': 'repo',
+        'jobs': '0',
+        'timeout': '0',
+        'memory_budget': '512',
+        'churn_minutes': '0',
+        'backend': 'git',
+        'cache': 'true',
+        'report_cache': 'true',
+        'max_depth': '1',
+        'exclude': '',
+        'rules_file': '',
+        'database': '',
+        'watch_interval': '5'
+    }
+    
+    config_paths = get_config_paths()
     
     # Create config parser with defaults
     config = configparser.ConfigParser()
@@ -30,7 +56,38 @@ def get_config():
     # Try to read config from files
     found_configs = config.read([str(p) for p in config_paths if p.exists()])
     
-    if found_configs:
-        print(f"Loaded configuration from: {found_configs[0]}")
+    if found_configs and verbose:
+        print(f"Loaded configuration from: {found_configs[0]}", file=sys.stderr)
     
-    return config['defaults']
\ No newline at end of file
+    return config['defaults']
+
+def get_estimation_rules(rules_file=None, churn_minutes=0):
+    """Load time estimation rules from the config files and an optional rules file.
+
+    Rules are ``[rule:<name>]`` sections with a ``pattern`` (a regular
+    expression, matched case-insensitively) and the extra ``minutes`` added
+    when a commit message matches it. A rule named like a built-in rule
+    (``fix``, ``feature``, ``refactor``) replaces it; ``minutes = 0``
+    disables it. Sections in the rules file take precedence.
+    ``churn_minutes`` weights estimates by the lines each commit changed
+    (see ``EstimationRules``).
+    """
+    # Patterns are regular expressions, so % must not be interpolated
+    config = configparser.ConfigParser(interpolation=None)
+    config.read([str(p) for p in get_config_paths() if p.exists()])
+    if rules_file:
+        if not config.read(os.path.expanduser(rules_file)):
+            raise ValueError(f"Cannot read rules file: {rules_file}")
+
+    rules = []
+    for section in config.sections():
+        if not section.startswith(RULE_SECTION_PREFIX):
+            continue
+        name = section[len(RULE_SECTION_PREFIX):].strip()
+        try:
+            rules.append((name, config[section]['pattern'], config[section].getint('minutes', 0)))
+        except KeyError:
+            raise ValueError(f"Estimation rule '{name}' has no pattern") from None
+        except ValueError:
+            raise ValueError(f"Estimation rule '{name}' has invalid minutes") from None
+    return EstimationRules.with_defaults(rules, churn_minutes=churn_minutes)
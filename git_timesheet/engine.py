@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Embeddable timesheet engine.
+
+``TimesheetEngine`` loads the configuration and estimation rules and
+discovers the repositories once, then answers any number of queries for
+time entries, rollups or rendered timesheets. Each repository's entries are
+kept in memory per query (since/until, author and session timeout) with its
+ref state (the files ``ggts watch`` polls), so asking again reads only the
+repositories whose branches moved. since/until are resolved by git on each
+query, and entries are reused while the resolved dates select the same
+commits (see ``report_cache.date_range_bounds``). Repositories are read by
+a worker pool that lives as long as the engine.
+"""
+import os
+import heapq
+import threading
+import subprocess
+from operator import attrgetter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .async_collector import RepoResult, default_jobs
+from .backends import BACKENDS, available_backends
+from .cache import resolve_date_range
+from .collector import collect_repo_entries, reads_churn
+from .config import get_config, get_estimation_rules
+from .estimation import apportion_sessions
+from .formatters import build_timesheet, iter_rollup
+from .git_utils import get_git_repos
+from .report_cache import date_range_bounds, within_bounds
+from .watcher import find_git_dirs, ref_signature
+
+class TimesheetEngine:
+    """Query time entries and timesheets of the repositories below a directory.
+
+    Settings left as None are read from ``config`` (by default loaded once
+    with ``get_config``), as the command line does. ``repos`` selects
+    repositories by name. Raises ``ValueError`` for an unreadable rules
+    file or a backend that cannot be used.
+
+    Safe to use from several threads; concurrent queries that need the same
+    repository read it once.
+    """
+
+    def __init__(self, base_dir=None, repos=None, config=None, author=None, timezone_str=None,
+                 timezone_backend=None, session_timeout_minutes=None, session_scope=None, max_depth=None,
+                 exclude=None, jobs=None, timeout=None, use_cache=None, rules_file=None, churn_minutes=None,
+                 backend=None, cache_size=256):
+        self.config = get_config() if config is None else config
+        config = self.config
+        self.base_dir = os.path.expanduser(base_dir or os.getcwd())
+        self.repo_names = list(repos or [])
+        self.author = author or config['author']
+        self.timezone_str = timezone_str or config['timezone']
+        self.timezone_backend = timezone_backend or config['timezone_backend']
+        self.session_timeout_minutes = session_timeout_minutes or int(config['session_timeout'])
+        self.session_scope = session_scope or config['session_scope']
+        self.max_depth = int(config['max_depth']) if max_depth is None else max_depth
+        self.exclude = list(exclude or []) + config['exclude'].replace(',', ' ').split()
+        self.jobs = int(config['jobs']) if jobs is None else jobs
+        self.timeout = (float(config['timeout']) if timeout is None else timeout) or None
+        self.use_cache = config.getboolean('cache') if use_cache is None else use_cache
+        churn_minutes = int(config['churn_minutes']) if churn_minutes is None else churn_minutes
+        self.rules = get_estimation_rules(rules_file or config['rules_file'], churn_minutes)
+        self.backend = backend or config['backend']
+        if self.backend not in available_backends():
+            if self.backend in BACKENDS:
+                raise ValueError(f"The {self.backend} backend requires the {self.backend} package to be installed")
+            raise ValueError(f"Unknown backend: {self.backend}")
+        if self.backend != 'git' and reads_churn(self.rules):
+            raise ValueError(f"churn_minutes reads diff stats with git and cannot be used with the "
+                             f"{self.backend} backend")
+        self.cache_size = cache_size
+        self.collections = 0
+
+        self.entries = OrderedDict()
+        self.collect_locks = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=self.jobs or default_jobs())
+        self.repos = []
+        self.git_dirs = {}
+        self.refresh_repos()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stop the worker pool; the engine cannot be queried afterwards."""
+        self.executor.shutdown(wait=True)
+
+    def refresh_repos(self):
+        """Discover the repositories again, dropping the entries of any that are gone; returns them."""
+        repos = get_git_repos(self.base_dir, max_depth=self.max_depth, exclude=self.exclude, jobs=self.jobs)
+        if self.repo_names:
+            repos = [repo for name in self.repo_names for repo in repos if os.path.basename(repo) == name]
+        git_dirs = {repo: find_git_dirs(repo) for repo in repos}
+        with self.lock:
+            self.repos = repos
+            self.git_dirs = git_dirs
+            for key in [key for key in self.entries if key[0] not in git_dirs]:
+                del self.entries[key]
+        return repos
+
+    def select_repos(self, names=None):
+        """Return the repositories with the given names, in discovery order (all of them by default)."""
+        with self.lock:
+            repos = self.repos
+        if not names:
+            return repos
+        return [repo for name in names for repo in repos if os.path.basename(repo) == name]
+
+    def date_range(self, since=None, until=None):
+        """Resolve since/until to timestamps with git."""
+        repos = self.select_repos()
+        if not (since or until) or not repos:
+            return None, None
+        return resolve_date_range(repos[0], since, until, self.timeout)
+
+    def iter_entries(self, since=None, until=None, author=None, session_timeout_minutes=None, repos=None,
+                     on_skip=None):
+        """Yield the time entries of the repositories in date order.
+
+        Parameters left as None use the engine defaults; ``repos`` selects
+        repositories by name. Repositories not read since their refs last
+        changed are read concurrently by the worker pool. A repository
+        that takes longer than the timeout is left out, and ``on_skip`` is
+        called with its ``RepoResult``. Entries are shared with later
+        queries and must not be modified.
+        """
+        author = author or self.author
+        session_timeout_minutes = session_timeout_minutes or self.session_timeout_minutes
+        date_range = self.date_range(since, until)
+        query = (since, until, author, session_timeout_minutes)
+        futures = [(repo, self.executor.submit(self._repo_entries, repo, query, date_range))
+                   for repo in self.select_repos(repos)]
+        try:
+            runs = []
+            for repo, future in futures:
+                try:
+                    runs.append(future.result())
+                except subprocess.TimeoutExpired:
+                    if on_skip:
+                        on_skip(RepoResult(repo, None, f"timed out after {self.timeout:g}s"))
+            # Ties keep the order of the repositories, as a stable sort of all entries would
+            merged = heapq.merge(*runs, key=attrgetter('timestamp'))
+            if self.session_scope == 'global':
+                # Apportioning updates minutes in place, so it works on copies of the cached entries
+                merged = apportion_sessions((entry.replace() for entry in merged), session_timeout_minutes,
+                                            self.rules)
+            yield from merged
+        finally:
+            for repo, future in futures:
+                future.cancel()
+
+    def _repo_entries(self, repo, query, date_range):
+        """Return a repository's entries for a query sorted by date, reading them only if its refs changed."""
+        with self.lock:
+            git_dirs = self.git_dirs.get(repo) or find_git_dirs(repo)
+        signature = ref_signature(*git_dirs)
+        key = (repo,) + query
+        with self.lock:
+            time_entries = self._current(key, signature, date_range)
+            if time_entries is not None:
+                return time_entries
+            # [lock, queries holding or waiting for it]
+            collect_lock = self.collect_locks.setdefault(key, [threading.Lock(), 0])
+            collect_lock[1] += 1
+        try:
+            with collect_lock[0]:
+                with self.lock:
+                    time_entries = self._current(key, signature, date_range)
+                if time_entries is not None:
+                    return time_entries
+                max_age, min_age = date_range
+                _, _, author, session_timeout_minutes = query
+                time_entries = collect_repo_entries(
+                    repo, f'@{max_age}' if max_age is not None else None,
+                    f'@{min_age}' if min_age is not None else None, author, session_timeout_minutes,
+                    use_cache=self.use_cache, rules=self.rules, backend=self.backend, date_range=date_range,
+                    timeout=self.timeout)
+                time_entries.sort(key=attrgetter('timestamp'))
+                # The bounds are read from the commit cache; without it entries are reused for the same range
+                bounds = date_range_bounds([repo], date_range) if self.use_cache and self.backend == 'git' else None
+                with self.lock:
+                    self.collections += 1
+                    self.entries[key] = (signature, date_range, bounds, time_entries)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.cache_size:
+                        self.entries.popitem(last=False)
+                return time_entries
+        finally:
+            # The last query using a key's lock removes it
+            with self.lock:
+                collect_lock[1] -= 1
+                if not collect_lock[1]:
+                    del self.collect_locks[key]
+
+    def _current(self, key, signature, date_range):
+        """Return the cached entries for a key if still valid; call with the lock held."""
+        cached = self.entries.get(key)
+        if cached is None:
+            return None
+        cached_signature, cached_range, bounds, time_entries = cached
+        if cached_signature != signature:
+            return None
+        if bounds is None and cached_range != date_range:
+            return None
+        if bounds is not None and not within_bounds(bounds, date_range):
+            return None
+        self.entries.move_to_end(key)
+        return time_entries
+
+    def rollup(self, since=None, until=None, author=None, timezone_str=None, session_timeout_minutes=None,
+               repos=None, on_skip=None):
+        """Return the ``Rollup`` of the entries; its weeks are grouped lazily as they are iterated."""
+        author = author or self.author
+        return build_timesheet(self.iter_entries(since, until, author, session_timeout_minutes, repos, on_skip),
+                               timezone_str or self.timezone_str, author, self.timezone_backend)
+
+    def iter_timesheet(self, output_format='text', since=None, until=None, author=None, timezone_str=None,
+                       session_timeout_minutes=None, repos=None, on_skip=None, rollups=False):
+        """Yield the lines of the timesheet, as ``ggts generate`` writes it for the same options."""
+        yield from iter_rollup(self.rollup(since, until, author, timezone_str, session_timeout_minutes, repos,
+                                           on_skip),
+                               output_format, rollups=rollups)
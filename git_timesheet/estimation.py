@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Time estimation for sorted commit histories.
+
+Each commit gets a base number of minutes plus the bonuses of the keyword
+rules its message matches (see ``EstimationRules``) and, if enabled, a
+bonus for the lines it changed, clamped to the gap before the next commit
+when that gap is shorter than the session timeout. When NumPy is installed
+the gaps and clamping for a whole history are computed in one vectorized
+pass; otherwise an equivalent pure Python loop is used. Both return
+exactly the same minutes, including the ``int``/``float`` type of each
+value.
+
+Estimates are made per repository. ``apportion_sessions`` instead clamps
+each commit by the author's next commit in any repository, so switching
+between repositories within a session is not counted once per repository.
+"""
+import re
+import math
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when NumPy is not installed
+    np = None
+
+# Base time: 15 minutes per commit
+BASE_MINUTES = 15
+
+# Built-in keyword rules: (name, pattern, extra minutes). Custom rules with
+# the same name replace these; other custom rules are added after them.
+DEFAULT_RULES = [
+    ('fix', r'fix|bug|issue', 15),
+    ('feature', r'feature|implement|add', 30),
+    ('refactor', r'refactor|clean|improve', 15),
+]
+
+# Rule patterns consisting only of keywords separated by |
+KEYWORD_PATTERN = re.compile(r'[A-Za-z0-9_ -]+(?:\|[A-Za-z0-9_ -]+)*\Z')
+
+# Constructs that change meaning once a rule is joined with the others: inline
+# global flags such as (?i), which must start the whole pattern, and numbered
+# backreferences or conditionals, whose groups are renumbered. An even number
+# of backslashes before them escapes only each other.
+GLOBAL_FLAGS_PATTERN = re.compile(r'(?<!\\)(?:\\\\)*\(\?[aiLmsux]+\)')
+NUMBERED_REFERENCE_PATTERN = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?\([0-9]')
+
+# Commits clamped by the next commit in the same repository, or in any repository
+SESSION_SCOPES = ['repo', 'global']
+
+# Below this many commits the pure Python path is faster than NumPy's setup cost
+NUMPY_MIN_COMMITS = 64
+
+class EstimationRules:
+    """Keyword rules compiled into combined case-insensitive regular expressions.
+
+    Each rule adds its minutes once when its pattern occurs anywhere in a
+    commit message. Messages are scanned once with the alternation of all
+    rules instead of once per rule; at each hit, an anchored pattern with one
+    named group per rule tells which rules match there. The result is the
+    same as searching for every rule separately.
+
+    With ``churn_minutes``, a commit also gets that many minutes for every
+    doubling of the lines it inserted plus deleted, so large changes count
+    for more without a vendored or generated file swamping the estimate.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, base_minutes=BASE_MINUTES, churn_minutes=0):
+        self.rules = [(name, pattern, minutes) for name, pattern, minutes in rules]
+        self.base_minutes = base_minutes
+        self.churn_minutes = churn_minutes
+        self._bonuses = [minutes for _, _, minutes in self.rules]
+        for name, pattern, _ in self.rules:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern for estimation rule '{name}': {e}") from None
+            if GLOBAL_FLAGS_PATTERN.search(pattern):
+                raise ValueError(f"Invalid pattern for estimation rule '{name}': inline global flags are not "
+                                 "supported; scope them as (?flags:...)")
+            if NUMBERED_REFERENCE_PATTERN.search(pattern):
+                raise ValueError(f"Invalid pattern for estimation rule '{name}': numbered backreferences are not "
+                                 "supported; use a named group and (?P=name)")
+        try:
+            # Capturing groups disable the regex engine's literal prefix scan, so
+            # the scanner has none; rules are identified only where it finds a hit
+            self._scanner = re.compile('|'.join(pattern for _, pattern, _ in self.rules), re.I) \
+                if self.rules else None
+            self._identifiers = [self._identifier(first) for first in range(len(self.rules))]
+        except re.error as e:
+            raise ValueError(f"Invalid estimation rules: {e}") from None
+        self._group_rule = {f'_r{i}': i for i in range(len(self.rules))}
+        self._last_at_position = self._find_last_at_position()
+
+    @classmethod
+    def with_defaults(cls, custom_rules=(), base_minutes=BASE_MINUTES, churn_minutes=0):
+        """Return the built-in rules updated with custom ``(name, pattern, minutes)`` rules."""
+        rules = {name: (name, pattern, minutes) for name, pattern, minutes in DEFAULT_RULES}
+        for name, pattern, minutes in custom_rules:
+            rules[name] = (name, pattern, minutes)
+        return cls(list(rules.values()), base_minutes, churn_minutes)
+
+    def _find_last_at_position(self):
+        """Return for each rule whether no later rule can match where it matches.
+
+        Only rules made of plain keywords are analysed: two keyword rules can
+        match at the same position only if a keyword of one starts with a
+        keyword of the other.
+        """
+        keywords = [pattern.lower().split('|') if KEYWORD_PATTERN.match(pattern) else None
+                    for _, pattern, _ in self.rules]
+        last = []
+        for i, words in enumerate(keywords):
+            later = keywords[i + 1:]
+            last.append(words is not None and all(
+                other is not None and not any(a.startswith(b) or b.startswith(a) for a in words for b in other)
+                for other in later))
+        return last
+
+    def _identifier(self, first):
+        """Return the pattern telling which rule from index ``first`` on matches at a position."""
+        return re.compile('|'.join(f'(?P<_r{i}>{pattern})'
+                                   for i, (_, pattern, _) in enumerate(self.rules) if i >= first), re.I)
+
+    def matching_rules(self, message):
+        """Return the indexes of the rules whose pattern occurs in the message."""
+        matched = set()
+        if self._scanner is None:
+            return matched
+        count = len(self.rules)
+        identifiers = self._identifiers
+        group_rule = self._group_rule
+        hit = self._scanner.search(message)
+        while hit is not None:
+            start = hit.start()
+            # An alternation reports only the first rule matching here, so look again after it
+            first = 0
+            while first < count:
+                match = identifiers[first].match(message, start)
+                if match is None:
+                    break
+                rule = group_rule[match.lastgroup]
+                matched.add(rule)
+                if self._last_at_position[rule]:
+                    break
+                first = rule + 1
+            if len(matched) == count:
+                break
+            hit = self._scanner.search(message, start + 1)
+        return matched
+
+    def message_minutes(self, message):
+        """Return the unclamped estimate for a commit message."""
+        return self.base_minutes + sum(self._bonuses[i] for i in self.matching_rules(message))
+
+    def churn_bonus(self, churn):
+        """Return the whole minutes added for a commit that inserted plus deleted ``churn`` lines."""
+        if not self.churn_minutes or not churn:
+            return 0
+        return int(self.churn_minutes * math.log2(1 + churn))
+
+    def commit_minutes(self, message, churn=0):
+        """Return the unclamped estimate for a commit message and its churn."""
+        return self.message_minutes(message) + self.churn_bonus(churn)
+
+DEFAULT_ESTIMATION_RULES = EstimationRules()
+
+def message_minutes(message, rules=None):
+    """Return the unclamped estimate for a commit message."""
+    return (rules or DEFAULT_ESTIMATION_RULES).message_minutes(message)
+
+def estimate_minutes(timestamps, messages, session_timeout_minutes=60, use_numpy=None, rules=None, churn=None):
+    """Estimate minutes for commits sorted by time.
+
+    ``timestamps`` are Unix timestamps in ascending order and ``messages``
+    the matching commit messages. ``rules`` are the ``EstimationRules`` to
+    apply (the built-in rules by default). ``churn`` optionally gives the
+    lines each commit changed, weighted by the rules' ``churn_minutes``.
+    ``use_numpy`` forces (``True``) or disables (``False``) the vectorized
+    path; by default it is used for larger histories when NumPy is
+    available.
+    """
+    rules = rules or DEFAULT_ESTIMATION_RULES
+    if use_numpy is None:
+        use_numpy = np is not None and len(timestamps) >= NUMPY_MIN_COMMITS
+    if not rules.churn_minutes:
+        churn = None
+    if use_numpy:
+        if np is None:
+            raise ImportError("NumPy is required for vectorized time estimation")
+        return _estimate_minutes_numpy(timestamps, messages, session_timeout_minutes, rules, churn)
+    return _estimate_minutes_python(timestamps, messages, session_timeout_minutes, rules, churn)
+
+def _estimate_minutes_python(timestamps, messages, session_timeout_minutes, rules, churn=None):
+    """Estimate minutes one commit at a time."""
+    minutes = []
+    last = len(timestamps) - 1
+    for i, message in enumerate(messages):
+        time_spent = rules.message_minutes(message)
+        if churn is not None:
+            time_spent += rules.churn_bonus(churn[i])
+
+        # Check time gap to next commit
+        if i < last:
+            time_gap = (timestamps[i + 1] - timestamps[i]) / 60
+
+            # If commits are close together (within the configured session timeout), they're likely part of the same work session
+            if time_gap < session_timeout_minutes:
+                time_spent = min(time_spent, time_gap)
+
+        minutes.append(time_spent)
+    return minutes
+
+def _estimate_minutes_numpy(timestamps, messages, session_timeout_minutes, rules, churn=None):
+    """Estimate minutes for a whole history with array operations."""
+    count = len(timestamps)
+    if not count:
+        return []
+
+    # Rules are evaluated once per distinct message and broadcast back
+    message_index = {}
+    inverse = np.fromiter((message_index.setdefault(message, len(message_index)) for message in messages),
+                          dtype=np.intp, count=count)
+    unique_base = np.fromiter((rules.message_minutes(message) for message in message_index),
+                              dtype=np.int64, count=len(message_index))
+    base = unique_base[inverse]
+    if churn is not None:
+        # Likewise the bonus is worked out once per distinct line count
+        bonuses = {lines: rules.churn_bonus(lines) for lines in set(churn)}
+        base += np.fromiter((bonuses[lines] for lines in churn), dtype=np.int64, count=count)
+
+    gaps = np.empty(count, dtype=np.float64)
+    gaps[:-1] = np.diff(np.asarray(timestamps, dtype=np.float64)) / 60
+    gaps[-1] = np.inf
+
+    # min(estimate, gap) keeps the integer estimate on ties, so only strictly shorter gaps clamp
+    clamped = (gaps < session_timeout_minutes) & (gaps < base)
+    return [gap if clamp else estimate
+            for estimate, gap, clamp in zip(base.tolist(), gaps.tolist(), clamped.tolist())]
+
+def apportion_sessions(time_entries, session_timeout_minutes=60, rules=None, by_author=False):
+    """Re-estimate entries in date order across repositories, yielding them in the same order.
+
+    Each entry's estimate is clamped to the gap before the next entry in
+    any repository, as ``estimate_minutes`` does within one repository,
+    so a commit's time ends where the next one's starts and overlapping
+    sessions in several repositories are counted once. With ``by_author``
+    only the next entry by the same author name and email clamps it.
+
+    Works in one pass over an iterator: an entry is yielded (with its
+    ``minutes`` updated in place) as soon as its next entry is seen or an
+    entry a session timeout later shows there is none, so only the
+    entries of the last session timeout are held.
+    """
+    rules = rules or DEFAULT_ESTIMATION_RULES
+    timeout_seconds = session_timeout_minutes * 60
+    # Entries not yet yielded, in order, as [entry, estimate, done]
+    waiting = deque()
+    # The last waiting entry of each author (or of everyone)
+    last_by_key = {}
+
+    for entry in time_entries:
+        timestamp = entry.timestamp
+        key = (entry.author_name, entry.author_email) if by_author else None
+        previous = last_by_key.get(key)
+        if previous is not None:
+            gap = (timestamp - previous[0].timestamp) / 60
+            # min(estimate, gap) keeps the integer estimate on ties, as estimate_minutes does
+            previous[0].minutes = gap if gap < session_timeout_minutes and gap < previous[1] else previous[1]
+            previous[2] = True
+        estimate = rules.message_minutes(entry.message)
+        if entry.churn:
+            estimate += rules.churn_bonus(entry.churn)
+        item = [entry, estimate, False]
+        waiting.append(item)
+        last_by_key[key] = item
+
+        while waiting:
+            first = waiting[0]
+            if not first[2]:
+                # No later entry is less than a session timeout after it, so it keeps its estimate
+                if timestamp - first[0].timestamp < timeout_seconds:
+                    break
+                first[0].minutes = first[1]
+                first_key = (first[0].author_name, first[0].author_email) if by_author else None
+                if last_by_key.get(first_key) is first:
+                    del last_by_key[first_key]
+            yield waiting.popleft()[0]
+
+    for entry, estimate, done in waiting:
+        if not done:
+            entry.minutes = estimate
+        yield entry
+
@@ -1,173 +1,625 @@
 #!/usr/bin/env python3
 import os
-from datetime import datetime, timedelta
-from collections import defaultdict
-from .timezone_utils import convert_to_timezone, get_timezone_abbr
+import json
+from bisect import bisect_right
+from itertools import chain
+from operator import attrgetter
+from datetime import date, datetime, timedelta
+from collections import defaultdict, namedtuple
+from .timezone_utils import get_timezone, get_timezone_abbr, fixed_offset, offset_intervals
+from .models import TimeEntry, date_to_timestamp
+from .profiling import stage, timed_iter
 
-def format_timesheet(time_entries, output_format='text', timezone_str='UTC', author_filter='mcgarrah'):
+NO_ACTIVITY = "No git activity found in the specified time period."
+NO_AUTHOR_ACTIVITY = "No git activity found for the specified author in the given time period."
+
+# A timesheet grouped and totalled once and rendered by every output format:
+# weeks, their days, the repositories worked on each day and the tasks (commits
+# with similar messages) in each. ``message`` is set instead for a timesheet
+# without entries.
+Rollup = namedtuple('Rollup', ['weeks', 'message'])
+WeekRollup = namedtuple('WeekRollup', ['week_start', 'total', 'days'])
+DayRollup = namedtuple('DayRollup', ['day', 'name', 'total', 'entries', 'repos'])
+RepoRollup = namedtuple('RepoRollup', ['repo', 'total', 'entries', 'tasks'])
+TaskRollup = namedtuple('TaskRollup', ['name', 'total', 'entries', 'first'])
+
+# An entry placed in the timesheet's timezone: its Unix ``timestamp``, the
+# wall-clock ``local_time`` as seconds since the epoch and the UTC offset and
+# abbreviation in effect. Dates and times are only formatted when rendered.
+LocalEntry = namedtuple('LocalEntry', ['entry', 'timestamp', 'local_time', 'utc_offset', 'tz_abbr'])
+
+# Keys of each NDJSON record, by its ``type``, in the order they are written.
+# The schema is stable: keys are only ever added, never renamed or removed.
+NDJSON_SCHEMA = {
+    'entry': ('type', 'date', 'day', 'week', 'timezone', 'minutes', 'hours', 'repository', 'commit', 'message',
+              'author_name', 'author_email'),
+    'day': ('type', 'date', 'day', 'week', 'minutes', 'hours', 'commits', 'author'),
+    'week': ('type', 'week', 'minutes', 'hours', 'commits', 'author'),
+}
+
+# Seconds of UTC offsets looked up at a time for streamed entries
+OFFSET_WINDOW = 31 * 86400
+
+# Day ordinal (``date.toordinal()``) of the Unix epoch
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def format_timesheet(time_entries, output_format='text', timezone_str='UTC', author_filter='mcgarrah',
+                     timezone_backend='pytz', profiler=None, rollups=False):
     """Format time entries into a weekly timesheet."""
+    return '\n'.join(iter_timesheet(time_entries, output_format, timezone_str, author_filter, timezone_backend,
+                                    profiler, rollups))
+
+def write_timesheet(time_entries, sink, output_format='text', timezone_str='UTC', author_filter='mcgarrah',
+                    timezone_backend='pytz', profiler=None, rollups=False):
+    """Write a timesheet to a file-like object line by line as it is rendered.
+
+    The text written is identical to ``format_timesheet``; nothing is held
+    in memory beyond the line being written. Returns the number of lines
+    written.
+    """
+    with stage(profiler, 'format') as timing:
+        timing.items = write_lines(iter_timesheet(time_entries, output_format, timezone_str, author_filter,
+                                                  timezone_backend, profiler, rollups), sink)
+    return timing.items
+
+def write_lines(lines, sink):
+    """Write lines to a file-like object separated by newlines, without a trailing newline.
+
+    Returns the number of lines written.
+    """
+    count = 0
+    lines = iter(lines)
+    for line in lines:
+        sink.write(line)
+        count += 1
+        break
+    for line in lines:
+        sink.write('\n' + line)
+        count += 1
+    return count
+
+def iter_timesheet(time_entries, output_format='text', timezone_str='UTC', author_filter='mcgarrah',
+                   timezone_backend='pytz', profiler=None, rollups=False):
+    """Yield the lines of a weekly timesheet for the time entries.
+
+    ``rollups`` adds day and week total records to NDJSON output.
+    """
+    yield from iter_rollup(build_timesheet(time_entries, timezone_str, author_filter, timezone_backend, profiler),
+                           output_format, rollups=rollups)
+
+def build_timesheet(time_entries, timezone_str='UTC', author_filter='mcgarrah', timezone_backend='pytz',
+                    profiler=None):
+    """Filter, localize and group the time entries into a ``Rollup`` that renders in any format.
+
+    ``time_entries`` may also be an iterator of entries in date order, such
+    as ``EntryRuns.merged()``. The rollup's ``weeks`` are then an iterator
+    too, built a week at a time as they are rendered, so only a week or two
+    of entries is held in memory; it can be rendered once.
+    """
+    if iter(time_entries) is time_entries:
+        return _build_streamed_timesheet(time_entries, timezone_str, author_filter, timezone_backend, profiler)
     if not time_entries:
-        return "No git activity found in the specified time period."
+        return Rollup([], NO_ACTIVITY)
         
     # Filter for entries with author_filter in author name or email
     if author_filter:
-        filtered_entries = [entry for entry in time_entries 
-                        if author_filter.lower() in entry['author_name'].lower() or 
-                            author_filter.lower() in entry['author_email'].lower()]
+        filtered_entries = filter_by_author(time_entries, author_filter)
         
         if not filtered_entries:
-            return f"No git activity found for the specified author in the given time period."
+            return Rollup([], NO_AUTHOR_ACTIVITY)
             
         time_entries = filtered_entries
     
-    # Convert dates to specified timezone
-    for entry in time_entries:
-        entry['date'] = convert_to_timezone(entry['date'], timezone_str)
+    # Convert dates to specified timezone, leaving the caller's entries untouched
+    with stage(profiler, 'timezone') as timing:
+        time_entries = localize_entries(time_entries, timezone_str, timezone_backend)
+        timing.items = len(time_entries)
     
-    # Group by week and day
-    weeks = defaultdict(lambda: defaultdict(list))
+    # Group by week, day, repository and task, with their totals
+    with stage(profiler, 'group') as timing:
+        rollup = build_rollup(group_by_week(time_entries))
+        timing.items = len(rollup.weeks)
+    return rollup
+
+def filter_by_author(time_entries, author_filter):
+    """Return the entries with ``author_filter`` in the author name or email, ignoring case."""
+    return [entry for entry in time_entries 
+            if author_filter.lower() in entry['author_name'].lower() or 
+                author_filter.lower() in entry['author_email'].lower()]
+
+def _build_streamed_timesheet(time_entries, timezone_str, author_filter, timezone_backend, profiler=None):
+    """Return the ``Rollup`` of an iterator of entries in date order, with its weeks built lazily.
+
+    The timezone and group stages are timed as the weeks are pulled.
+    """
+    first = next(time_entries, None)
+    if first is None:
+        return Rollup([], NO_ACTIVITY)
+    time_entries = chain([first], time_entries)
+    if author_filter:
+        author_filter = author_filter.lower()
+        time_entries = (entry for entry in time_entries
+                        if author_filter in entry['author_name'].lower() or
+                            author_filter in entry['author_email'].lower())
+        first = next(time_entries, None)
+        if first is None:
+            return Rollup([], NO_AUTHOR_ACTIVITY)
+        time_entries = chain([first], time_entries)
+    local_entries = timed_iter(profiler, 'timezone', iter_local_entries(time_entries, timezone_str, timezone_backend))
+    return Rollup(timed_iter(profiler, 'group', iter_week_rollups(local_entries)), None)
+
+def localize_entries(time_entries, timezone_str='UTC', timezone_backend='pytz'):
+    """Return a ``LocalEntry`` for each entry, in the same order, placing it in the timezone.
+
+    The timezone is consulted once per change of UTC offset between the
+    earliest and latest entry rather than once per entry; the caller's
+    entries are left untouched.
+    """
+    if not time_entries:
+        return []
+    timestamps = [entry_timestamp(entry) for entry in time_entries]
+    intervals = offset_intervals(get_timezone(timezone_str, timezone_backend), min(timestamps), max(timestamps))
+    if len(intervals) == 1:
+        start, end, utc_offset, tz_abbr = intervals[0]
+        return [LocalEntry(entry, timestamp, timestamp + utc_offset, utc_offset, tz_abbr)
+                for entry, timestamp in zip(time_entries, timestamps)]
+    starts = [interval[0] for interval in intervals]
+    local_entries = []
+    for entry, timestamp in zip(time_entries, timestamps):
+        start, end, utc_offset, tz_abbr = intervals[bisect_right(starts, timestamp) - 1]
+        local_entries.append(LocalEntry(entry, timestamp, timestamp + utc_offset, utc_offset, tz_abbr))
+    return local_entries
+
+def iter_local_entries(time_entries, timezone_str='UTC', timezone_backend='pytz'):
+    """Yield a ``LocalEntry`` for each entry of an iterable, like ``localize_entries`` without a list.
+
+    UTC offsets are looked up for ``OFFSET_WINDOW`` seconds from an entry
+    at a time, so entries in date order consult the timezone about once a
+    month.
+    """
+    tz = get_timezone(timezone_str, timezone_backend)
+    window_start = window_end = None
     for entry in time_entries:
-        date = entry['date']
-        week_start = (date - timedelta(days=date.weekday())).strftime('%Y-%m-%d')
-        day = date.strftime('%Y-%m-%d')
-        weeks[week_start][day].append(entry)
+        timestamp = entry_timestamp(entry)
+        if window_start is None or not window_start <= timestamp < window_end:
+            window_start, window_end = timestamp, timestamp + OFFSET_WINDOW
+            intervals = offset_intervals(tz, window_start, window_end)
+            starts = [interval[0] for interval in intervals]
+        start, end, utc_offset, tz_abbr = intervals[bisect_right(starts, timestamp) - 1]
+        yield LocalEntry(entry, timestamp, timestamp + utc_offset, utc_offset, tz_abbr)
+
+def entry_timestamp(entry):
+    """Return the Unix timestamp of a ``TimeEntry`` or entry dictionary."""
+    if isinstance(entry, TimeEntry):
+        return entry.timestamp
+    return date_to_timestamp(entry['date'])[0]
+
+def day_ordinal(local_time):
+    """Return the ``date.toordinal()`` of a local time in seconds since the epoch."""
+    return int(local_time // 86400) + EPOCH_ORDINAL
+
+def clock(local_time):
+    """Return the HH:MM of a local time in seconds since the epoch."""
+    seconds = int(local_time % 86400)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}"
+
+def group_by_week(local_entries, weeks=None):
+    """Group ``localize_entries`` results into ``weeks[week_start][day]`` lists, keyed by day ordinals.
+
+    Weeks start on Monday. Entries are added to ``weeks`` if it is given.
+    """
+    if weeks is None:
+        weeks = defaultdict(lambda: defaultdict(list))
+    for local_entry in local_entries:
+        day = int(local_entry.local_time // 86400) + EPOCH_ORDINAL
+        # Ordinal 1 (0001-01-01) is a Monday
+        weeks[day - (day - 1) % 7][day].append(local_entry)
+    return weeks
+
+def iter_week_rollups(local_entries):
+    """Yield the ``WeekRollup`` of each week of ``LocalEntry`` records in date order once it is complete.
+
+    A later entry's local time is at most a day earlier than an earlier
+    entry's (when a UTC offset goes back), so a week is complete once an
+    entry is a day past its end.
+    """
+    weeks = defaultdict(lambda: defaultdict(list))
+    last_day = None
+    for local_entry in local_entries:
+        day = int(local_entry.local_time // 86400) + EPOCH_ORDINAL
+        if day != last_day:
+            last_day = day
+            complete = [week for week in weeks if week + 8 <= day]
+            if complete:
+                yield from build_rollup({week: weeks.pop(week) for week in complete}).weeks
+        weeks[day - (day - 1) % 7][day].append(local_entry)
+    yield from build_rollup(weeks).weeks
+
+def build_rollup(weeks):
+    """Total entries grouped with ``group_by_week`` by week, day, repository and task.
+
+    Weeks, days and repositories are sorted. Entries keep their order within
+    a repository, and tasks the order of their first entry; each day also
+    lists its entries in date order. A ``Rollup`` is returned unchanged.
+    Each entry is read once, and totals are added up in entry order so they
+    match summing the entries. Day and week keys become YYYY-MM-DD strings
+    here, once per day.
+
+    Weeks keyed by YYYY-MM-DD strings holding entries with localized dates,
+    as ``group_by_week`` returned them before, are accepted too.
+    """
+    if isinstance(weeks, Rollup):
+        return weeks
+    return Rollup([build_week_rollup(week_start, [build_day_rollup(day, entries)
+                                                  for day, entries in sorted(days.items())])
+                   for week_start, days in sorted(weeks.items())], None)
+
+def build_day_rollup(day, entries):
+    """Return the ``DayRollup`` of a day's entries, grouped by repository and task as ``build_rollup`` does."""
+    if not isinstance(entries[0], LocalEntry):
+        entries = [_local_entry(entry) for entry in entries]
+    day_total = 0
+    repos = defaultdict(list)
+    for local_entry in entries:
+        entry = local_entry.entry
+        minutes = entry['minutes']
+        day_total += minutes
+        repos[entry['repo']].append((local_entry, minutes))
     
-    if output_format == 'text':
-        return format_text(weeks)
+    if isinstance(day, str):
+        day_str, weekday = day, day_name(day)
+    else:
+        day_date = date.fromordinal(day)
+        day_str, weekday = day_date.isoformat(), day_date.strftime('%A')
+    # Entries are usually collected in date order already, which the stable sort keeps cheap
+    return DayRollup(day_str, weekday, day_total, sorted(entries, key=attrgetter('timestamp')),
+                     [_repo_rollup(repo, repo_entries) for repo, repo_entries in sorted(repos.items())])
+
+def build_week_rollup(week_start, day_rollups):
+    """Return the ``WeekRollup`` of a week's ``DayRollup`` records, in day order."""
+    week_total = 0
+    for day_rollup in day_rollups:
+        week_total += day_rollup.total
+    if not isinstance(week_start, str):
+        week_start = date.fromordinal(week_start).isoformat()
+    return WeekRollup(week_start, week_total, day_rollups)
+
+def _local_entry(entry):
+    """Return the ``LocalEntry`` of an entry whose date is already in the timesheet's timezone."""
+    timestamp, utc_offset = date_to_timestamp(entry['date'])
+    return LocalEntry(entry, timestamp, timestamp + utc_offset, utc_offset, get_timezone_abbr(entry['date']))
+
+def _repo_rollup(repo, entries):
+    """Total a repository's ``(local_entry, minutes)`` for a day, grouping tasks by the first 30 characters of their message."""
+    repo_total = 0
+    tasks = {}
+    for local_entry, minutes in entries:
+        repo_total += minutes
+        task_name = local_entry.entry['message'][:30]
+        task = tasks.get(task_name)
+        if task is None:
+            tasks[task_name] = [minutes, [local_entry], local_entry]
+            continue
+        task[0] += minutes
+        task[1].append(local_entry)
+        if local_entry.timestamp < task[2].timestamp:
+            task[2] = local_entry
+    return RepoRollup(repo, repo_total, [local_entry for local_entry, minutes in entries],
+                      [TaskRollup(task_name, task_total, task_entries, first)
+                       for task_name, (task_total, task_entries, first) in tasks.items()])
+
+def iter_rollup(rollup, output_format='text', author=None, rollups=False):
+    """Yield the lines of a timesheet rendered from a ``Rollup``.
+
+    ``author`` titles a Markdown team section and is named in NDJSON total
+    records, which ``rollups`` adds.
+    """
+    if rollup.message:
+        yield from iter_empty(rollup.message, output_format)
     elif output_format == 'csv':
-        return format_csv(weeks, time_entries)
+        yield from iter_csv(rollup)
     elif output_format in ['markdown', 'md']:
-        return format_markdown(weeks)
+        yield from iter_markdown(rollup, author)
+    elif output_format == 'json':
+        yield from iter_json(rollup)
+    elif output_format == 'ndjson':
+        yield from iter_ndjson(rollup, rollups, author)
     else:
-        return format_text(weeks)  # Default to text
+        yield from iter_text(rollup)  # Default to text
+
+def iter_author_timesheets(sections, output_format='text', timezone_str='UTC', timezone_backend='pytz',
+                           rollups=False):
+    """Yield the lines of a team timesheet with a section for each author.
+
+    ``sections`` are ``(author, time_entries, author_filter)`` tuples as
+    returned by ``partition_by_author``; sections that are not lists are
+    read as streams in date order. Text and Markdown repeat each
+    author's timesheet, as ``iter_timesheet`` renders it, under a heading;
+    CSV, JSON and NDJSON list the authors' rows one after another in a
+    single table, array or stream, since every row names its author.
+    """
+    if not sections:
+        yield from iter_empty(NO_ACTIVITY, output_format)
+        return
+    author_rollups = [(author, build_timesheet(time_entries if isinstance(time_entries, list) else iter(time_entries),
+                                               timezone_str, author_filter, timezone_backend))
+                      for author, time_entries, author_filter in sections]
+    
+    if output_format in ('csv', 'json', 'ndjson'):
+        active = [(author, rollup) for author, rollup in author_rollups if not rollup.message]
+        if not active:
+            has_entries = any(time_entries for author, time_entries, author_filter in sections)
+            yield from iter_empty(NO_AUTHOR_ACTIVITY if has_entries else NO_ACTIVITY, output_format)
+        elif output_format == 'csv':
+            yield CSV_HEADER
+            for author, rollup in active:
+                yield from iter_csv_rows(rollup)
+        elif output_format == 'json':
+            yield from iter_json_array(record for author, rollup in active for record in iter_json_records(rollup))
+        else:
+            for author, rollup in active:
+                yield from iter_ndjson(rollup, rollups, author)
+        return
+    
+    for index, (author, rollup) in enumerate(author_rollups):
+        if index:
+            yield ""
+        if output_format in ['markdown', 'md']:
+            # Timesheets without activity are just a message, so title them here
+            if rollup.message:
+                yield from markdown_header(author)
+        else:
+            yield f"Author: {author}"
+            yield "#" * 80
+        yield from iter_rollup(rollup, output_format, author)
+
+def iter_empty(message, output_format='text'):
+    """Yield the lines of a timesheet without entries: the message, an empty JSON array or no NDJSON records."""
+    if output_format == 'json':
+        yield "[]"
+    elif output_format != 'ndjson':
+        yield message
 
 def format_text(weeks):
     """Format timesheet as plain text."""
-    result = []
-    
-    for week_start, days in sorted(weeks.items()):
-        result.append(f"\\nWeek of {week_start}")
-        result.append("=" * 80)
+    return '\n'.join(iter_text(weeks))
+
+def iter_text(weeks):
+    """Yield the lines of a plain text timesheet for ``group_by_week`` weeks or a ``Rollup``."""
+    for week in build_rollup(weeks).weeks:
+        yield from text_week_header(week.week_start)
         
-        week_total = 0
-        for day, entries in sorted(days.items()):
-            day_date = datetime.strptime(day, '%Y-%m-%d')
-            day_name = day_date.strftime('%A')
-            day_total = sum(entry['minutes'] for entry in entries)
-            week_total += day_total
-            
-            result.append(f"\\n{day_name}, {day} - Total: {day_total/60:.2f} hours")
-            result.append("-" * 80)
-            
-            # Group by repository
-            repos = defaultdict(list)
-            for entry in entries:
-                repos[entry['repo']].append(entry)
+        for day in week.days:
+            yield from text_day_header(day.day, day.total, day.name)
             
-            for repo, repo_entries in sorted(repos.items()):
-                repo_name = os.path.basename(repo)
-                repo_total = sum(entry['minutes'] for entry in repo_entries)
-                result.append(f"\\n  {repo_name} - {repo_total/60:.2f} hours")
+            for repo in day.repos:
+                yield from text_repo_header(repo.repo, repo.total)
                 
-                for entry in repo_entries:
-                    time_str = f"{entry['minutes']/60:.2f}h"
-                    commit_time = entry['date'].strftime('%H:%M')
-                    tz_abbr = get_timezone_abbr(entry['date'])
-                    result.append(f"    {commit_time} {tz_abbr} - {time_str} - {entry['message'][:60]} ({entry['commit'][:7]}) - {entry['author_name']}")
+                for local_entry in repo.entries:
+                    entry = local_entry.entry
+                    yield text_entry_line(clock(local_entry.local_time), local_entry.tz_abbr, entry['minutes'],
+                                          entry['message'], entry['commit'], entry['author_name'])
             
-        result.append(f"\\nWeek Total: {week_total/60:.2f} hours\\n")
-        result.append("=" * 80)
-    
-    return "\\n".join(result).replace('\\n', '\n')
+        yield from text_week_footer(week.total)
+
+# Line templates shared with reports rendered from the commit store (see ``store``)
+
+def day_name(day):
+    """Return the weekday name of a YYYY-MM-DD date."""
+    return datetime.strptime(day, '%Y-%m-%d').strftime('%A')
+
+def text_week_header(week_start):
+    """Yield the lines starting a week in a plain text timesheet."""
+    yield ""
+    yield f"Week of {week_start}"
+    yield "=" * 80
+
+def text_day_header(day, day_total, weekday=None):
+    """Yield the lines starting a day in a plain text timesheet; ``weekday`` saves parsing ``day``."""
+    yield ""
+    yield f"{weekday or day_name(day)}, {day} - Total: {day_total/60:.2f} hours"
+    yield "-" * 80
+
+def text_repo_header(repo, repo_total):
+    """Yield the lines starting a repository within a day in a plain text timesheet."""
+    yield ""
+    yield f"  {os.path.basename(repo)} - {repo_total/60:.2f} hours"
 
-def format_csv(weeks, time_entries):
-    """Format timesheet as CSV."""
-    output = []
+def text_entry_line(commit_time, tz_abbr, minutes, message, commit, author_name):
+    """Return the line for one commit in a plain text timesheet."""
+    return f"    {commit_time} {tz_abbr} - {minutes/60:.2f}h - {message[:60]} ({commit[:7]}) - {author_name}"
+
+def text_week_footer(week_total):
+    """Yield the lines ending a week in a plain text timesheet."""
+    yield ""
+    yield f"Week Total: {week_total/60:.2f} hours"
+    yield ""
+    yield "=" * 80
+
+def format_csv(weeks, time_entries=None):
+    """Format timesheet as CSV.
     
-    # Write to string buffer
-    output.append("Date,Day,Week,Start Time,Timezone,Duration (min),Duration (hours),Repository,Commit,Message,Author")
+    Rows are taken from ``weeks``; ``time_entries`` is no longer needed.
+    """
+    return '\n'.join(iter_csv(weeks))
+
+CSV_HEADER = "Date,Day,Week,Start Time,Timezone,Duration (min),Duration (hours),Repository,Commit,Message,Author"
+
+def iter_csv(weeks, time_entries=None):
+    """Yield the lines of a CSV timesheet for ``group_by_week`` weeks or a ``Rollup``."""
+    yield CSV_HEADER
+    yield from iter_csv_rows(weeks)
+
+def iter_csv_rows(weeks):
+    """Yield the CSV rows of the entries in date order."""
+    for week in build_rollup(weeks).weeks:
+        for day in week.days:
+            for local_entry in day.entries:
+                entry = local_entry.entry
+                yield csv_line(day.day, day.name, week.week_start, clock(local_entry.local_time), local_entry.tz_abbr,
+                               entry['minutes'], entry['repo'], entry['commit'], entry['message'],
+                               entry['author_name'])
+
+def csv_line(date_str, day_name, week_start, time_str, tz_abbr, minutes, repo, commit, message, author_name):
+    """Return the CSV row for one commit."""
+    repo_name = os.path.basename(repo)
     
-    for entry in sorted(time_entries, key=lambda x: x['date']):
-        date = entry['date']
-        week_start = (date - timedelta(days=date.weekday())).strftime('%Y-%m-%d')
-        day_name = date.strftime('%A')
-        date_str = date.strftime('%Y-%m-%d')
-        time_str = date.strftime('%H:%M')
-        tz_abbr = get_timezone_abbr(date)
-        repo_name = os.path.basename(entry['repo'])
-        
-        # Escape any commas in the message
-        message = entry['message'].replace('"', '""')
-        
-        line = f'"{date_str}","{day_name}","{week_start}","{time_str}","{tz_abbr}",{entry["minutes"]},{entry["minutes"]/60:.2f},"{repo_name}","{entry["commit"][:7]}","{message}","{entry["author_name"]}"'
-        output.append(line)
+    # Escape any commas in the message
+    message = message.replace('"', '""')
     
-    return "\\n".join(output).replace('\\n', '\n')
+    return f'"{date_str}","{day_name}","{week_start}","{time_str}","{tz_abbr}",{minutes},{minutes/60:.2f},"{repo_name}","{commit[:7]}","{message}","{author_name}"'
+
+
+def format_json(weeks, time_entries=None):
+    """Format timesheet as JSON."""
+    return '\n'.join(iter_json(weeks))
+
+def iter_json(weeks, time_entries=None):
+    """Yield the lines of a JSON timesheet: an array with one object per commit, one per line."""
+    yield from iter_json_array(iter_json_records(weeks))
+
+def iter_json_records(weeks):
+    """Yield the encoded JSON objects of the entries in date order."""
+    for week in build_rollup(weeks).weeks:
+        for day in week.days:
+            for local_entry in day.entries:
+                entry = local_entry.entry
+                yield json_record(local_date(local_entry), local_entry.tz_abbr, entry['minutes'], entry['repo'],
+                                  entry['commit'], entry['message'], entry['author_name'], entry['author_email'],
+                                  day.name, week.week_start)
+
+def local_date(local_entry):
+    """Return the datetime of a ``LocalEntry`` at its UTC offset."""
+    return datetime.fromtimestamp(local_entry.timestamp, fixed_offset(local_entry.utc_offset))
+
+def iter_json_array(records):
+    """Yield the lines of a JSON array of already encoded records, one record per line."""
+    yield "["
+    record = None
+    for next_record in records:
+        if record is not None:
+            yield record + ","
+        record = next_record
+    if record is not None:
+        yield record
+    yield "]"
+
+def json_record(date, tz_abbr, minutes, repo, commit, message, author_name, author_email, weekday=None,
+                week_start=None):
+    """Return the JSON object for one commit, with ``date`` in the timesheet's timezone.
+
+    ``weekday`` and ``week_start`` save deriving them from ``date``.
+    """
+    return json.dumps(entry_fields(date, tz_abbr, minutes, repo, commit, message, author_name, author_email,
+                                   weekday, week_start), ensure_ascii=False)
+
+def entry_fields(date, tz_abbr, minutes, repo, commit, message, author_name, author_email, weekday=None,
+                 week_start=None, record_type=None):
+    """Return the fields of the JSON and NDJSON objects for one commit, led by ``type`` if given."""
+    fields = {'type': record_type} if record_type else {}
+    fields.update({
+        'date': date.isoformat(),
+        'day': weekday or date.strftime('%A'),
+        'week': week_start or (date - timedelta(days=date.weekday())).strftime('%Y-%m-%d'),
+        'timezone': tz_abbr,
+        'minutes': minutes,
+        'hours': round(minutes / 60, 2),
+        'repository': os.path.basename(repo),
+        'commit': commit,
+        'message': message,
+        'author_name': author_name,
+        'author_email': author_email,
+    })
+    return fields
+
+def iter_ndjson(weeks, rollups=False, author=None):
+    """Yield the lines of an NDJSON timesheet: one JSON object per commit, per line, in date order.
+
+    Every object has a ``type`` and the keys ``NDJSON_SCHEMA`` lists for
+    it. ``rollups`` follows each day's commits with a ``day`` record and
+    each week with a ``week`` record holding their totals; ``author``
+    names the team report section they belong to (null otherwise).
+    """
+    for week in build_rollup(weeks).weeks:
+        week_commits = 0
+        for day in week.days:
+            for local_entry in day.entries:
+                entry = local_entry.entry
+                yield ndjson_record(local_date(local_entry), local_entry.tz_abbr, entry['minutes'], entry['repo'],
+                                    entry['commit'], entry['message'], entry['author_name'],
+                                    entry['author_email'], day.name, week.week_start)
+            week_commits += len(day.entries)
+            if rollups:
+                yield json.dumps({'type': 'day', 'date': day.day, 'day': day.name, 'week': week.week_start,
+                                  'minutes': day.total, 'hours': round(day.total / 60, 2),
+                                  'commits': len(day.entries), 'author': author}, ensure_ascii=False)
+        if rollups:
+            yield json.dumps({'type': 'week', 'week': week.week_start, 'minutes': week.total,
+                              'hours': round(week.total / 60, 2), 'commits': week_commits, 'author': author},
+                             ensure_ascii=False)
+
+def ndjson_record(date, tz_abbr, minutes, repo, commit, message, author_name, author_email, weekday=None,
+                  week_start=None):
+    """Return the NDJSON ``entry`` record for one commit: its JSON object with a leading ``type``."""
+    return json.dumps(entry_fields(date, tz_abbr, minutes, repo, commit, message, author_name, author_email,
+                                   weekday, week_start, 'entry'), ensure_ascii=False)
 
 def format_markdown(weeks):
     """Format timesheet as Markdown."""
-    result = []
-    
-    result.append("# Git Activity Timesheet\\n")
+    return '\n'.join(iter_markdown(weeks))
+
+def iter_markdown(weeks, author=None):
+    """Yield the lines of a Markdown timesheet for ``group_by_week`` weeks or a ``Rollup``."""
+    yield from markdown_header(author)
     
-    for week_start, days in sorted(weeks.items()):
-        result.append(f"## Week of {week_start}\\n")
-        
-        # Create a table for the week
-        result.append("| Day | Date | Time | TZ | Repository | Hours | Description |")
-        result.append("|-----|------|------|-------|------------|-------|-------------|")
+    for week in build_rollup(weeks).weeks:
+        yield from markdown_week_header(week.week_start)
         
-        week_total = 0
-        
-        # Sort days to ensure Monday-Sunday order
-        sorted_days = sorted(days.items())
-        
-        for day, entries in sorted_days:
-            day_date = datetime.strptime(day, '%Y-%m-%d')
-            day_name = day_date.strftime('%A')
-            day_total = sum(entry['minutes'] for entry in entries)
-            week_total += day_total
-            
-            # Group by repository
-            repos = defaultdict(list)
-            for entry in entries:
-                repos[entry['repo']].append(entry)
-            
+        for day in week.days:
             # First row for the day includes the day name
             first_row = True
             
-            for repo, repo_entries in sorted(repos.items()):
-                repo_name = os.path.basename(repo)
-                repo_total = sum(entry['minutes'] for entry in repo_entries)
-                
-                # Group entries by similar tasks
-                tasks = defaultdict(list)
-                for entry in repo_entries:
-                    # Use first 30 chars of message as key
-                    key = entry['message'][:30]
-                    tasks[key].append(entry)
-                
-                for task_name, task_entries in tasks.items():
-                    task_total = sum(entry['minutes'] for entry in task_entries)
-                    task_desc = f"{task_name}... ({len(task_entries)} commits)"
-                    
-                    # Get the time of the first commit in this task group
-                    first_commit = min(task_entries, key=lambda x: x['date'])
-                    first_commit_time = first_commit['date'].strftime('%H:%M')
-                    tz_abbr = get_timezone_abbr(first_commit['date'])
-                    
-                    if first_row:
-                        result.append(f"| {day_name} | {day} | {first_commit_time} | {tz_abbr} | {repo_name} | {task_total/60:.2f} | {task_desc} |")
-                        first_row = False
-                    else:
-                        result.append(f"|  | | {first_commit_time} | {tz_abbr} | {repo_name} | {task_total/60:.2f} | {task_desc} |")
+            for repo in day.repos:
+                for task in repo.tasks:
+                    # Start at the time of the first commit in this task group
+                    yield markdown_task_line(day.day, first_row, clock(task.first.local_time), task.first.tz_abbr,
+                                             repo.repo, task.total, task.name, len(task.entries), day.name)
+                    first_row = False
             
-            # Add day total
-            result.append(f"| **Total** | | | | | **{day_total/60:.2f}** | |")
-            result.append("| | | | | | | |")  # Empty row for readability
+            yield from markdown_day_footer(day.total)
         
-        # Add week total
-        result.append(f"| **Week Total** | | | | | **{week_total/60:.2f}** | |")
-        result.append("\\n")
+        yield from markdown_week_footer(week.total)
+
+def markdown_header(author=None):
+    """Yield the lines starting a Markdown timesheet, naming the author in a team timesheet."""
+    yield f"# Git Activity Timesheet: {author}" if author else "# Git Activity Timesheet"
+    yield ""
+
+def markdown_week_header(week_start):
+    """Yield the lines starting a week in a Markdown timesheet."""
+    yield f"## Week of {week_start}"
+    yield ""
     
-    return "\\n".join(result).replace('\\n', '\n')
\ No newline at end of file
+    # Create a table for the week
+    yield "| Day | Date | Time | TZ | Repository | Hours | Description |"
+    yield "|-----|------|------|-------|------------|-------|-------------|"
+
+def markdown_task_line(day, first_row, first_commit_time, tz_abbr, repo, task_total, task_name, commit_count,
+                       weekday=None):
+    """Return the table row for a group of similar commits; the first row of a day names the day."""
+    repo_name = os.path.basename(repo)
+    task_desc = f"{task_name}... ({commit_count} commits)"
+    if first_row:
+        return f"| {weekday or day_name(day)} | {day} | {first_commit_time} | {tz_abbr} | {repo_name} | {task_total/60:.2f} | {task_desc} |"
+    return f"|  | | {first_commit_time} | {tz_abbr} | {repo_name} | {task_total/60:.2f} | {task_desc} |"
+
+def markdown_day_footer(day_total):
+    """Yield the rows ending a day in a Markdown timesheet."""
+    yield f"| **Total** | | | | | **{day_total/60:.2f}** | |"
+    yield "| | | | | | | |"  # Empty row for readability
+
+def markdown_week_footer(week_total):
+    """Yield the lines ending a week in a Markdown timesheet."""
+    yield f"| **Week Total** | | | | | **{week_total/60:.2f}** | |"
+    yield ""
+    yield ""
\ No newline at end of file
@@ -1,27 +1,151 @@
 #!/usr/bin/env python3
 import os
+import sys
+import codecs
+import fnmatch
 import subprocess
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
 
-def get_git_repos(base_dir):
-    """Find git repositories in the specified directory."""
+from .models import TimeEntry, date_to_timestamp
+from .estimation import estimate_minutes
+from .timezone_utils import fixed_offset
+
+class Commit(namedtuple('Commit', ['timestamp', 'utc_offset', 'author_name', 'author_email', 'message',
+                                   'commit_hash', 'churn'], defaults=(None,))):
+    """Parsed commit as yielded by iter_git_log and consumed by estimate_time_spent.
+
+    The author date is a Unix ``timestamp`` and the ``utc_offset`` in
+    seconds it was made at. ``churn`` is the number of lines inserted plus
+    deleted, or None when diff stats were not read.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_date(cls, date, author_name, author_email, message, commit_hash):
+        """Create a commit dated with a datetime."""
+        return cls(*date_to_timestamp(date), author_name, author_email, message, commit_hash)
+
+    @property
+    def date(self):
+        """The author date as a datetime at the offset it was made at."""
+        return datetime.fromtimestamp(self.timestamp, fixed_offset(self.utc_offset))
+
+# git log -z separates records with NUL; fields are separated with the ASCII
+# unit separator and the free-form subject is always the last field.
+FIELD_SEPARATOR = '\x1f'
+GIT_LOG_FORMAT = '%h%x1f%ad%x1f%an%x1f%ae%x1f%s'
+READ_CHUNK_SIZE = 64 * 1024
+
+# With --shortstat, git log -z appends "\n N files changed, I insertions(+), D deletions(-)\n"
+# to the subject of every commit that changed files
+SHORTSTAT_PATTERN = re.compile(r'(\d+) insertions?\(\+\)|(\d+) deletions?\(-\)')
+
+# Directories that never contain repositories worth reporting on
+DEFAULT_PRUNE_DIRS = frozenset([
+    'node_modules', 'bower_components', '.venv', 'venv', '__pycache__', 'site-packages',
+    '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.ruff_cache', '.cache',
+])
+
+def _scan_repo_tree(top, rel_path, max_depth, exclude, prune):
+    """Find git repositories at or below ``top``, which sits at depth 1 below the base directory."""
     repos = []
+    stack = [(top, rel_path, 1, True)]
+    while stack:
+        path, rel_path, depth, descend = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        
+        # A repository is never descended into
+        if any(entry.name == '.git' for entry in entries):
+            repos.append(path)
+            continue
+        if not descend or (max_depth and depth >= max_depth):
+            continue
+        
+        for entry in entries:
+            child_rel_path = f'{rel_path}/{entry.name}'
+            if _is_candidate_dir(entry, child_rel_path, exclude, prune):
+                # Symlinked directories are checked but not walked, to avoid cycles
+                stack.append((entry.path, child_rel_path, depth + 1, not entry.is_symlink()))
+    return repos
+
+def _is_candidate_dir(entry, rel_path, exclude, prune):
+    """Check whether a directory entry should be searched for repositories."""
+    if entry.name in prune:
+        return False
+    if any(fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(rel_path, pattern) for pattern in exclude):
+        return False
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+def get_git_repos(base_dir, max_depth=1, exclude=None, prune=DEFAULT_PRUNE_DIRS, jobs=1):
+    """Find git repositories in the specified directory.
     
+    If ``base_dir`` is itself a repository it is the only result. Otherwise
+    directories are searched up to ``max_depth`` levels below it (``None`` or
+    ``0`` for no limit) without descending into repositories once found.
+    Directories whose name is in ``prune``, or whose name or path relative to
+    ``base_dir`` matches one of the ``exclude`` glob patterns, are skipped.
+    With ``jobs`` other than 1, sibling subtrees are walked in parallel.
+    """
     # First check if the base_dir itself is a git repository
     if os.path.exists(os.path.join(base_dir, '.git')):
-        repos.append(base_dir)
-        return repos
+        return [base_dir]
     
-    # If not, look for git repositories in subdirectories
-    for item in os.listdir(base_dir):
-        full_path = os.path.join(base_dir, item)
-        if os.path.isdir(full_path) and os.path.exists(os.path.join(full_path, '.git')):
-            repos.append(full_path)
-    return repos
+    exclude = list(exclude or [])
+    prune = frozenset(prune or [])
+    with os.scandir(base_dir) as it:
+        tops = [(entry.path, entry.name) for entry in it if _is_candidate_dir(entry, entry.name, exclude, prune)]
+    
+    def scan(top):
+        return _scan_repo_tree(top[0], top[1], max_depth, exclude, prune)
+    
+    if jobs == 1 or len(tops) <= 1:
+        results = map(scan, tops)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs or None) as executor:
+            results = list(executor.map(scan, tops))
+    return sorted(repo for repos in results for repo in repos)
+
+def _basic_regex_to_python(pattern):
+    """Translate a POSIX basic regular expression (as used by git log --author) to Python syntax."""
+    result = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern):
+            next_char = pattern[i + 1]
+            # GNU extensions: escaped operators are special in a basic regex
+            result.append(next_char if next_char in '|(){}+?' else char + next_char)
+            i += 2
+            continue
+        result.append('\\' + char if char in '|(){}+?' else char)
+        i += 1
+    return ''.join(result)
+
+def author_matcher(author):
+    """Return a predicate matching author name/email the way git log --author does."""
+    try:
+        regex = re.compile(_basic_regex_to_python(author))
+    except re.error:
+        return lambda name, email: author in f'{name} <{email}>'
+    return lambda name, email: regex.search(f'{name} <{email}>') is not None
 
 def get_git_log(repo_path, since=None, until=None, author=None):
-    """Get git log for a repository with author date and commit message."""
+    """Get git log for a repository with author date and commit message.
+
+    Returns ``date|name|email|subject|hash`` lines; prefer ``iter_git_log``,
+    which streams parsed commits and is not confused by ``|`` in subjects.
+    """
     cmd = ['git', 'log', '--pretty=format:%ad|%an|%ae|%s|%h', '--date=iso']
     
     if since:
@@ -37,11 +161,172 @@ def get_git_log(repo_path, since=None, until=None, author=None):
             return result.stdout.strip().split('\n') if result.stdout.strip() else []
         return []
     except Exception as e:
-        print(f"Error getting git log for {repo_path}: {e}")
+        print(f"Error getting git log for {repo_path}: {e}", file=sys.stderr)
         return []
 
-def estimate_time_spent(commits, repo_name, session_timeout_minutes=60):
-    """Estimate time spent on commits based on commit messages and frequency."""
+class RecordSplitter:
+    """Split NUL-delimited git output, fed in chunks, into records of fields."""
+
+    def __init__(self, num_fields):
+        self.num_fields = num_fields
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending = ''
+
+    def _split(self, records):
+        """Return the records that have the expected number of fields."""
+        result = []
+        for record in records:
+            fields = record.split(FIELD_SEPARATOR, self.num_fields - 1)
+            if len(fields) == self.num_fields:
+                result.append(fields)
+        return result
+
+    def feed(self, chunk):
+        """Return the records completed by a chunk of output."""
+        records = (self._pending + self._decoder.decode(chunk)).split('\0')
+        self._pending = records.pop()
+        return self._split(records)
+
+    def close(self):
+        """Return the last record once the output is exhausted."""
+        pending = self._pending + self._decoder.decode(b'', final=True)
+        self._pending = ''
+        return self._split([pending])
+
+def iter_git_records(repo_path, args, num_fields, timeout=None):
+    """Run a NUL-delimited git command and yield each record's fields as they arrive.
+
+    Output is read incrementally, so memory use does not grow with the size
+    of the log. Raises ``subprocess.CalledProcessError`` once the output is
+    exhausted if git exited with an error, and ``subprocess.TimeoutExpired``
+    if git was killed for running longer than ``timeout`` seconds.
+    """
+    cmd = ['git'] + args
+    process = subprocess.Popen(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    timer = None
+    timed_out = threading.Event()
+    if timeout is not None:
+        def kill():
+            timed_out.set()
+            process.kill()
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+    splitter = RecordSplitter(num_fields)
+    try:
+        while True:
+            chunk = process.stdout.read1(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield from splitter.feed(chunk)
+        if process.wait() != 0 and timed_out.is_set():
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        yield from splitter.close()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    finally:
+        if timer is not None:
+            timer.cancel()
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+def parse_git_date(date_str):
+    """Parse a date printed by git log --date=iso."""
+    return datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S %z')
+
+def parse_raw_date(date_str):
+    """Parse a date printed by git log --date=raw (``1685613600 +0200``) into a timestamp and UTC offset.
+
+    Raises ``ValueError`` for a malformed date.
+    """
+    timestamp, offset = date_str.split(' ')
+    if len(offset) != 5 or offset[0] not in '+-':
+        raise ValueError(f"invalid git date: {date_str!r}")
+    utc_offset = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+    return int(timestamp), -utc_offset if offset[0] == '-' else utc_offset
+
+def git_log_args(since=None, until=None, author=None, churn=False):
+    """Return the git log arguments used to read commits for a timesheet, with diff stats if ``churn``."""
+    cmd = ['log', '-z', f'--pretty=format:{GIT_LOG_FORMAT}', '--date=raw']
+    if churn:
+        cmd.append('--shortstat')
+    
+    if since:
+        cmd.append(f'--since={since}')
+    if until:
+        cmd.append(f'--until={until}')
+    if author:
+        cmd.append(f'--author={author}')
+    return cmd
+
+def split_shortstat(subject):
+    """Split a subject read with --shortstat into the subject and its churn (0 for a commit without changes)."""
+    subject, _, stat = subject.partition('\n')
+    churn = 0
+    for insertions, deletions in SHORTSTAT_PATTERN.findall(stat):
+        churn += int(insertions or deletions)
+    return subject, churn
+
+def commit_from_fields(fields, churn=False):
+    """Build a Commit from the fields of a git log record, or None if the date is invalid.
+
+    With ``churn`` the record was read with ``git_log_args(churn=True)``.
+    """
+    commit_hash, date_str, author_name, author_email, message = fields
+    try:
+        timestamp, utc_offset = parse_raw_date(date_str)
+    except ValueError:
+        return None
+    if churn:
+        message, lines = split_shortstat(message)
+        return Commit(timestamp, utc_offset, author_name, author_email, message, commit_hash, lines)
+    return Commit(timestamp, utc_offset, author_name, author_email, message, commit_hash)
+
+def iter_git_log(repo_path, since=None, until=None, author=None, timeout=None, churn=False):
+    """Stream parsed commits from git log for a repository as git produces them.
+
+    With a ``timeout``, git is stopped after that many seconds and
+    ``subprocess.TimeoutExpired`` is raised. With ``churn``, each commit's
+    diff stats are read in the same git log pass (``--shortstat``).
+    """
+    try:
+        for fields in iter_git_records(repo_path, git_log_args(since, until, author, churn), 5, timeout):
+            commit = commit_from_fields(fields, churn)
+            if commit is not None:
+                yield commit
+    except subprocess.TimeoutExpired:
+        raise
+    except subprocess.CalledProcessError:
+        return
+    except Exception as e:
+        print(f"Error getting git log for {repo_path}: {e}", file=sys.stderr)
+
+def parse_log_line(line):
+    """Parse a ``date|name|email|subject|hash`` line as returned by get_git_log."""
+    # The hash is the last field, so a subject containing '|' is kept intact
+    head, _, commit_hash = line.rpartition('|')
+    parts = head.split('|', 3)
+    if len(parts) < 4:
+        return None
+    date_str, author_name, author_email, message = parts
+    try:
+        date = parse_git_date(date_str)
+    except ValueError:
+        return None
+    return Commit.from_date(date, author_name, author_email, message, commit_hash)
+
+def estimate_time_spent(commits, repo_name, session_timeout_minutes=60, rules=None, by_author=False):
+    """Estimate time spent on commits based on commit messages and frequency.
+
+    ``commits`` may be ``Commit`` records (as yielded by ``iter_git_log``) or
+    lines as returned by ``get_git_log``. ``rules`` are the
+    ``EstimationRules`` to apply (the built-in rules by default); rules with
+    ``churn_minutes`` also weight each commit by its ``churn``. With
+    ``by_author`` each author's commits are estimated separately, so the
+    gaps between one author's commits are not cut short by another's.
+    """
     if not commits:
         return []
     
@@ -50,49 +335,34 @@ def estimate_time_spent(commits, repo_name, session_timeout_minutes=60):
     for commit in commits:
         if not commit:
             continue
-        parts = commit.split('|')
-        if len(parts) >= 5:
-            date_str, author_name, author_email, message, commit_hash = parts[0], parts[1], parts[2], parts[3], parts[4]
-            try:
-                date = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S %z')
-                parsed_commits.append((date, message, commit_hash, repo_name, author_name, author_email))
-            except ValueError:
+        if isinstance(commit, str):
+            commit = parse_log_line(commit)
+            if commit is None:
                 continue
+        parsed_commits.append(commit)
     
     # Sort commits by date
-    parsed_commits.sort(key=lambda x: x[0])
+    parsed_commits.sort(key=lambda x: x.timestamp)
     
-    # Estimate time for each commit
-    time_entries = []
-    for i, (date, message, commit_hash, repo, author_name, author_email) in enumerate(parsed_commits):
-        # Base time: 15 minutes per commit
-        time_spent = 15
-        
-        # Adjust based on commit message
-        if re.search(r'fix|bug|issue', message, re.I):
-            time_spent += 15
-        if re.search(r'feature|implement|add', message, re.I):
-            time_spent += 30
-        if re.search(r'refactor|clean|improve', message, re.I):
-            time_spent += 15
-        
-        # Check time gap to next commit
-        if i < len(parsed_commits) - 1:
-            next_date = parsed_commits[i+1][0]
-            time_gap = (next_date - date).total_seconds() / 60
-            
-            # If commits are close together (within the configured session timeout), they're likely part of the same work session
-            if time_gap < session_timeout_minutes:
-                time_spent = min(time_spent, time_gap)
-        
-        time_entries.append({
-            'date': date,
-            'repo': repo,
-            'message': message,
-            'commit': commit_hash,
-            'minutes': time_spent,
-            'author_name': author_name,
-            'author_email': author_email
-        })
+    if by_author:
+        authors = {}
+        for commit in parsed_commits:
+            authors.setdefault((commit.author_name, commit.author_email), []).append(commit)
+        time_entries = []
+        for author_commits in authors.values():
+            time_entries.extend(estimate_time_spent(author_commits, repo_name, session_timeout_minutes, rules))
+        time_entries.sort(key=lambda x: x.timestamp)
+        return time_entries
+    
+    # Estimate time for the whole history at once
+    churn = [commit.churn or 0 for commit in parsed_commits]
+    minutes = estimate_minutes([commit.timestamp for commit in parsed_commits],
+                               [commit.message for commit in parsed_commits],
+                               session_timeout_minutes, rules=rules, churn=churn)
+    
+    time_entries = [TimeEntry.from_timestamp(timestamp, utc_offset, repo_name, message, commit_hash, time_spent,
+                                             author_name, author_email, lines)
+                    for (timestamp, utc_offset, author_name, author_email, message, commit_hash, _), time_spent, lines
+                    in zip(parsed_commits, minutes, churn)]
     
     return time_entries
\ No newline at end of file
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory merging of per-repository time entries.
+
+``estimate_time_spent`` returns each repository's entries sorted by date,
+so a report does not need to gather every entry into one list and sort
+it. ``EntryRuns`` keeps each repository's entries as a sorted run and
+``merged()`` combines the runs lazily with ``heapq.merge``, in the order a
+stable sort of all entries by date gives (entries at the same time keep
+the order of their repositories).
+
+When the runs held in memory exceed the memory budget, the largest are
+written to temporary files and read back while merging. The budget bounds
+the runs kept between repositories, not peak memory: a repository's
+entries are all in memory while it is estimated and added, as are those of
+repositories that finished while it was added. Spill files are opened only
+while a chunk is read from them, so any number of runs can be merged.
+
+``EntrySections`` splits the merged entries of a team report into a
+section per author the same way, spilling the largest sections beyond the
+budget.
+"""
+import os
+import heapq
+import pickle
+import tempfile
+from operator import attrgetter
+
+from .models import TimeEntry
+
+# Rough bytes of memory an entry takes besides its message: the slotted
+# entry, its commit hash, date and minutes, and a list slot
+ENTRY_OVERHEAD = 250
+
+# Entries written to a spill file per pickle record
+SPILL_CHUNK_SIZE = 1000
+
+def entries_size(time_entries):
+    """Estimate the bytes of memory a list of entries takes."""
+    return sum(ENTRY_OVERHEAD + len(entry.message) for entry in time_entries)
+
+class SpilledRun:
+    """A sorted run of entries written to a temporary file, opened only while a chunk is read."""
+
+    def __init__(self, time_entries=()):
+        fd, self.path = tempfile.mkstemp(prefix='ggts-run-')
+        os.close(fd)
+        self.count = 0
+        self.extend(time_entries)
+
+    def extend(self, time_entries):
+        """Append entries that come after those already written."""
+        with open(self.path, 'ab') as f:
+            for start in range(0, len(time_entries), SPILL_CHUNK_SIZE):
+                pickle.dump([(entry.timestamp, entry.utc_offset, entry.repo, entry.message, entry.commit,
+                              entry.minutes, entry.author_name, entry.author_email, entry.churn)
+                             for entry in time_entries[start:start + SPILL_CHUNK_SIZE]],
+                            f, pickle.HIGHEST_PROTOCOL)
+        self.count += len(time_entries)
+
+    def __iter__(self):
+        position = read = 0
+        while read < self.count:
+            with open(self.path, 'rb') as f:
+                f.seek(position)
+                chunk = pickle.load(f)
+                position = f.tell()
+            read += len(chunk)
+            for fields in chunk:
+                yield TimeEntry.from_timestamp(*fields)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+class EntryRuns:
+    """Per-repository runs of time entries, merged lazily into date order.
+
+    Add each repository's entries with ``add``, in repository order. Runs
+    are spilled to temporary files, largest first, while the runs kept in
+    memory exceed ``memory_budget`` bytes (estimated; None or 0 means no
+    limit); the entries being added are in memory until then. Use as a
+    context manager, or call ``close``, to remove the files.
+    """
+
+    def __init__(self, memory_budget=None):
+        self.memory_budget = memory_budget
+        self.runs = []
+        self.sizes = []
+        self.memory = 0
+        self.spilled = 0
+
+    def add(self, time_entries):
+        """Add the entries of the next repository, sorting them by date if they are not already."""
+        timestamps = [entry.timestamp for entry in time_entries]
+        if any(later < earlier for earlier, later in zip(timestamps, timestamps[1:])):
+            time_entries = sorted(time_entries, key=attrgetter('timestamp'))
+        size = entries_size(time_entries)
+        self.runs.append(time_entries)
+        self.sizes.append(size)
+        self.memory += size
+        while self.memory_budget and self.memory > self.memory_budget:
+            index = max(range(len(self.runs)), key=self.sizes.__getitem__)
+            if not self.sizes[index]:
+                break
+            self.runs[index] = SpilledRun(self.runs[index])
+            self.memory -= self.sizes[index]
+            self.sizes[index] = 0
+            self.spilled += 1
+
+    def merged(self):
+        """Return an iterator over all entries in date order, reading spilled runs back as it goes."""
+        return heapq.merge(*self.runs, key=attrgetter('timestamp'))
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def close(self):
+        """Remove the spill files."""
+        for run in self.runs:
+            if isinstance(run, SpilledRun):
+                run.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class Section:
+    """Entries of one section of ``EntrySections``, in the order appended; the oldest may be spilled."""
+
+    def __init__(self, sections):
+        self.sections = sections
+        self.run = None
+        self.entries = []
+        self.size = 0
+
+    def append(self, entry):
+        """Add an entry after the others, spilling sections if the budget is exceeded."""
+        self.entries.append(entry)
+        size = ENTRY_OVERHEAD + len(entry.message)
+        self.size += size
+        self.sections.grow(size)
+
+    def spill(self):
+        """Write the entries held in memory to this section's temporary file."""
+        if self.run is None:
+            self.run = SpilledRun()
+        self.run.extend(self.entries)
+        self.entries = []
+        self.size = 0
+
+    def __iter__(self):
+        if self.run is not None:
+            yield from self.run
+        yield from self.entries
+
+    def __len__(self):
+        return len(self.entries) + (len(self.run) if self.run is not None else 0)
+
+class EntrySections:
+    """Entries split into sections as they stream in, such as the authors of a team report.
+
+    Create each ``section()`` and ``append`` entries to it as to a list.
+    While the entries in memory exceed ``memory_budget`` bytes (estimated;
+    None or 0 means no limit) those of the largest section are spilled to
+    its temporary file. Iterating a section yields its entries in the order
+    appended. Use as a context manager, or call ``close``, to remove the
+    files.
+    """
+
+    def __init__(self, memory_budget=None):
+        self.memory_budget = memory_budget
+        self.sections = []
+        self.memory = 0
+        self.spilled = 0
+
+    def section(self):
+        """Return a new empty section."""
+        section = Section(self)
+        self.sections.append(section)
+        return section
+
+    def grow(self, size):
+        """Account for ``size`` more bytes, spilling the largest sections while over the budget."""
+        self.memory += size
+        while self.memory_budget and self.memory > self.memory_budget:
+            section = max(self.sections, key=attrgetter('size'))
+            if not section.size:
+                break
+            self.memory -= section.size
+            section.spill()
+            self.spilled += 1
+
+    def close(self):
+        """Remove the spill files."""
+        for section in self.sections:
+            if section.run is not None:
+                section.run.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
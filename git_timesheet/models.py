@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import sys
+from datetime import datetime, timezone
+from collections.abc import Mapping
+
+from .timezone_utils import fixed_offset
+
+def date_to_timestamp(date):
+    """Return the Unix timestamp and UTC offset in seconds of a datetime; naive datetimes are UTC."""
+    if date.tzinfo is None:
+        return date.replace(tzinfo=timezone.utc).timestamp(), 0
+    return date.timestamp(), int(date.utcoffset().total_seconds())
+
+class TimeEntry(Mapping):
+    """Time attributed to a single commit.
+
+    Entries use ``__slots__`` and interned repository/author strings to keep
+    per-commit memory low. They also behave as a read-only mapping with
+    item assignment, so code written against the dictionaries previously
+    returned by ``estimate_time_spent`` (``entry['minutes']``,
+    ``entry.get('repo')``, ``dict(entry)``) keeps working.
+
+    The commit date is held as a Unix ``timestamp`` and the ``utc_offset``
+    in seconds it was made at; ``date`` is only built as a datetime when it
+    is first read. ``churn`` is the number of lines the commit changed, or
+    0 if unknown; it is not part of the mapping.
+    """
+    __slots__ = ('timestamp', 'utc_offset', '_date', 'repo', 'message', 'commit', 'minutes', 'author_name',
+                 'author_email', 'churn')
+    # Keys of the mapping interface
+    FIELDS = ('date', 'repo', 'message', 'commit', 'minutes', 'author_name', 'author_email')
+
+    def __init__(self, date, repo, message, commit, minutes, author_name, author_email, churn=0):
+        self.date = date
+        self.repo = sys.intern(repo)
+        self.message = message
+        self.commit = commit
+        self.minutes = minutes
+        self.author_name = sys.intern(author_name)
+        self.author_email = sys.intern(author_email)
+        self.churn = churn
+
+    @classmethod
+    def from_timestamp(cls, timestamp, utc_offset, repo, message, commit, minutes, author_name, author_email,
+                       churn=0):
+        """Create an entry from a Unix timestamp and UTC offset without building a datetime."""
+        entry = cls.__new__(cls)
+        entry.timestamp = timestamp
+        entry.utc_offset = utc_offset
+        entry._date = None
+        entry.repo = sys.intern(repo)
+        entry.message = message
+        entry.commit = commit
+        entry.minutes = minutes
+        entry.author_name = sys.intern(author_name)
+        entry.author_email = sys.intern(author_email)
+        entry.churn = churn
+        return entry
+
+    @classmethod
+    def from_mapping(cls, mapping, **changes):
+        """Create an entry from a dictionary (or another entry), overriding any given fields."""
+        if isinstance(mapping, TimeEntry) and 'date' not in changes:
+            fields = {key: changes[key] if key in changes else getattr(mapping, key) for key in cls.FIELDS[1:]}
+            return cls.from_timestamp(mapping.timestamp, mapping.utc_offset, churn=mapping.churn, **fields)
+        fields = {key: changes[key] if key in changes else mapping[key] for key in cls.FIELDS}
+        return cls(**fields)
+
+    def replace(self, **changes):
+        """Return a copy of the entry with the given fields replaced."""
+        return self.from_mapping(self, **changes)
+
+    @property
+    def date(self):
+        """The commit date as a datetime at the offset it was made at."""
+        if self._date is None:
+            self._date = datetime.fromtimestamp(self.timestamp, fixed_offset(self.utc_offset))
+        return self._date
+
+    @date.setter
+    def date(self, date):
+        self.timestamp, self.utc_offset = date_to_timestamp(date)
+        self._date = date
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        fields = ', '.join(f'{key}={getattr(self, key)!r}' for key in self.FIELDS)
+        return f'{type(self).__name__}({fields})'
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing instrumentation.
+
+A ``Profiler`` records wall time, CPU time and item counts for each stage
+of a run (discovery, git log, estimation, timezone conversion, formatting)
+overall and per repository. Stages may nest; each stage is charged only
+for the time not spent in the stages nested inside it, so stage totals add
+up to the time of the run. Pass a profiler to ``generate_timesheet`` to
+collect one from library code, or use ``ggts --profile``.
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+class _Stage:
+    """Context manager timing one execution of a stage."""
+    __slots__ = ('profiler', 'name', 'repo', 'items', 'child_wall', 'child_cpu', '_wall', '_cpu', '_parent')
+
+    def __init__(self, profiler, name, repo):
+        self.profiler = profiler
+        self.name = name
+        self.repo = repo
+        self.items = 0
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self._parent = stack[-1] if stack else None
+        stack.append(self)
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        self.profiler._stack().pop()
+        if self._parent is not None:
+            self._parent.child_wall += wall
+            self._parent.child_cpu += cpu
+        self.profiler._record(self.name, self.repo, wall - self.child_wall, cpu - self.child_cpu, self.items)
+        return False
+
+class _NullStage:
+    """Stand-in for a stage when profiling is disabled."""
+    __slots__ = ('items',)
+
+    def __init__(self):
+        self.items = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+def stage(profiler, name, repo=None):
+    """Time a stage with ``profiler``, or do nothing if it is None.
+
+    Set ``items`` on the returned object to record how many items the
+    stage processed::
+
+        with stage(profiler, 'git_log', repo) as s:
+            commits = list(iter_git_log(repo))
+            s.items = len(commits)
+    """
+    if profiler is None:
+        return _NullStage()
+    return profiler.stage(name, repo)
+
+def timed_iter(profiler, name, iterable, repo=None):
+    """Return an iterator over ``iterable`` that charges the time taken to produce its items to a stage.
+
+    For lazy pipelines, where a stage does its work as its items are
+    pulled: each step runs as a stage nested in whatever pulls it, and the
+    stage is recorded once, with the number of items, when the iterator is
+    exhausted or closed. Returns ``iterable`` as it is if ``profiler`` is None.
+    """
+    if profiler is None:
+        return iterable
+    return _timed_iter(profiler, name, iterable, repo)
+
+def _timed_iter(profiler, name, iterable, repo):
+    """Yield the items of an iterable, timing each step as a nested stage."""
+    iterator = iter(iterable)
+    wall = cpu = 0.0
+    items = 0
+    try:
+        while True:
+            step = _Stage(profiler, name, repo)
+            stack = profiler._stack()
+            parent = stack[-1] if stack else None
+            stack.append(step)
+            start_wall = time.perf_counter()
+            start_cpu = time.thread_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                step_wall = time.perf_counter() - start_wall
+                step_cpu = time.thread_time() - start_cpu
+                stack.pop()
+                if parent is not None:
+                    parent.child_wall += step_wall
+                    parent.child_cpu += step_cpu
+                wall += step_wall - step.child_wall
+                cpu += step_cpu - step.child_cpu
+            items += 1
+            yield item
+    finally:
+        profiler._record(name, repo, wall, cpu, items)
+
+class Profiler:
+    """Collect wall time, CPU time and item counts per stage and per repository.
+
+    Safe to use from several threads at once. CPU time is the CPU used by
+    the thread running the stage; the CPU used by git child processes is
+    reported once for the whole run.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.repositories = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._start_children = self._children_cpu()
+
+    @staticmethod
+    def _children_cpu():
+        """Return CPU time used by waited-for child processes."""
+        times = os.times()
+        return times.children_user + times.children_system
+
+    def _stack(self):
+        """Return the stage stack of the current thread."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name, repo=None):
+        """Return a context manager timing a stage, optionally for one repository."""
+        return _Stage(self, name, repo)
+
+    def add(self, name, repo=None, wall=0.0, cpu=0.0, items=0):
+        """Record a stage timed by the caller.
+
+        For work that cannot be wrapped in ``stage``, such as coroutines that
+        interleave on one thread; such stages are not nested in other stages.
+        """
+        self._record(name, repo, wall, cpu, items)
+
+    def _record(self, name, repo, wall, cpu, items):
+        """Add one stage execution to the totals."""
+        with self._lock:
+            targets = [self.stages]
+            if repo is not None:
+                targets.append(self.repositories.setdefault(repo, {}))
+            for stages in targets:
+                totals = stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0, 'items': 0})
+                totals['wall'] += wall
+                totals['cpu'] += cpu
+                totals['calls'] += 1
+                totals['items'] += items
+
+    def summary(self):
+        """Return the collected timings as a JSON-serializable dictionary."""
+        with self._lock:
+            return {
+                'total': {
+                    'wall': time.perf_counter() - self._start_wall,
+                    'cpu': time.process_time() - self._start_cpu,
+                    'children_cpu': self._children_cpu() - self._start_children,
+                },
+                'stages': {name: dict(totals) for name, totals in self.stages.items()},
+                'repositories': {repo: {name: dict(totals) for name, totals in stages.items()}
+                                 for repo, stages in self.repositories.items()},
+            }
+
+    def write_json(self, path=None):
+        """Write the summary as JSON to a file, or to stderr if no path is given."""
+        text = json.dumps(self.summary(), indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(text + '\n')
+        else:
+            sys.stderr.write(text + '\n')
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Whole-report cache.
+
+A rendered timesheet is stored under ``~/.cache/git-timesheet/reports``
+(or ``$XDG_CACHE_HOME``), named by a fingerprint of everything that decides
+its contents: the options (repositories, since/until, authors, timezone,
+session settings, estimation rules and format) and the ref state of every
+repository, the files ``ggts watch`` polls. Generating the same report
+again while no branch moved is answered from the file without running git
+log, estimation or the formatters.
+
+git resolves since/until again on every run, and a date without a time
+("2024-06-03") or a relative date ("2 weeks ago") resolves to a different
+timestamp each time. So a report also records, from the committer dates in
+the commit cache, how far each resolved bound could move before it would
+select another commit, and is only reused while the newly resolved bounds
+stay within that.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+from .cache import get_cache_dir, load_commits, walk_since
+from .watcher import find_git_dirs, ref_signature
+from . import __version__
+
+REPORT_CACHE_VERSION = 1
+
+# Reports kept; the least recently used are removed beyond this
+REPORT_CACHE_SIZE = 100
+
+def get_report_dir(cache_dir=None):
+    """Return the directory rendered reports are stored in."""
+    return Path(cache_dir or get_cache_dir()) / 'reports'
+
+def report_fingerprint(repos, inputs):
+    """Return the fingerprint of a report for its inputs and the repositories' ref state.
+
+    ``inputs`` is a dictionary of plain values (strings, numbers, tuples)
+    that, with the commits reachable from each repository's HEAD and the
+    resolved date range, determine the report.
+    """
+    refs = [(repo, ref_signature(*find_git_dirs(repo))) for repo in repos]
+    key = repr((REPORT_CACHE_VERSION, __version__, sorted(inputs.items()), refs))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def date_range_bounds(repos, date_range, cache_dir=None):
+    """Return how far each bound of a resolved date range can move while it selects the same commits.
+
+    ``date_range`` is ``(max_age, min_age)`` as returned by
+    ``resolve_date_range``. The bounds are read from the commit cache the
+    report was collected from, so only reports of the ``git`` backend with
+    the cache can be stored. git log stops following a line at its first
+    commit older than ``max_age`` and keeps commits whose committer time is
+    at most ``min_age``; the result holds, for each, the nearest committer
+    times on either side (None where there is no commit, or no bound).
+    """
+    max_age, min_age = date_range
+    since_bounds = [None, None]
+    until_bounds = [None, None]
+    if max_age is None and min_age is None:
+        return {'since': since_bounds, 'until': until_bounds}
+    for repo in repos:
+        commits = load_commits(repo, cache_dir=cache_dir)
+        if max_age is not None and commits:
+            by_hash = {record[0]: record for record in commits}
+            # The commits the walk shows, and the older ones it stops at
+            shown = list(walk_since(commits, max_age))
+            stops = [commits[0]] if commits[0][2] < max_age else []
+            stops.extend(by_hash[parent] for record in shown for parent in record[8]
+                         if parent in by_hash and by_hash[parent][2] < max_age)
+            for record in shown + stops:
+                _narrow(since_bounds, record[2], record[2] < max_age)
+        if min_age is not None:
+            for record in commits:
+                _narrow(until_bounds, record[2], record[2] <= min_age)
+    return {'since': since_bounds, 'until': until_bounds}
+
+def _narrow(bounds, commit_time, before):
+    """Narrow ``[latest commit before, earliest commit after]`` around a bound by one commit."""
+    if before:
+        if bounds[0] is None or commit_time > bounds[0]:
+            bounds[0] = commit_time
+    elif bounds[1] is None or commit_time < bounds[1]:
+        bounds[1] = commit_time
+
+def within_bounds(bounds, date_range):
+    """Check that a resolved date range selects the same commits as the one the bounds were taken for."""
+    max_age, min_age = date_range
+    (since_low, since_high), (until_low, until_high) = bounds['since'], bounds['until']
+    if max_age is not None and not ((since_low is None or since_low < max_age) and
+                                    (since_high is None or max_age <= since_high)):
+        return False
+    if min_age is not None and not ((until_low is None or until_low <= min_age) and
+                                    (until_high is None or min_age < until_high)):
+        return False
+    return True
+
+def _report_file(fingerprint, cache_dir):
+    """Return the file a report is stored in."""
+    return get_report_dir(cache_dir) / f'{fingerprint}.txt'
+
+def load_report(fingerprint, date_range=(None, None), cache_dir=None):
+    """Return the stored report with the fingerprint, or None if there is none for the resolved date range."""
+    path = _report_file(fingerprint, cache_dir)
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            header = json.loads(f.readline())
+            if not within_bounds(header['bounds'], date_range):
+                return None
+            body = f.read()
+        # Mark it as recently used
+        os.utime(path)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return body
+
+def write_report(body, sink):
+    """Write a stored report to a file-like object; returns the number of lines, as ``write_lines`` does."""
+    sink.write(body)
+    return body.count('\n') + 1 if body else 0
+
+class _Tee:
+    """Write to a sink and to a file at once."""
+
+    def __init__(self, sink, file):
+        self.sink = sink
+        self.file = file
+
+    def write(self, text):
+        self.sink.write(text)
+        self.file.write(text)
+
+def storing_report(write, fingerprint, repos, date_range=(None, None), cache_dir=None,
+                   max_reports=REPORT_CACHE_SIZE):
+    """Wrap a ``write(sink)`` function so what it writes is also stored as the report with the fingerprint.
+
+    ``repos`` and ``date_range`` are the repositories and resolved
+    ``(max_age, min_age)`` the report was collected for. The report is
+    stored only once ``write`` returns. If the cache directory cannot be
+    written, the report is written without storing it.
+    """
+    def write_and_store(sink):
+        try:
+            body_file = tempfile.TemporaryFile('w+', encoding='utf-8', newline='')
+        except OSError as e:
+            print(f"Warning: could not write report cache: {e}", file=sys.stderr)
+            return write(sink)
+        with body_file:
+            count = write(_Tee(sink, body_file))
+            try:
+                bounds = date_range_bounds(repos, date_range, cache_dir)
+                body_file.seek(0)
+                _save(_report_file(fingerprint, cache_dir), bounds, body_file)
+            except OSError as e:
+                print(f"Warning: could not write report cache: {e}", file=sys.stderr)
+                return count
+        prune_reports(cache_dir, max_reports)
+        return count
+    return write_and_store
+
+def _save(path, bounds, body_file):
+    """Atomically write a report file: a JSON header line, then the report."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(json.dumps({'bounds': bounds}, separators=(',', ':')) + '\n')
+            shutil.copyfileobj(body_file, f)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def prune_reports(cache_dir=None, max_reports=REPORT_CACHE_SIZE):
+    """Remove the least recently used reports beyond ``max_reports``."""
+    try:
+        paths = list(get_report_dir(cache_dir).glob('*.txt'))
+        if len(paths) <= max_reports:
+            return
+        paths.sort(key=lambda path: path.stat().st_mtime_ns, reverse=True)
+        for path in paths[max_reports:]:
+            path.unlink()
+    except OSError:
+        pass
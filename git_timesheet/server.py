@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Local HTTP report server.
+
+``ggts serve`` discovers repositories once and serves timesheets at
+``/timesheet`` (``/timesheet.txt``, ``.csv``, ``.md``, ``.json`` or
+``.ndjson`` pick the format) for the query-string parameters ``format``, ``since``,
+``until``, ``author``, ``timezone``, ``session_timeout`` and ``repos``
+(repeatable).
+
+Rendered reports are kept in memory, keyed by the parameters and the ref
+state of the repositories (the files ``ggts watch`` polls), so a refresh
+while nothing changed is answered without running git log or the
+formatters. since/until are resolved with ``git rev-parse`` on each request,
+and a report is reused while the resolved dates select the same commits
+(see ``report_cache.date_range_bounds``), so relative dates such as "2 weeks
+ago" do not expire it. Responses carry an ETag, and conditional requests
+with a matching ``If-None-Match`` get ``304 Not Modified``.
+"""
+import os
+import asyncio
+import hashlib
+import threading
+from http import HTTPStatus
+from operator import attrgetter
+from urllib.parse import urlsplit, parse_qs
+from collections import OrderedDict, namedtuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from .async_collector import collect_time_entries_async
+from .cache import resolve_date_range
+from .formatters import format_timesheet
+from .report_cache import date_range_bounds, within_bounds
+from .watcher import find_git_dirs, ref_signature
+from . import __version__
+
+CONTENT_TYPES = {
+    'text': 'text/plain',
+    'csv': 'text/csv',
+    'markdown': 'text/markdown',
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Formats selected by the extension of the request path
+PATH_FORMATS = {'.txt': 'text', '.csv': 'csv', '.md': 'markdown', '.json': 'json', '.ndjson': 'ndjson'}
+
+# A rendered timesheet; ``etag`` is a quoted hash of ``body``
+Report = namedtuple('Report', ['etag', 'body', 'content_type'])
+
+class ReportService:
+    """Render timesheets for request parameters, caching them by their inputs and the repositories' refs.
+
+    Safe to use from several threads; concurrent requests for the same
+    report wait for a single rendering.
+    """
+
+    def __init__(self, repos, author='mcgarrah', timezone_str='UTC', timezone_backend='pytz',
+                 session_timeout_minutes=60, jobs=None, timeout=None, use_cache=False, rules=None, backend='git',
+                 cache_size=64):
+        self.repos = list(repos)
+        self.author = author
+        self.timezone_str = timezone_str
+        self.timezone_backend = timezone_backend
+        self.session_timeout_minutes = session_timeout_minutes
+        self.jobs = jobs
+        self.timeout = timeout
+        self.use_cache = use_cache
+        self.rules = rules
+        self.backend = backend
+        self.cache_size = cache_size
+        self.renders = 0
+
+        self.git_dirs = {repo: find_git_dirs(repo) for repo in self.repos}
+        self.reports = OrderedDict()
+        self.render_locks = {}
+        self.lock = threading.Lock()
+
+    def select_repos(self, names=None):
+        """Return the repositories with the given names, in discovery order (all of them by default)."""
+        if not names:
+            return self.repos
+        return [repo for name in names for repo in self.repos if os.path.basename(repo) == name]
+
+    def date_range(self, since=None, until=None):
+        """Resolve since/until to timestamps with git."""
+        if not (since or until) or not self.repos:
+            return None, None
+        return resolve_date_range(self.repos[0], since, until, self.timeout)
+
+    def date_bounds(self, repos, date_range):
+        """Return what a report's resolved date range may change to while it selects the same commits.
+
+        The bounds are read from the commit cache, so without it, or with
+        another backend, the report is only reused for the same range.
+        """
+        if self.use_cache and self.backend == 'git':
+            return date_range_bounds(repos, date_range)
+        return None
+
+    def _current(self, key, date_range):
+        """Return the cached report for a key if it is valid for the resolved date range; call with the lock held."""
+        cached = self.reports.get(key)
+        if cached is None:
+            return None
+        report, rendered_range, bounds = cached
+        if bounds is None and rendered_range != date_range:
+            return None
+        if bounds is not None and not within_bounds(bounds, date_range):
+            return None
+        self.reports.move_to_end(key)
+        return report
+
+    def get(self, output_format='text', since=None, until=None, author=None, timezone_str=None,
+            session_timeout_minutes=None, repos=None):
+        """Return the ``Report`` for the parameters, rendering it only if an input changed.
+
+        Parameters left as None use the service defaults. Raises
+        ``ValueError`` for an unknown format or when no repository matches.
+        """
+        output_format = 'markdown' if output_format == 'md' else output_format
+        if output_format not in CONTENT_TYPES:
+            raise ValueError(f"Unknown format: {output_format}")
+        selected = self.select_repos(repos)
+        if not selected:
+            raise ValueError("No git repositories found.")
+        author = author or self.author
+        timezone_str = timezone_str or self.timezone_str
+        session_timeout_minutes = session_timeout_minutes or self.session_timeout_minutes
+
+        date_range = self.date_range(since, until)
+        refs = tuple(ref_signature(*self.git_dirs[repo]) for repo in selected)
+        key = (output_format, since, until, author, timezone_str, session_timeout_minutes, tuple(selected), refs)
+
+        with self.lock:
+            report = self._current(key, date_range)
+            if report is not None:
+                return report
+            # [lock, requests holding or waiting for it]
+            render_lock = self.render_locks.setdefault(key, [threading.Lock(), 0])
+            render_lock[1] += 1
+        try:
+            with render_lock[0]:
+                with self.lock:
+                    report = self._current(key, date_range)
+                if report is None:
+                    report, complete = self.render(selected, output_format, *date_range, author, timezone_str,
+                                                   session_timeout_minutes)
+                    # Reports missing a repository that timed out are not cached
+                    if complete:
+                        bounds = self.date_bounds(selected, date_range)
+                        with self.lock:
+                            self.reports[key] = (report, date_range, bounds)
+                            self.reports.move_to_end(key)
+                            while len(self.reports) > self.cache_size:
+                                self.reports.popitem(last=False)
+        finally:
+            # The last request using a key's lock removes it, so the locks stay bounded by the requests in flight
+            with self.lock:
+                render_lock[1] -= 1
+                if not render_lock[1]:
+                    del self.render_locks[key]
+        return report
+
+    def render(self, repos, output_format, max_age, min_age, author, timezone_str, session_timeout_minutes):
+        """Collect and format a timesheet; returns the ``Report`` and whether every repository was read."""
+        since = f'@{max_age}' if max_age is not None else None
+        until = f'@{min_age}' if min_age is not None else None
+        time_entries, skipped = asyncio.run(collect_time_entries_async(
+            repos, since, until, author, session_timeout_minutes, jobs=self.jobs, timeout=self.timeout,
+            use_cache=self.use_cache, rules=self.rules, backend=self.backend))
+        time_entries.sort(key=attrgetter('timestamp'))
+        body = format_timesheet(time_entries, output_format, timezone_str, author, self.timezone_backend)
+        body = (body + '\n').encode('utf-8')
+        with self.lock:
+            self.renders += 1
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        return Report(etag, body, f'{CONTENT_TYPES[output_format]}; charset=utf-8'), not skipped
+
+class TimesheetRequestHandler(BaseHTTPRequestHandler):
+    """Serve timesheets from the server's ``ReportService``."""
+    server_version = f'ggts/{__version__}'
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        """Answer a request for a timesheet, with 304 if the client's copy is current."""
+        url = urlsplit(self.path)
+        path, extension = os.path.splitext(url.path)
+        if url.path in ('/', '/timesheet'):
+            path_format = None
+        elif path == '/timesheet' and extension in PATH_FORMATS:
+            path_format = PATH_FORMATS[extension]
+        else:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        params = parse_qs(url.query)
+
+        def param(name):
+            values = params.get(name)
+            return values[-1] if values else None
+
+        try:
+            session_timeout = param('session_timeout')
+            report = self.server.service.get(path_format or param('format') or 'text', param('since'),
+                                             param('until'), param('author'), param('timezone'),
+                                             int(session_timeout) if session_timeout else None,
+                                             params.get('repos'))
+        except ValueError as e:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or
+                              report.etag in (tag.strip() for tag in if_none_match.split(','))):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', report.etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', report.content_type)
+        self.send_header('Content-Length', str(len(report.body)))
+        self.send_header('ETag', report.etag)
+        # Let browsers and proxies keep the report but revalidate it on every refresh
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(report.body)
+
+class TimesheetServer(ThreadingHTTPServer):
+    """HTTP server answering timesheet requests from a ``ReportService``, one thread per request."""
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super().__init__(address, TimesheetRequestHandler)
+        self.service = service
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+SQLite commit store.
+
+``ggts ingest`` loads the commits of a set of repositories, with the minutes
+estimated for each of them, into a local SQLite database, and ``ggts report``
+renders timesheets from it without running git or the estimator again. The
+week, day, repository and task groupings of a report and their totals are
+computed with SQL aggregate queries; the table is indexed on (author, date),
+(repository, date) and commit hash so reports over years of history, for
+any author, stay fast.
+
+Minutes are estimated separately for each author of a repository, so the
+report for one author matches ``ggts generate --author`` for that author
+over the ingested history. Date ranges are read differently: a
+``YYYY-MM-DD`` ``until`` includes that whole day in the report timezone,
+where ``ggts generate`` passes the date to git, so the last day of a range
+can hold different commits.
+"""
+import os
+import sqlite3
+from pathlib import Path
+from operator import attrgetter
+from datetime import datetime, timedelta
+
+from .timezone_utils import get_timezone, fixed_offset, offset_intervals
+from .cache import resolve_date_range
+from .formatters import (NO_ACTIVITY, NO_AUTHOR_ACTIVITY, iter_empty, day_name, text_week_header, text_day_header,
+                         text_repo_header, text_entry_line, text_week_footer, CSV_HEADER, csv_line, markdown_header,
+                         markdown_week_header, markdown_task_line, markdown_day_footer, markdown_week_footer,
+                         iter_json_array, json_record, ndjson_record)
+
+STORE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    id INTEGER PRIMARY KEY,
+    repo_path TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    commit_hash TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    utc_offset INTEGER NOT NULL,
+    author_name TEXT NOT NULL,
+    author_email TEXT NOT NULL,
+    message TEXT NOT NULL,
+    -- No type affinity, so whole minutes stay integers and render like the estimator's values
+    minutes NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commits_author_date ON commits (author_name, author_email, timestamp);
+CREATE INDEX IF NOT EXISTS commits_repo_date ON commits (repo, timestamp);
+CREATE INDEX IF NOT EXISTS commits_hash ON commits (commit_hash);
+"""
+
+# Rows of a report in timesheet order (date, then ingest order), with their
+# local date and time in the report timezone
+REPORT_TABLE = """
+CREATE TEMP TABLE report (
+    seq INTEGER PRIMARY KEY,
+    timestamp INTEGER,
+    utc_offset INTEGER,
+    repo TEXT,
+    commit_hash TEXT,
+    message TEXT,
+    minutes,
+    author_name TEXT,
+    author_email TEXT,
+    week TEXT,
+    day TEXT,
+    time TEXT,
+    tz_abbr TEXT
+)
+"""
+
+def get_database_path():
+    """Return the default location of the commit store."""
+    base = os.environ.get('XDG_DATA_HOME') or str(Path.home() / '.local' / 'share')
+    return Path(base) / 'git-timesheet' / 'timesheet.db'
+
+def connect(path=None):
+    """Open (creating if needed) a commit store and return the connection.
+
+    Raises ``ValueError`` if the database was written by an incompatible
+    version.
+    """
+    path = Path(os.path.expanduser(str(path))) if path else get_database_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, STORE_VERSION):
+        conn.close()
+        raise ValueError(f"{path} was created by an incompatible version; ingest into a new database")
+    with conn:
+        conn.executescript(SCHEMA)
+        conn.execute(f'PRAGMA user_version = {STORE_VERSION}')
+    return conn
+
+def ingest(conn, repo_path, time_entries):
+    """Replace the stored commits of a repository with its time entries.
+
+    Entries are stored in the order given, which breaks ties between commits
+    with the same date in reports. Returns the number of commits stored.
+    """
+    repo = os.path.basename(repo_path)
+    rows = [(repo_path, repo, entry.commit, int(entry.timestamp), entry.utc_offset, entry.author_name,
+             entry.author_email, entry.message, entry.minutes)
+            for entry in sorted(time_entries, key=attrgetter('timestamp'))]
+    with conn:
+        conn.execute('DELETE FROM commits WHERE repo = ? AND repo_path = ?', (repo, repo_path))
+        conn.executemany('INSERT INTO commits (repo_path, repo, commit_hash, timestamp, utc_offset, author_name, '
+                         'author_email, message, minutes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    return len(rows)
+
+def stored_repo_paths(conn):
+    """Return the paths of the repositories in the store."""
+    return [row[0] for row in conn.execute('SELECT DISTINCT repo_path FROM commits ORDER BY repo_path')]
+
+def resolve_report_range(conn, since=None, until=None, timezone_str='UTC', timezone_backend='pytz'):
+    """Resolve report ``since``/``until`` strings to an inclusive range of timestamps.
+
+    ISO dates and times (``2024-01-31``, ``2024-01-31 17:00``) are read in
+    the report timezone, and a date alone as ``until`` includes that whole
+    day. Anything else, such as "2 weeks ago", is resolved by git in one of
+    the stored repositories. Raises ``ValueError`` if a date cannot be read.
+    """
+    tz = get_timezone(timezone_str, timezone_backend)
+    bounds = []
+    for value, is_until in ((since, False), (until, True)):
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            date = datetime.fromisoformat(value)
+        except ValueError:
+            bounds.append(_resolve_with_git(conn, value, is_until))
+            continue
+        whole_day = is_until and len(value) == len('YYYY-MM-DD')
+        if whole_day:
+            date += timedelta(days=1)
+        if date.tzinfo is None:
+            date = tz.localize(date) if hasattr(tz, 'localize') else date.replace(tzinfo=tz)
+        timestamp = int(date.timestamp())
+        bounds.append(timestamp - 1 if whole_day else timestamp)
+    return tuple(bounds)
+
+def _resolve_with_git(conn, value, is_until):
+    """Resolve a date string with git in the first stored repository that still exists."""
+    for repo_path in stored_repo_paths(conn):
+        if os.path.isdir(repo_path):
+            max_age, min_age = resolve_date_range(repo_path, None if is_until else value, value if is_until else None)
+            timestamp = min_age if is_until else max_age
+            if timestamp is not None:
+                return timestamp
+    raise ValueError(f"Cannot read date '{value}'; use YYYY-MM-DD")
+
+def iter_report(conn, output_format='text', timezone_str='UTC', author_filter='mcgarrah', since=None, until=None,
+                timezone_backend='pytz', repos=None):
+    """Yield the lines of a timesheet for the stored commits.
+
+    The output is identical to ``formatters.iter_timesheet`` for the same
+    entries. ``since`` and ``until`` are inclusive timestamps (see
+    ``resolve_report_range``) and ``repos`` limits the report to
+    repositories with those names. The entries of a range are not always
+    those ``ggts generate`` selects for the same dates, as
+    ``resolve_report_range`` reads a date alone as ``until`` to the end of
+    that day rather than as git does.
+    """
+    conditions, params = [], []
+    if since is not None:
+        conditions.append('c.timestamp >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('c.timestamp <= ?')
+        params.append(until)
+    if repos:
+        conditions.append(f"c.repo IN ({', '.join('?' * len(repos))})")
+        params.extend(repos)
+    where = ' AND '.join(conditions) or '1'
+
+    start, end = conn.execute(f'SELECT MIN(timestamp), MAX(timestamp) FROM commits c WHERE {where}', params).fetchone()
+    if start is None:
+        yield from iter_empty(NO_ACTIVITY, output_format)
+        return
+
+    conn.execute('DROP TABLE IF EXISTS temp.report')
+    conn.execute('DROP TABLE IF EXISTS temp.report_authors')
+    conn.execute('DROP TABLE IF EXISTS temp.report_offsets')
+    author_join = ''
+    if author_filter:
+        # Match authors with the same case-insensitive substring test as the formatters
+        pattern = author_filter.lower()
+        authors = [author for author in conn.execute('SELECT DISTINCT author_name, author_email FROM commits')
+                   if pattern in author[0].lower() or pattern in author[1].lower()]
+        conn.execute('CREATE TEMP TABLE report_authors (author_name TEXT, author_email TEXT)')
+        conn.executemany('INSERT INTO report_authors VALUES (?, ?)', authors)
+        author_join = ('JOIN report_authors a ON c.author_name = a.author_name '
+                       'AND c.author_email = a.author_email')
+
+    conn.execute('CREATE TEMP TABLE report_offsets (start INTEGER PRIMARY KEY, stop INTEGER, utc_offset INTEGER, '
+                 'tz_abbr TEXT)')
+    conn.executemany('INSERT INTO report_offsets VALUES (?, ?, ?, ?)',
+                     offset_intervals(get_timezone(timezone_str, timezone_backend), start, end))
+    conn.execute(REPORT_TABLE)
+    conn.execute(f"""
+        INSERT INTO report (timestamp, utc_offset, repo, commit_hash, message, minutes, author_name, author_email,
+                            week, day, time, tz_abbr)
+        SELECT c.timestamp, o.utc_offset, c.repo, c.commit_hash, c.message, c.minutes, c.author_name, c.author_email,
+               date(c.timestamp + o.utc_offset, 'unixepoch', '-6 days', 'weekday 1'),
+               date(c.timestamp + o.utc_offset, 'unixepoch'),
+               strftime('%H:%M', c.timestamp + o.utc_offset, 'unixepoch'),
+               o.tz_abbr
+        FROM commits c {author_join}
+        JOIN report_offsets o ON c.timestamp >= o.start AND c.timestamp < o.stop
+        WHERE {where}
+        ORDER BY c.timestamp, c.id""", params)
+
+    try:
+        if not conn.execute('SELECT EXISTS (SELECT 1 FROM report)').fetchone()[0]:
+            yield from iter_empty(NO_AUTHOR_ACTIVITY, output_format)
+            return
+
+        if output_format == 'csv':
+            yield from _iter_csv_report(conn)
+        elif output_format in ['markdown', 'md']:
+            yield from _iter_markdown_report(conn)
+        elif output_format == 'json':
+            yield from _iter_json_report(conn)
+        elif output_format == 'ndjson':
+            yield from _iter_ndjson_report(conn)
+        else:
+            yield from _iter_text_report(conn)
+    finally:
+        conn.execute('DROP TABLE IF EXISTS temp.report')
+
+def _totals(conn, group_by):
+    """Return the minutes of the report rows summed per group."""
+    rows = conn.execute(f'SELECT {group_by}, SUM(minutes) FROM report GROUP BY {group_by}')
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+def _iter_text_report(conn):
+    """Yield the lines of a plain text timesheet from the report rows."""
+    week_totals = _totals(conn, 'week')
+    day_totals = _totals(conn, 'day')
+    repo_totals = _totals(conn, 'day, repo')
+
+    week = day = repo = None
+    for row in conn.execute('SELECT week, day, repo, time, tz_abbr, minutes, message, commit_hash, author_name '
+                            'FROM report ORDER BY day, repo, seq'):
+        if row[0] != week:
+            if week is not None:
+                yield from text_week_footer(week_totals[(week,)])
+            week = row[0]
+            yield from text_week_header(week)
+        if row[1] != day:
+            day, repo = row[1], None
+            yield from text_day_header(day, day_totals[(day,)])
+        if row[2] != repo:
+            repo = row[2]
+            yield from text_repo_header(repo, repo_totals[(day, repo)])
+        yield text_entry_line(*row[3:])
+    yield from text_week_footer(week_totals[(week,)])
+
+def _iter_csv_report(conn):
+    """Yield the lines of a CSV timesheet from the report rows."""
+    yield CSV_HEADER
+    day_names = {}
+    for day, week, time, tz_abbr, minutes, repo, commit_hash, message, author_name in conn.execute(
+            'SELECT day, week, time, tz_abbr, minutes, repo, commit_hash, message, author_name '
+            'FROM report ORDER BY seq'):
+        if day not in day_names:
+            day_names[day] = day_name(day)
+        yield csv_line(day, day_names[day], week, time, tz_abbr, minutes, repo, commit_hash, message, author_name)
+
+def _iter_markdown_report(conn):
+    """Yield the lines of a Markdown timesheet from the report rows."""
+    week_totals = _totals(conn, 'week')
+    day_totals = _totals(conn, 'day')
+
+    yield from markdown_header()
+    week = day = None
+    # With a single MIN() aggregate, SQLite takes time and tz_abbr from the task's first commit
+    for row in conn.execute('SELECT week, day, repo, substr(message, 1, 30) AS task, COUNT(*), SUM(minutes), '
+                            'MIN(seq), time, tz_abbr FROM report GROUP BY day, repo, task '
+                            'ORDER BY day, repo, MIN(seq)'):
+        row_week, row_day, repo, task, count, task_total, _, time, tz_abbr = row
+        if row_day != day:
+            if day is not None:
+                yield from markdown_day_footer(day_totals[(day,)])
+            if row_week != week:
+                if week is not None:
+                    yield from markdown_week_footer(week_totals[(week,)])
+                week = row_week
+                yield from markdown_week_header(week)
+            day = row_day
+            first_row = True
+        yield markdown_task_line(day, first_row, time, tz_abbr, repo, task_total, task, count)
+        first_row = False
+    yield from markdown_day_footer(day_totals[(day,)])
+    yield from markdown_week_footer(week_totals[(week,)])
+
+def _iter_json_report(conn):
+    """Yield the lines of a JSON timesheet from the report rows."""
+    yield from iter_json_array(_json_report_records(conn, json_record))
+
+def _iter_ndjson_report(conn):
+    """Yield the lines of an NDJSON timesheet from the report rows."""
+    yield from _json_report_records(conn, ndjson_record)
+
+def _json_report_records(conn, record):
+    """Yield the report rows in order, encoded by ``json_record`` or ``ndjson_record``."""
+    for row in conn.execute('SELECT timestamp, utc_offset, tz_abbr, minutes, repo, commit_hash, message, '
+                            'author_name, author_email FROM report ORDER BY seq'):
+        timestamp, utc_offset = row[:2]
+        yield record(datetime.fromtimestamp(timestamp, fixed_offset(utc_offset)), *row[2:])
@@ -1,54 +1,131 @@
 #!/usr/bin/env python3
+import sys
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
-def convert_to_timezone(date, timezone_str='UTC'):
-    """Convert datetime to specified timezone."""
-    if date.tzinfo is None:
-        date = date.replace(tzinfo=pytz.UTC)
-    
-    # Handle common timezone aliases
-    timezone_aliases = {
-        # US timezone aliases
-        'US/Eastern': 'America/New_York',
-        'US/Central': 'America/Chicago',
-        'US/Mountain': 'America/Denver',
-        'US/Pacific': 'America/Los_Angeles',
-        'US/Alaska': 'America/Anchorage',
-        'US/Hawaii': 'Pacific/Honolulu',
-        
-        # Short timezone abbreviations
-        'EST': 'America/New_York',
-        'EDT': 'America/New_York',
-        'CST': 'America/Chicago',
-        'CDT': 'America/Chicago',
-        'MST': 'America/Denver',
-        'MDT': 'America/Denver',
-        'PST': 'America/Los_Angeles',
-        'PDT': 'America/Los_Angeles',
-        
-        # Prefixed short timezone abbreviations
-        'US/EST': 'America/New_York',
-        'US/EDT': 'America/New_York',
-        'US/CST': 'America/Chicago',
-        'US/CDT': 'America/Chicago',
-        'US/MST': 'America/Denver',
-        'US/MDT': 'America/Denver',
-        'US/PST': 'America/Los_Angeles',
-        'US/PDT': 'America/Los_Angeles'
-    }
-    
+# Handle common timezone aliases
+TIMEZONE_ALIASES = {
+    # US timezone aliases
+    'US/Eastern': 'America/New_York',
+    'US/Central': 'America/Chicago',
+    'US/Mountain': 'America/Denver',
+    'US/Pacific': 'America/Los_Angeles',
+    'US/Alaska': 'America/Anchorage',
+    'US/Hawaii': 'Pacific/Honolulu',
+
+    # Short timezone abbreviations
+    'EST': 'America/New_York',
+    'EDT': 'America/New_York',
+    'CST': 'America/Chicago',
+    'CDT': 'America/Chicago',
+    'MST': 'America/Denver',
+    'MDT': 'America/Denver',
+    'PST': 'America/Los_Angeles',
+    'PDT': 'America/Los_Angeles',
+
+    # Prefixed short timezone abbreviations
+    'US/EST': 'America/New_York',
+    'US/EDT': 'America/New_York',
+    'US/CST': 'America/Chicago',
+    'US/CDT': 'America/Chicago',
+    'US/MST': 'America/Denver',
+    'US/MDT': 'America/Denver',
+    'US/PST': 'America/Los_Angeles',
+    'US/PDT': 'America/Los_Angeles'
+}
+
+TIMEZONE_BACKENDS = ('pytz', 'zoneinfo')
+
+# Abbreviations of pytz tzinfo instances, each of which represents one transition
+_abbreviations = {}
+
+# Timezone names and UTC offsets whose tzinfo is kept; names come from
+# ``ggts serve`` requests too, so the caches are bounded
+TIMEZONE_CACHE_SIZE = 128
+
+@lru_cache(maxsize=TIMEZONE_CACHE_SIZE)
+def get_timezone(timezone_str='UTC', backend='pytz'):
+    """Resolve a timezone name or alias to a tzinfo object.
+
+    Recently used results are cached, so a run resolves (and warns about)
+    each timezone only once. ``backend`` selects ``pytz`` or the standard
+    library ``zoneinfo`` module (Python 3.9+).
+    """
     # Use the alias if available
-    tz_name = timezone_aliases.get(timezone_str, timezone_str)
-    
+    tz_name = TIMEZONE_ALIASES.get(timezone_str, timezone_str)
+
+    if backend == 'zoneinfo':
+        try:
+            from zoneinfo import ZoneInfo
+        except ImportError:
+            print("Warning: zoneinfo requires Python 3.9 or later. Falling back to pytz.", file=sys.stderr)
+        else:
+            try:
+                return ZoneInfo(tz_name)
+            except (ValueError, OSError):
+                print(f"Warning: Unknown timezone '{timezone_str}'. Falling back to UTC.", file=sys.stderr)
+                return timezone.utc
+
     try:
-        target_tz = pytz.timezone(tz_name)
+        return pytz.timezone(tz_name)
     except pytz.exceptions.UnknownTimeZoneError:
-        print(f"Warning: Unknown timezone '{timezone_str}'. Falling back to UTC.")
-        target_tz = pytz.UTC
-        
-    return date.astimezone(target_tz)
+        print(f"Warning: Unknown timezone '{timezone_str}'. Falling back to UTC.", file=sys.stderr)
+        return pytz.UTC
+
+def convert_to_timezone(date, timezone_str='UTC', backend='pytz'):
+    """Convert datetime to specified timezone."""
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=pytz.UTC)
+
+    return date.astimezone(get_timezone(timezone_str, backend))
 
 def get_timezone_abbr(date):
     """Get timezone abbreviation (like EDT, EST, CST) from a datetime object."""
-    return date.strftime('%Z')
\ No newline at end of file
+    tzinfo = date.tzinfo
+    abbr = _abbreviations.get(tzinfo)
+    if abbr is None:
+        abbr = date.tzname() or ''
+        # pytz attaches a separate tzinfo instance per transition, so the abbreviation can be reused
+        if isinstance(tzinfo, pytz.tzinfo.BaseTzInfo):
+            _abbreviations[tzinfo] = abbr
+    return abbr
+
+@lru_cache(maxsize=TIMEZONE_CACHE_SIZE)
+def fixed_offset(utc_offset):
+    """Return the tzinfo of a fixed UTC offset in seconds, as git prints dates in."""
+    return timezone(timedelta(seconds=utc_offset))
+
+def offset_intervals(tz, start, end):
+    """Split the timestamps from ``start`` to ``end`` into runs with one UTC offset in a timezone.
+
+    Returns ``(start, end, utc_offset, tz_abbr)`` tuples with ``end``
+    exclusive. The range is walked a day at a time and each change located
+    to the second, so many timestamps can be converted with integer
+    arithmetic instead of a datetime each.
+    """
+    def local(timestamp):
+        date = datetime.fromtimestamp(timestamp, tz)
+        return int(date.utcoffset().total_seconds()), get_timezone_abbr(date)
+
+    intervals = []
+    run_start, current = start, local(start)
+    timestamp = start
+    while timestamp < end:
+        step_end = min(timestamp + 86400, end)
+        if local(step_end) == current:
+            timestamp = step_end
+            continue
+        # Bisect to the first second with the new offset
+        low, high = timestamp, step_end
+        while high - low > 1:
+            middle = (low + high) // 2
+            if local(middle) == current:
+                low = middle
+            else:
+                high = middle
+        intervals.append((run_start, high) + current)
+        run_start, current = high, local(high)
+        timestamp = high
+    intervals.append((run_start, end + 1) + current)
+    return intervals
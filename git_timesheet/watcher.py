@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Watch mode.
+
+``ggts watch`` discovers repositories once and keeps their time entries,
+grouped by week and day, in memory. Each poll checks the files git rewrites
+when HEAD moves (``HEAD``, the branch file it points to and
+``packed-refs``) with a few ``stat`` calls per repository. Only
+repositories whose refs changed are read again, only the days their entries
+fall on are regrouped and totalled again, with the totals of their weeks,
+and outputs are rendered only when something changed.
+"""
+import os
+import asyncio
+import threading
+from bisect import bisect_left
+from itertools import chain
+from operator import attrgetter
+
+from .async_collector import iter_repo_results
+from .cache import resolve_date_range
+from .formatters import (NO_ACTIVITY, NO_AUTHOR_ACTIVITY, Rollup, filter_by_author, localize_entries,
+                         group_by_week, build_day_rollup, build_week_rollup, iter_rollup, write_lines)
+
+def find_git_dirs(repo_path):
+    """Return a repository's git directory and the common directory holding its refs.
+
+    Follows the ``gitdir:`` file of linked worktrees and submodules.
+    """
+    git_dir = os.path.join(repo_path, '.git')
+    if os.path.isfile(git_dir):
+        with open(git_dir, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = os.path.join(repo_path, content[len('gitdir:'):].strip())
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r', encoding='utf-8') as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+    except OSError:
+        pass
+    return os.path.normpath(git_dir), os.path.normpath(common_dir)
+
+def _stat_key(path):
+    """Return what identifies a version of a file git replaces atomically, or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+def ref_signature(git_dir, common_dir):
+    """Return a value that changes whenever the commit HEAD resolves to may have changed."""
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'rb') as f:
+            head = f.read()
+    except OSError:
+        return None
+    ref_key = None
+    if head.startswith(b'ref:'):
+        ref = head[len(b'ref:'):].strip().decode('utf-8', errors='replace')
+        ref_key = _stat_key(os.path.join(common_dir, ref))
+    return (head, ref_key, _stat_key(os.path.join(common_dir, 'packed-refs')),
+            _stat_key(os.path.join(common_dir, 'reftable', 'tables.list')))
+
+class TimesheetWatcher:
+    """Time entries of a set of repositories, kept up to date by polling their refs.
+
+    Relative ``since``/``until`` dates such as "2 weeks ago" are resolved
+    once, when the watcher is created, so every repository is read with the
+    same date range. Rendered timesheets are identical to ``ggts generate``
+    with the same options.
+    """
+
+    def __init__(self, repos, since=None, until=None, author=None, session_timeout_minutes=60,
+                 timezone_str='UTC', timezone_backend='pytz', jobs=None, timeout=None, use_cache=False,
+                 rules=None, backend='git'):
+        self.repos = list(repos)
+        self.indexes = {repo: index for index, repo in enumerate(self.repos)}
+        self.date_range = (None, None)
+        if self.repos and (since or until):
+            self.date_range = resolve_date_range(self.repos[0], since, until, timeout)
+        max_age, min_age = self.date_range
+        self.since = f'@{max_age}' if max_age is not None else None
+        self.until = f'@{min_age}' if min_age is not None else None
+        self.author = author
+        self.session_timeout_minutes = session_timeout_minutes
+        self.timezone_str = timezone_str
+        self.timezone_backend = timezone_backend
+        self.jobs = jobs
+        self.timeout = timeout
+        self.use_cache = use_cache
+        self.rules = rules
+        self.backend = backend
+
+        self.git_dirs = {repo: find_git_dirs(repo) for repo in self.repos}
+        self.signatures = {}
+        # Number of entries read from each repository, before the author filter
+        self.counts = {}
+        # (week, day) -> {repository index: entries}, and the days each repository has entries on
+        self.day_entries = {}
+        self.repo_days = {}
+        # The entries of all repositories as group_by_week returns them
+        self.weeks = {}
+        # (week, day) -> DayRollup, and the WeekRollup of each week in week order
+        self.day_rollups = {}
+        self.week_keys = []
+        self.week_rollups = []
+        # The rollup rendered by every output until the next update
+        self.rollup = None
+        self.lock = threading.Lock()
+
+    def changed_repos(self):
+        """Return the repositories whose refs changed since they were last read, with their new signatures."""
+        changed = {}
+        for repo in self.repos:
+            signature = ref_signature(*self.git_dirs[repo])
+            if repo not in self.signatures or signature != self.signatures[repo]:
+                changed[repo] = signature
+        return changed
+
+    def poll(self, on_skip=None):
+        """Read the repositories whose refs changed and update the aggregates.
+
+        The first poll reads every repository. Returns the repositories that
+        were updated. A repository that times out keeps its previous entries
+        and is retried on the next poll; ``on_skip`` is called with its
+        ``RepoResult``.
+        """
+        changed = self.changed_repos()
+        if not changed:
+            return []
+        return asyncio.run(self._refresh(changed, on_skip))
+
+    async def _refresh(self, changed, on_skip):
+        """Collect the changed repositories and apply their entries."""
+        updated = []
+        async for result in iter_repo_results(list(changed), self.since, self.until, self.author,
+                                              self.session_timeout_minutes, jobs=self.jobs, timeout=self.timeout,
+                                              use_cache=self.use_cache, rules=self.rules, backend=self.backend):
+            if result.time_entries is None:
+                if on_skip:
+                    on_skip(result)
+                continue
+            self.update(result.repo, result.time_entries)
+            self.signatures[result.repo] = changed[result.repo]
+            updated.append(result.repo)
+        return updated
+
+    def update(self, repo, time_entries):
+        """Replace a repository's entries, regrouping and totalling only the days whose entries changed."""
+        index = self.indexes[repo]
+        count = len(time_entries)
+        if self.author:
+            time_entries = filter_by_author(time_entries, self.author)
+        weeks = group_by_week(localize_entries(time_entries, self.timezone_str, self.timezone_backend))
+        days = {(week, day) for week, week_days in weeks.items() for day in week_days}
+
+        with self.lock:
+            self.counts[repo] = count
+            old_days = self.repo_days.get(repo, set())
+            changed = old_days - days
+            for key in changed:
+                del self.day_entries[key][index]
+            for week, week_days in weeks.items():
+                for day, entries in week_days.items():
+                    repo_entries = self.day_entries.setdefault((week, day), {})
+                    if repo_entries.get(index) != entries:
+                        repo_entries[index] = entries
+                        changed.add((week, day))
+            self.repo_days[repo] = days
+            for key in changed:
+                self._regroup(*key)
+            for week in {week for week, day in changed}:
+                self._retotal(week)
+            if changed:
+                self.rollup = None
+
+    def _regroup(self, week, day):
+        """Merge the repositories' entries for a day in the order ``ggts generate`` lists them, and total it."""
+        repo_entries = self.day_entries.get((week, day))
+        if not repo_entries:
+            self.day_entries.pop((week, day), None)
+            self.day_rollups.pop((week, day), None)
+            week_days = self.weeks.get(week, {})
+            week_days.pop(day, None)
+            if not week_days:
+                self.weeks.pop(week, None)
+            return
+        # Repository order, then a stable sort by timestamp, as when collecting
+        entries = chain.from_iterable(repo_entries[index] for index in sorted(repo_entries))
+        entries = self.weeks.setdefault(week, {})[day] = sorted(entries, key=attrgetter('timestamp'))
+        self.day_rollups[(week, day)] = build_day_rollup(day, entries)
+
+    def _retotal(self, week):
+        """Replace a week's rollup, from its days' rollups, in the week rollups."""
+        position = bisect_left(self.week_keys, week)
+        present = position < len(self.week_keys) and self.week_keys[position] == week
+        days = self.weeks.get(week)
+        if not days:
+            if present:
+                del self.week_keys[position]
+                del self.week_rollups[position]
+            return
+        week_rollup = build_week_rollup(week, [self.day_rollups[(week, day)] for day in sorted(days)])
+        if present:
+            self.week_rollups[position] = week_rollup
+        else:
+            self.week_keys.insert(position, week)
+            self.week_rollups.insert(position, week_rollup)
+
+    def current_rollup(self):
+        """Return the current entries as a ``Rollup`` of the week rollups kept up to date by ``update``."""
+        with self.lock:
+            if self.rollup is None:
+                if not any(self.counts.values()):
+                    self.rollup = Rollup([], NO_ACTIVITY)
+                elif not self.week_rollups:
+                    self.rollup = Rollup([], NO_AUTHOR_ACTIVITY)
+                else:
+                    # A copy of the list, so a later update does not change a rollup being rendered
+                    self.rollup = Rollup(list(self.week_rollups), None)
+            return self.rollup
+
+    def iter_timesheet(self, output_format='text'):
+        """Yield the lines of the timesheet for the current entries."""
+        yield from iter_rollup(self.current_rollup(), output_format)
+
+    def write(self, path, output_format='text'):
+        """Write the timesheet to a file, replacing it atomically so readers never see a partial file."""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            write_lines(self.iter_timesheet(output_format), f)
+        os.replace(tmp_path, path)
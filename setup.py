@@ -8,6 +8,11 @@ setup(
         "pytz>=2021.1",
         "click>=8.0.0",
     ],
+    extras_require={
+        "fast": ["numpy>=1.17"],
+        "dulwich": ["dulwich>=0.21"],
+        "pygit2": ["pygit2>=1.12"],
+    },
     entry_points={
         'console_scripts': [
             'ggts=git_timesheet.cli:main',
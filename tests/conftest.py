@@ -10,6 +10,21 @@ from datetime import datetime, timedelta
 # Add parent directory to path to import the module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+def commit(repo, message, date, committer_date=None, name='Test User', email='test@example.com'):
+    """Create an empty commit with fixed author and committer dates
+
+    Dates are git date strings or Unix timestamps (taken as UTC); the
+    committer date defaults to the author date.
+    """
+    if isinstance(date, int):
+        date = f'{date} +0000'
+    if isinstance(committer_date, int):
+        committer_date = f'{committer_date} +0000'
+    env = dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=committer_date or date,
+               GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=email,
+               GIT_COMMITTER_NAME=name, GIT_COMMITTER_EMAIL=email)
+    subprocess.run(['git', 'commit', '--allow-empty', '-m', message], cwd=repo, env=env, check=True, capture_output=True)
+
 @pytest.fixture
 def temp_git_repo():
     """Create a temporary git repository for testing"""
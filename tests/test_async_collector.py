@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import sys
+import os
+import time
+import asyncio
+import pytest
+import subprocess
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from git_timesheet.git_utils import iter_git_log
+from git_timesheet.collector import collect_time_entries
+from git_timesheet.async_collector import collect_time_entries_async, iter_repo_results, aiter_git_log
+
+@pytest.fixture
+def hanging_git(tmp_path, monkeypatch):
+    """Put a git on PATH that never finishes"""
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    git = bin_dir / 'git'
+    git.write_text('#!/bin/sh\nexec sleep 60\n')
+    git.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{bin_dir}{os.pathsep}{os.environ["PATH"]}')
+
+class TestAsyncCollector:
+    """Test the asyncio collection engine"""
+
+    def test_matches_collect_time_entries(self, temp_git_repos):
+        """Test that the async engine returns the same entries as the thread pool"""
+        base_dir, repo_dirs = temp_git_repos
+        progress = []
+
+        time_entries, skipped = asyncio.run(collect_time_entries_async(repo_dirs, jobs=2, progress=progress.append))
+
+        assert time_entries == collect_time_entries(repo_dirs, jobs=1)
+        assert skipped == []
+        assert progress == ['repo1', 'repo2']
+
+    def test_aiter_git_log(self, temp_git_repo):
+        """Test streaming commits from an asyncio child process"""
+        async def read():
+            return [commit async for commit in aiter_git_log(temp_git_repo)]
+
+        assert asyncio.run(read()) == list(iter_git_log(temp_git_repo))
+
+    def test_results_in_order(self, temp_git_repos):
+        """Test that results are streamed in repository order"""
+        base_dir, repo_dirs = temp_git_repos
+
+        async def read():
+            return [result.repo async for result in iter_repo_results(repo_dirs, jobs=2)]
+
+        assert asyncio.run(read()) == repo_dirs
+
+    @pytest.mark.skipif(sys.platform == 'win32', reason='uses a shell script as git')
+    @pytest.mark.parametrize('use_cache', [False, True])
+    def test_timeout_skips_repository(self, temp_git_repos, hanging_git, use_cache, tmp_path, monkeypatch):
+        """Test that a hung git is killed and its repository reported as skipped"""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        base_dir, repo_dirs = temp_git_repos
+
+        start = time.perf_counter()
+        time_entries, skipped = asyncio.run(collect_time_entries_async(repo_dirs, timeout=0.5, use_cache=use_cache))
+
+        assert time.perf_counter() - start < 10
+        assert time_entries == []
+        assert [result.repo for result in skipped] == repo_dirs
+        assert 'timed out' in skipped[0].error
+
+    @pytest.mark.skipif(sys.platform == 'win32', reason='uses a shell script as git')
+    def test_iter_git_log_timeout(self, temp_git_repo, hanging_git):
+        """Test that the synchronous reader also stops a hung git"""
+        with pytest.raises(subprocess.TimeoutExpired):
+            list(iter_git_log(temp_git_repo, timeout=0.3))
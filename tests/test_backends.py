@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import sys
+import os
+import pytest
+import hashlib
+import subprocess
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.conftest import commit
+from git_timesheet.git_utils import iter_git_log
+from git_timesheet.backends import iter_backend_log, format_subject, abbrev_length
+from git_timesheet.collector import collect_time_entries
+
+BACKENDS = [pytest.param(backend, marks=pytest.mark.skipif(
+    not __import__('importlib').util.find_spec(backend), reason=f'{backend} is not installed'))
+    for backend in ['dulwich', 'pygit2']]
+
+def git(repo, *args):
+    """Run a git command in a repository"""
+    subprocess.run(['git'] + list(args), cwd=repo, check=True, capture_output=True)
+
+@pytest.fixture
+def history_repo(temp_git_repo):
+    """A repository with a merge, equal commit dates, clock skew and a multi-line subject"""
+    git(temp_git_repo, 'checkout', '-q', '-b', 'side')
+    commit(temp_git_repo, 'Side work', '2023-06-01T11:00:00+0000')
+    commit(temp_git_repo, 'Same time on side', '2023-06-01T12:00:00+0000')
+    git(temp_git_repo, 'checkout', '-q', '-')
+    commit(temp_git_repo, 'Same time\non main\n\nBody text', '2023-06-01T12:00:00+0200')
+    env = dict(os.environ, GIT_AUTHOR_DATE='2023-06-01T12:00:00+0000', GIT_COMMITTER_DATE='2023-06-01T12:00:00+0000')
+    subprocess.run(['git', 'merge', '-q', '--no-ff', 'side', '-m', 'Merge side'], cwd=temp_git_repo, env=env,
+                   check=True, capture_output=True)
+    commit(temp_git_repo, 'Skewed clock', '2023-06-05T00:00:00-0500', committer_date='2023-05-01T00:00:00+0000')
+    commit(temp_git_repo, 'Fix bug', '2023-06-10T09:00:00-0400', name='Other Dev', email='other@example.com')
+    return temp_git_repo
+
+class TestBackends:
+    """Test the in-process git backends"""
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_matches_git_log(self, history_repo, backend):
+        """Test that in-process backends return the same commits, in the same order, as git log"""
+        for since, until, author in [(None, None, None),
+                                     ('2023-05-15', None, None),
+                                     (None, '2023-06-01 11:30 +0000', None),
+                                     (None, None, 'other@example'),
+                                     (None, None, '^Test')]:
+            expected = list(iter_git_log(history_repo, since, until, author))
+            assert list(iter_backend_log(history_repo, since, until, author, backend)) == expected
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_ambiguous_abbrev(self, temp_git_repo, backend):
+        """Test that an abbreviated hash shared with another object is extended as git log extends it"""
+        git(temp_git_repo, 'config', 'core.abbrev', '4')
+        head = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=temp_git_repo, check=True, capture_output=True,
+                              text=True).stdout.strip()
+        # Write a blob whose hash starts like the commit's
+        index = 0
+        while True:
+            data = f'blob {index}'.encode()
+            if hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()[:4] == head[:4]:
+                break
+            index += 1
+        subprocess.run(['git', 'hash-object', '-w', '--stdin'], cwd=temp_git_repo, input=data, check=True,
+                       capture_output=True)
+
+        expected = list(iter_git_log(temp_git_repo))
+        assert len(expected[0].commit_hash) > 4
+        assert list(iter_backend_log(temp_git_repo, backend=backend)) == expected
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_collect_time_entries(self, temp_git_repos, backend):
+        """Test collecting entries from several repositories with an in-process backend"""
+        base_dir, repo_dirs = temp_git_repos
+        expected = collect_time_entries(repo_dirs, jobs=1)
+        assert collect_time_entries(repo_dirs, jobs=2, backend=backend) == expected
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_not_a_repo(self, tmp_path, backend):
+        """Test that a directory that is not a repository yields nothing"""
+        assert list(iter_backend_log(str(tmp_path), backend=backend)) == []
+
+    def test_format_subject(self):
+        """Test that subjects are formatted like git log --pretty=%s"""
+        assert format_subject('\n  \nFirst line  \nsecond line\n\nBody\n') == 'First line second line'
+        assert format_subject('Only subject') == 'Only subject'
+
+    def test_abbrev_length(self):
+        """Test git's automatic abbreviated hash length"""
+        assert abbrev_length(0) == 7
+        assert abbrev_length(2 ** 15) == 8
+        assert abbrev_length(100, configured=12) == 12
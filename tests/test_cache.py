@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import sys
+import os
+import subprocess
+from unittest.mock import patch
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.conftest import commit
+from git_timesheet.git_utils import iter_git_log
+from git_timesheet.cache import get_cached_git_log, load_commits, _read_commits
+
+class TestCommitCache:
+    """Test the persistent git log cache"""
+
+    def test_matches_git_log(self, temp_git_repo, tmp_path):
+        """Test that cached commits match git log, including filters"""
+        commit(temp_git_repo, 'Fix bug', 1685613600)
+        commit(temp_git_repo, 'Add feature', 1685700000, name='Other Dev', email='other@example.com')
+        commit(temp_git_repo, 'Refactor code', 1685786400)
+
+        for since, until, author in [(None, None, None),
+                                     ('2023-06-01', None, None),
+                                     (None, '2023-06-03', 'Test'),
+                                     (None, None, 'other@example')]:
+            expected = list(iter_git_log(temp_git_repo, since, until, author))
+            cached = get_cached_git_log(temp_git_repo, since, until, author, cache_dir=tmp_path)
+            assert cached == expected
+
+    def test_skewed_history(self, temp_git_repo, tmp_path):
+        """Test that since stops at the first older commit of a line, as git log does, on skewed clocks"""
+        commit(temp_git_repo, 'Fix bug', 1578657600)       # 2020-01-10
+        commit(temp_git_repo, 'Add feature', 1577880000)   # 2020-01-01
+        commit(temp_git_repo, 'Refactor code', 1579521600) # 2020-01-20
+
+        expected = list(iter_git_log(temp_git_repo, '2020-01-05'))
+        assert [c.message for c in expected] == ['Refactor code']
+        assert get_cached_git_log(temp_git_repo, '2020-01-05', cache_dir=tmp_path) == expected
+
+    def test_incremental_update(self, temp_git_repo, tmp_path):
+        """Test that only new commits are read once the cache exists"""
+        commit(temp_git_repo, 'Fix bug', 1685613600)
+        assert len(load_commits(temp_git_repo, cache_dir=tmp_path)) == 2
+
+        commit(temp_git_repo, 'Add feature', 1685700000)
+        with patch('git_timesheet.cache._read_commits', wraps=_read_commits) as mock_read:
+            commits = load_commits(temp_git_repo, cache_dir=tmp_path)
+
+            # Only the new commit should have been requested from git
+            mock_read.assert_called_once()
+            assert '..' in mock_read.call_args[0][1]
+
+        assert [c[6] for c in commits] == ['Add feature', 'Fix bug', 'Initial commit']
+
+        # Unchanged HEAD is served without running git log at all
+        with patch('git_timesheet.cache._read_commits') as mock_read:
+            assert load_commits(temp_git_repo, cache_dir=tmp_path) == commits
+            mock_read.assert_not_called()
+
+    def test_incremental_merge(self, temp_git_repo, tmp_path):
+        """Test that commits of a merged branch are placed in git log order after an incremental update"""
+        now = int(subprocess.run(['git', 'log', '-1', '--format=%ct'], cwd=temp_git_repo, check=True,
+                                 capture_output=True, text=True).stdout)
+        subprocess.run(['git', 'checkout', '-q', '-b', 'side'], cwd=temp_git_repo, check=True)
+        commit(temp_git_repo, 'Side work', now + 50)
+        subprocess.run(['git', 'checkout', '-q', '-'], cwd=temp_git_repo, check=True)
+        commit(temp_git_repo, 'Fix bug', now + 100)
+        load_commits(temp_git_repo, cache_dir=tmp_path)
+
+        env = dict(os.environ, GIT_AUTHOR_DATE=f'{now + 200} +0000', GIT_COMMITTER_DATE=f'{now + 200} +0000')
+        subprocess.run(['git', 'merge', '-q', '--no-ff', '-m', 'Merge side', 'side'], cwd=temp_git_repo, env=env,
+                       check=True)
+        commits = load_commits(temp_git_repo, cache_dir=tmp_path)
+        assert [c[6] for c in commits] == ['Merge side', 'Fix bug', 'Side work', 'Initial commit']
+        assert commits == _read_commits(temp_git_repo, 'HEAD')
+
+    def test_rewritten_history(self, temp_git_repo, tmp_path):
+        """Test that the cache is rebuilt when HEAD is no longer a descendant of the cached tip"""
+        commit(temp_git_repo, 'Fix bug', 1685613600)
+        load_commits(temp_git_repo, cache_dir=tmp_path)
+
+        subprocess.run(['git', 'commit', '--amend', '--allow-empty', '-m', 'Fix another bug'],
+                       cwd=temp_git_repo, check=True, capture_output=True)
+        commits = load_commits(temp_git_repo, cache_dir=tmp_path)
+        assert [c[6] for c in commits] == ['Fix another bug', 'Initial commit']
+
+    def test_churn(self, temp_git_repo, tmp_path):
+        """Test that diff stats are read into the cache once asked for and kept for new commits"""
+        commit(temp_git_repo, 'Fix bug', 1685613600)
+        assert [c[7] for c in load_commits(temp_git_repo, cache_dir=tmp_path)] == [None, None]
+
+        # A cache without stats is rebuilt with them
+        assert get_cached_git_log(temp_git_repo, cache_dir=tmp_path, churn=True) == \
+            list(iter_git_log(temp_git_repo, churn=True))
+
+        with open(os.path.join(temp_git_repo, 'test.txt'), 'a') as f:
+            f.write('\nmore content\n')
+        subprocess.run(['git', 'commit', '-am', 'Add content'], cwd=temp_git_repo, check=True, capture_output=True)
+        with patch('git_timesheet.cache._read_commits', wraps=_read_commits) as mock_read:
+            commits = load_commits(temp_git_repo, cache_dir=tmp_path)
+            assert '..' in mock_read.call_args[0][1]
+        assert [(c[6], c[7]) for c in commits] == [('Add content', 3), ('Fix bug', 0), ('Initial commit', 1)]
+
+        # Stats are only passed on when asked for
+        assert get_cached_git_log(temp_git_repo, cache_dir=tmp_path) == list(iter_git_log(temp_git_repo))
+
+    def test_refresh(self, temp_git_repo, tmp_path):
+        """Test that refresh ignores existing cache contents"""
+        load_commits(temp_git_repo, cache_dir=tmp_path)
+        with patch('git_timesheet.cache._read_commits', wraps=_read_commits) as mock_read:
+            load_commits(temp_git_repo, refresh=True, cache_dir=tmp_path)
+            mock_read.assert_called_once()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import sys
+import os
+import pytest
+import threading
+import subprocess
+from operator import attrgetter
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.conftest import commit
+from git_timesheet.collector import collect_time_entries
+from git_timesheet.config import get_config
+from git_timesheet.engine import TimesheetEngine
+from git_timesheet.formatters import format_timesheet
+
+@pytest.fixture
+def engine(temp_git_repos):
+    """An engine for the test repositories that reads git directly"""
+    base_dir, repo_dirs = temp_git_repos
+    with TimesheetEngine(base_dir, author='test', use_cache=False, jobs=2) as engine:
+        yield engine
+
+class TestTimesheetEngine:
+    """Test querying entries and timesheets through a long-lived engine"""
+
+    def test_discovers_repos_once(self, engine, temp_git_repos):
+        """Test that repositories are discovered when the engine is created and on refresh"""
+        base_dir, repo_dirs = temp_git_repos
+        assert engine.repos == repo_dirs
+        assert engine.select_repos(['repo2']) == repo_dirs[1:]
+
+        new_repo = os.path.join(base_dir, 'repo3')
+        subprocess.run(['git', 'init', new_repo], check=True, capture_output=True)
+        assert engine.repos == repo_dirs
+        assert engine.refresh_repos() == repo_dirs + [new_repo]
+
+    def test_entries_match_collector(self, engine, temp_git_repos):
+        """Test that entries come in the order of a stable sort of the collected entries"""
+        _, repo_dirs = temp_git_repos
+        commit(repo_dirs[0], 'Fix bug', '2023-06-01T10:00:00+00:00')
+        commit(repo_dirs[1], 'Add feature', '2023-06-01T10:30:00+00:00')
+
+        expected = sorted(collect_time_entries(repo_dirs, author='test'), key=attrgetter('timestamp'))
+        assert list(engine.iter_entries()) == expected
+        assert list(engine.iter_entries(repos=['repo1'])) == [entry for entry in expected if entry.repo == 'repo1']
+
+    @pytest.mark.parametrize('output_format', ['text', 'csv', 'markdown', 'json', 'ndjson'])
+    def test_timesheet_matches_format(self, engine, temp_git_repos, output_format):
+        """Test that the rendered timesheet is the one formatted from the collected entries"""
+        _, repo_dirs = temp_git_repos
+        time_entries = sorted(collect_time_entries(repo_dirs, author='test'), key=attrgetter('timestamp'))
+
+        lines = list(engine.iter_timesheet(output_format, timezone_str='US/Eastern'))
+
+        assert '\n'.join(lines) == format_timesheet(time_entries, output_format, 'US/Eastern', 'test')
+        assert engine.rollup(author='nobody').message == "No git activity found in the specified time period."
+
+    def test_reads_only_changed_repos(self, engine, temp_git_repos):
+        """Test that a repeated query reads only the repositories whose refs changed"""
+        _, repo_dirs = temp_git_repos
+        first = list(engine.iter_entries())
+        assert engine.collections == 2
+
+        assert list(engine.iter_entries()) == first
+        assert engine.collections == 2
+
+        commit(repo_dirs[1], 'Fix bug', '2023-06-01T10:00:00+00:00')
+        assert len(list(engine.iter_entries())) == len(first) + 1
+        assert engine.collections == 3
+
+        # Another author is another query
+        list(engine.iter_entries(author='Other'))
+        assert engine.collections == 5
+
+    def test_concurrent_queries(self, engine):
+        """Test that queries from several threads get the same entries and read each repository once"""
+        results = []
+
+        def query():
+            results.append(list(engine.iter_entries(since='2000-01-01')))
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 8
+        assert all(result == results[0] for result in results)
+        assert engine.collections == 2
+
+    def test_relative_dates(self, temp_git_repos, tmp_path, monkeypatch):
+        """Test that a relative date resolving to a later time reuses entries while it selects the same commits"""
+        base_dir, repo_dirs = temp_git_repos
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+        commit(repo_dirs[0], 'Fix bug', '2023-06-01T10:00:00+00:00')
+        resolved = iter([(1685613600 - 3600, None), (1685613600 - 3540, None), (1685613600 + 1, None)])
+        monkeypatch.setattr('git_timesheet.engine.resolve_date_range', lambda *args: next(resolved))
+
+        with TimesheetEngine(base_dir, author='test', use_cache=True, repos=['repo1']) as engine:
+            first = list(engine.iter_entries(since='2 weeks ago'))
+            assert list(engine.iter_entries(since='2 weeks ago')) == first
+            assert engine.collections == 1
+            # Past the head commit, git stops walking before the later-dated initial commit
+            assert list(engine.iter_entries(since='2 weeks ago')) == []
+            assert engine.collections == 2
+            assert engine.collect_locks == {}
+
+    def test_global_session_scope(self, temp_git_repos):
+        """Test that global sessions clamp entries across repositories without changing the cached ones"""
+        base_dir, repo_dirs = temp_git_repos
+        commit(repo_dirs[0], 'Fix bug', '2023-06-01T10:00:00+00:00')
+        commit(repo_dirs[1], 'Fix typo', '2023-06-01T10:10:00+00:00')
+        estimates = {entry.message: entry.minutes for entry in collect_time_entries(repo_dirs, author='test')}
+
+        with TimesheetEngine(base_dir, author='test', use_cache=False, session_scope='global') as engine:
+            entries = [entry for entry in engine.iter_entries() if entry.message in ('Fix bug', 'Fix typo')]
+            assert [entry.minutes for entry in entries] == [10, estimates['Fix typo']]
+            assert [entry.minutes for entry in engine.entries[(repo_dirs[0], None, None, 'test', 60)][3]
+                    if entry.message == 'Fix bug'] == [estimates['Fix bug']]
+
+    def test_unknown_backend(self, temp_git_repos):
+        """Test that a backend that cannot be used is rejected"""
+        base_dir, _ = temp_git_repos
+        with pytest.raises(ValueError, match='Unknown backend'):
+            TimesheetEngine(base_dir, use_cache=False, backend='svn')
+
+    def test_config_loaded_quietly(self, tmp_path, monkeypatch, capsys):
+        """Test that loading the config prints the file only when asked to"""
+        (tmp_path / 'ggts.ini').write_text('[defaults]\nauthor = someone\n')
+        monkeypatch.chdir(tmp_path)
+
+        assert get_config()['author'] == 'someone'
+        assert capsys.readouterr() == ('', '')
+        get_config(verbose=True)
+        assert 'Loaded configuration from' in capsys.readouterr().err
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+import sys
+import os
+import re
+import random
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from git_timesheet.estimation import estimate_minutes, EstimationRules, apportion_sessions
+from git_timesheet.models import TimeEntry
+from git_timesheet.config import get_estimation_rules
+
+class TestEstimation:
+    """Test batch time estimation"""
+
+    def test_estimate_minutes(self):
+        """Test keyword bonuses and clamping to the gap before the next commit"""
+        timestamps = [0, 20 * 60, 30 * 60, 3 * 3600]
+        messages = ['Fix bug in login', 'Implement new feature', 'Refactor code', 'Update docs']
+
+        minutes = estimate_minutes(timestamps, messages, 60, use_numpy=False)
+
+        # Fix clamped to the 20 minute gap, feature to 10, refactor not clamped (gap > timeout)
+        assert minutes == [20.0, 10.0, 30, 15]
+        assert isinstance(minutes[2], int)
+
+    def test_numpy_matches_python(self):
+        """Test that the vectorized path returns exactly the same minutes"""
+        pytest.importorskip('numpy')
+        rng = random.Random(42)
+        messages = ['Fix bug', 'Add feature', 'Refactor', 'Update docs', 'Improve and fix', 'Merge branch']
+        timestamps = []
+        current = 1685613600.0
+        for _ in range(1000):
+            current += rng.choice([0, 1, 600, 1800, 2700, 3599, 3600, 3601, 86400])
+            timestamps.append(current)
+        messages = [rng.choice(messages) for _ in timestamps]
+
+        for session_timeout in [0, 15, 45, 60, 120]:
+            expected = estimate_minutes(timestamps, messages, session_timeout, use_numpy=False)
+            actual = estimate_minutes(timestamps, messages, session_timeout, use_numpy=True)
+            assert actual == expected
+            assert [type(m) for m in actual] == [type(m) for m in expected]
+
+        rules = EstimationRules.with_defaults(churn_minutes=7)
+        churn = [rng.choice([0, 1, 3, 10, 250, 100000]) for _ in timestamps]
+        expected = estimate_minutes(timestamps, messages, 60, use_numpy=False, rules=rules, churn=churn)
+        assert estimate_minutes(timestamps, messages, 60, use_numpy=True, rules=rules, churn=churn) == expected
+        assert expected != estimate_minutes(timestamps, messages, 60, use_numpy=False, rules=rules)
+
+class TestEstimationRules:
+    """Test the compiled keyword rule engine"""
+
+    def test_matches_separate_searches(self):
+        """Test that the single scan finds every rule a separate search would"""
+        rules = EstimationRules([
+            ('fix', r'fix|bug', 15),
+            ('fixup', r'fixup', 5),
+            ('client', r'acme', 20),
+            ('anchored', r'^wip', 1),
+        ])
+        messages = ['fixup! acme bug', 'Fix', 'wip on acme', 'acme wip', 'nothing here', '']
+        for message in messages:
+            expected = {i for i, (_, pattern, _) in enumerate(rules.rules)
+                        if re.search(pattern, message, re.I)}
+            assert rules.matching_rules(message) == expected
+
+        assert rules.message_minutes('fixup! acme bug') == 15 + 15 + 5 + 20
+
+    def test_with_defaults(self):
+        """Test that custom rules replace built-in rules by name and add new ones"""
+        rules = EstimationRules.with_defaults([('fix', r'hotfix', 5), ('docs', r'docs?', 10)])
+
+        assert [name for name, _, _ in rules.rules] == ['fix', 'feature', 'refactor', 'docs']
+        assert rules.message_minutes('Fix bug') == 15
+        assert rules.message_minutes('Hotfix docs') == 15 + 5 + 10
+        assert estimate_minutes([0], ['Update docs'], rules=rules) == [25]
+
+    def test_churn_bonus(self):
+        """Test that changed lines add minutes per doubling, and nothing unless enabled"""
+        rules = EstimationRules.with_defaults(churn_minutes=5)
+        assert [rules.churn_bonus(lines) for lines in [0, 1, 3, 100, 10000]] == [0, 5, 10, 33, 66]
+        assert rules.commit_minutes('Fix bug', 3) == 40
+        assert EstimationRules().commit_minutes('Fix bug', 3) == 30
+
+    def test_invalid_pattern(self):
+        """Test that an invalid pattern names the offending rule"""
+        with pytest.raises(ValueError, match='broken'):
+            EstimationRules([('broken', r'(unclosed', 5)])
+
+    def test_patterns_that_cannot_be_joined(self):
+        """Test that patterns valid alone but changed by joining the rules are rejected with ValueError"""
+        with pytest.raises(ValueError, match="'docs'.*global flags"):
+            EstimationRules.with_defaults([('docs', r'(?i)docs', 10)])
+        with pytest.raises(ValueError, match="'double'.*backreferences"):
+            EstimationRules.with_defaults([('double', r'(a)\1', 10)])
+        with pytest.raises(ValueError, match='Invalid estimation rules'):
+            EstimationRules([('first', r'(?P<word>fix)', 5), ('second', r'(?P<word>bug)', 5)])
+
+        # Scoped flags, named backreferences and escaped backslashes keep working
+        rules = EstimationRules.with_defaults([('docs', r'(?i:docs)', 10), ('double', r'(?P<a>a)(?P=a)', 10),
+                                               ('path', r'\\1', 5)])
+        assert rules.message_minutes('aa docs') == 15 + 10 + 10
+        assert rules.message_minutes('a\\1') == 15 + 5
+
+    def test_rules_file(self, tmp_path, monkeypatch):
+        """Test loading rules from a rules file"""
+        monkeypatch.setattr('git_timesheet.config.get_config_paths', lambda: [])
+        rules_file = tmp_path / 'rules.ini'
+        rules_file.write_text('[rule:client]\npattern = acme|100%\nminutes = 45\n\n'
+                              '[rule:feature]\npattern = feature\nminutes = 0\n')
+
+        rules = get_estimation_rules(str(rules_file))
+
+        assert rules.message_minutes('Add acme login') == 15 + 45
+        assert rules.message_minutes('New feature') == 15
+
+        with pytest.raises(ValueError):
+            get_estimation_rules(str(tmp_path / 'missing.ini'))
+
+class TestGlobalSessions:
+    """Test estimating sessions across repositories"""
+
+    @staticmethod
+    def random_entries(count, seed=7):
+        """Entries in date order spread over several repositories and two authors"""
+        rng = random.Random(seed)
+        messages = ['Fix bug', 'Add feature', 'Refactor', 'Update docs', 'misc']
+        entries = []
+        timestamp = 1685613600
+        for i in range(count):
+            timestamp += rng.choice([0, 60, 600, 1200, 3599, 3600, 7200, 86400])
+            author = rng.choice(['Alice', 'Bob'])
+            entries.append(TimeEntry.from_timestamp(timestamp, 0, f'repo{rng.randrange(3)}', rng.choice(messages),
+                                                    f'{i:07x}', 0, author, f'{author.lower()}@example.com'))
+        return entries
+
+    def test_bouncing_between_repos(self):
+        """Test that an hour spent switching between repositories is counted once"""
+        entries = [TimeEntry.from_timestamp(1685613600 + minute * 60, 0, repo, 'Implement feature', f'{minute:07x}',
+                                            0, 'Test User', 'test@example.com')
+                   for minute, repo in [(0, 'repo1'), (20, 'repo2'), (40, 'repo3'), (60, 'repo1')]]
+
+        minutes = [entry.minutes for entry in apportion_sessions(iter(entries))]
+
+        assert minutes == [20.0, 20.0, 20.0, 45]
+
+        # Churn weighting carries over to the re-estimated last commit
+        rules = EstimationRules.with_defaults(churn_minutes=5)
+        entries[-1].churn = 3
+        assert [entry.minutes for entry in apportion_sessions(iter(entries), rules=rules)] == [20.0, 20.0, 20.0, 55]
+
+    @pytest.mark.parametrize('by_author', [False, True])
+    @pytest.mark.parametrize('session_timeout', [0, 30, 60, 120])
+    def test_matches_estimate_minutes(self, by_author, session_timeout):
+        """Test that the sweep gives each author's merged history the minutes estimate_minutes does"""
+        entries = self.random_entries(500)
+        groups = {}
+        for entry in entries:
+            groups.setdefault(entry.author_name if by_author else None, []).append(entry)
+        expected = {}
+        for group in groups.values():
+            minutes = estimate_minutes([entry.timestamp for entry in group], [entry.message for entry in group],
+                                       session_timeout, use_numpy=False)
+            expected.update((entry.commit, value) for entry, value in zip(group, minutes))
+
+        result = list(apportion_sessions(iter(entries), session_timeout, by_author=by_author))
+
+        assert result == entries
+        assert [entry.minutes for entry in result] == [expected[entry.commit] for entry in result]
+        assert [type(entry.minutes) for entry in result] == [type(expected[entry.commit]) for entry in result]
+
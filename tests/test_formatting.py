@@ -4,11 +4,14 @@ import os
 import pytest
 from datetime import datetime
 import pytz
+import io
+import json
 from collections import defaultdict
 
 # Add parent directory to path to import the module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from git_timesheet.formatters import format_text, format_csv, format_markdown, format_timesheet
+from git_timesheet.formatters import (format_text, format_csv, format_markdown, format_timesheet, write_timesheet,
+                                      build_timesheet, iter_rollup, localize_entries, NDJSON_SCHEMA)
 
 class TestFormatting:
     """Test output formatting functions"""
@@ -145,4 +148,81 @@ class TestFormatting:
         
         output = format_timesheet(entries, 'text', 'UTC')
         assert "No git activity found" not in output
-        assert "Fix login bug" in output
\ No newline at end of file
+        assert "Fix login bug" in output
+    
+    @pytest.mark.parametrize('output_format', ['text', 'csv', 'markdown'])
+    def test_write_timesheet(self, sample_entries, output_format):
+        """Test that streaming output matches the formatted string"""
+        sink = io.StringIO()
+        write_timesheet(sample_entries, sink, output_format, 'UTC', 'test')
+        
+        assert sink.getvalue() == format_timesheet(sample_entries, output_format, 'UTC', 'test')
+        assert 'Fix login bug' in sink.getvalue()
+    
+    def test_literal_backslash_n_in_message(self, sample_entries):
+        """Test that a literal backslash-n in a commit message is not turned into a newline"""
+        sample_entries[0]['message'] = r'Escape \n in output'
+        
+        output = format_timesheet(sample_entries, 'text', 'UTC', 'test')
+        assert r'Escape \n in output' in output
+    
+    def test_rollup_totals(self, sample_entries):
+        """Test that the rollup holds the week, day, repository and task totals"""
+        sample_entries.append(dict(sample_entries[0], date=datetime(2023, 6, 1, 10, 20, 0, tzinfo=pytz.UTC),
+                                   commit='fed4321', minutes=10))
+        rollup = build_timesheet(sample_entries, 'UTC', 'test')
+        
+        week, = rollup.weeks
+        assert week.week_start == '2023-05-29'
+        assert week.total == 100
+        assert [(day.day, day.name, day.total) for day in week.days] == \
+            [('2023-06-01', 'Thursday', 85), ('2023-06-02', 'Friday', 15)]
+        repo, = week.days[0].repos
+        assert [(task.name, task.total, len(task.entries)) for task in repo.tasks] == \
+            [('Fix login bug', 40, 2), ('Add new feature', 45, 1)]
+        assert [local_entry.entry['commit'] for local_entry in week.days[0].entries] == \
+            ['abc1234', 'fed4321', 'def5678']
+    
+    def test_rollup_renders_every_format(self, sample_entries):
+        """Test that one rollup renders each format as format_timesheet does"""
+        rollup = build_timesheet(sample_entries, 'US/Eastern', 'test')
+        for output_format in ['text', 'csv', 'markdown', 'json']:
+            assert '\n'.join(iter_rollup(rollup, output_format)) == \
+                format_timesheet(sample_entries, output_format, 'US/Eastern', 'test')
+        
+        assert build_timesheet([], 'UTC').message == "No git activity found in the specified time period."
+    
+    def test_localize_across_dst(self, sample_entries):
+        """Test that entries around a DST change get the right local day, time and abbreviation"""
+        entries = [dict(sample_entries[0], date=datetime(2023, 11, 5, hour, 30, 0, tzinfo=pytz.UTC),
+                        commit=f'abc{hour:04d}') for hour in (3, 5, 6, 7)]
+        expected = [('2023-11-04', '23:30', 'EDT'), ('2023-11-05', '01:30', 'EDT'),
+                    ('2023-11-05', '01:30', 'EST'), ('2023-11-05', '02:30', 'EST')]
+        for backend in ('pytz', 'zoneinfo'):
+            rollup = build_timesheet(entries, 'US/Eastern', 'test', backend)
+            rows = list(iter_rollup(rollup, 'csv'))[1:]
+            assert [tuple(row.split(',')[i].strip('"') for i in (0, 3, 4)) for row in rows] == expected
+        
+        local_entries = localize_entries(entries, 'US/Eastern')
+        assert [local_entry.utc_offset for local_entry in local_entries] == [-14400, -14400, -18000, -18000]
+        assert local_entries[0].entry is entries[0]
+    
+    def test_ndjson_records(self, sample_entries):
+        """Test that NDJSON has a record per commit, followed by day and week totals with rollups"""
+        array = json.loads(format_timesheet(sample_entries, 'json', 'US/Eastern', 'test'))
+        records = [json.loads(line) for line in
+                   format_timesheet(sample_entries, 'ndjson', 'US/Eastern', 'test', rollups=True).split('\n')]
+        
+        for record in records:
+            assert tuple(record) == NDJSON_SCHEMA[record['type']]
+        assert [record['type'] for record in records] == ['entry', 'entry', 'day', 'entry', 'day', 'week']
+        assert [dict(record, type=None) for record in records if record['type'] == 'entry'] == \
+            [dict(record, type=None) for record in array]
+        assert [(record['date'], record['minutes'], record['commits']) for record in (records[2], records[4])] == \
+            [('2023-06-01', 75, 2), ('2023-06-02', 15, 1)]
+        assert (records[-1]['week'], records[-1]['minutes'], records[-1]['commits'], records[-1]['author']) == \
+            ('2023-05-29', 90, 3, None)
+        
+        assert format_timesheet(sample_entries, 'ndjson', 'UTC', 'test').count('\n') == 2
+        assert format_timesheet(sample_entries, 'ndjson', 'UTC', 'nobody') == ''
+
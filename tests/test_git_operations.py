@@ -8,7 +8,9 @@ from datetime import datetime
 
 # Add parent directory to path to import the module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from git_timesheet.git_utils import get_git_repos, get_git_log, estimate_time_spent
+from git_timesheet.git_utils import (get_git_repos, get_git_log, iter_git_log, estimate_time_spent, author_matcher,
+                                     parse_raw_date, split_shortstat)
+from git_timesheet.estimation import EstimationRules
 
 class TestGitOperations:
     """Test git repository operations"""
@@ -30,23 +32,42 @@ class TestGitOperations:
             assert len(repos) == 1
             assert repos[0] == '/fake/path'
     
-    def test_get_git_repos_subdirs(self):
+    def test_get_git_repos_subdirs(self, tmp_path):
         """Test finding git repositories in subdirectories"""
-        with patch('os.path.exists') as mock_exists, \
-             patch('os.path.isdir') as mock_isdir, \
-             patch('os.listdir') as mock_listdir:
-            
-            # Mock the current directory as NOT a git repo
-            mock_exists.side_effect = lambda path: '.git' in path and 'repo1/.git' in path or 'repo2/.git' in path
-            mock_isdir.return_value = True
-            mock_listdir.return_value = ['repo1', 'repo2', 'not_a_repo']
-            
-            repos = get_git_repos('/fake/path')
-            
-            # Should find two repos in subdirectories
-            assert len(repos) == 2
-            assert '/fake/path/repo1' in repos
-            assert '/fake/path/repo2' in repos
+        for name in ['repo1', 'repo2']:
+            (tmp_path / name / '.git').mkdir(parents=True)
+        (tmp_path / 'not_a_repo').mkdir()
+        (tmp_path / 'file.txt').write_text('not a directory')
+        
+        repos = get_git_repos(str(tmp_path))
+        
+        # Should find two repos in subdirectories
+        assert repos == [str(tmp_path / 'repo1'), str(tmp_path / 'repo2')]
+    
+    def test_get_git_repos_recursive(self, tmp_path):
+        """Test recursive discovery with depth limits, pruning and excludes"""
+        (tmp_path / 'org' / 'team' / 'repo' / '.git').mkdir(parents=True)
+        (tmp_path / 'org' / 'team' / 'repo' / 'vendor' / 'nested' / '.git').mkdir(parents=True)
+        (tmp_path / 'org' / 'archive' / 'old' / '.git').mkdir(parents=True)
+        (tmp_path / 'app' / 'node_modules' / 'dep' / '.git').mkdir(parents=True)
+        (tmp_path / 'top' / '.git').mkdir(parents=True)
+        
+        # Default depth only looks at immediate subdirectories
+        assert get_git_repos(str(tmp_path)) == [str(tmp_path / 'top')]
+        
+        expected = [str(tmp_path / 'org' / 'archive' / 'old'),
+                    str(tmp_path / 'org' / 'team' / 'repo'),
+                    str(tmp_path / 'top')]
+        assert get_git_repos(str(tmp_path), max_depth=3) == expected
+        assert get_git_repos(str(tmp_path), max_depth=None, jobs=4) == expected
+        assert get_git_repos(str(tmp_path), max_depth=2) == [str(tmp_path / 'top')]
+        
+        # Excludes match directory names or paths relative to the base directory
+        assert get_git_repos(str(tmp_path), max_depth=0, exclude=['org/arch*']) == expected[1:]
+        assert get_git_repos(str(tmp_path), max_depth=0, exclude=['team', 'top']) == expected[:1]
+        
+        # Pruned directories are searched when pruning is disabled
+        assert str(tmp_path / 'app' / 'node_modules' / 'dep') in get_git_repos(str(tmp_path), max_depth=0, prune=())
     
     def test_get_git_log(self):
         """Test getting git log"""
@@ -95,4 +116,61 @@ class TestGitOperations:
         # Check other fields
         assert time_entries[0]['repo'] == 'test-repo'
         assert time_entries[0]['message'] == 'Fix bug in login'
-        assert time_entries[0]['commit'] == 'abc123'
\ No newline at end of file
+        assert time_entries[0]['commit'] == 'abc123'
+    
+    def test_estimate_time_spent_pipe_in_message(self):
+        """Test that a subject containing '|' is not truncated"""
+        commits = ["2023-06-01 12:00:00 +0000|Author Name|author@example.com|Fix a | b|abc123"]
+        
+        time_entries = estimate_time_spent(commits, 'test-repo')
+        
+        assert time_entries[0]['message'] == 'Fix a | b'
+        assert time_entries[0]['commit'] == 'abc123'
+    
+    def test_parse_raw_date(self):
+        """Test parsing git's raw dates into a timestamp and UTC offset in seconds"""
+        assert parse_raw_date('1685613600 +0000') == (1685613600, 0)
+        assert parse_raw_date('1685613600 -0430') == (1685613600, -16200)
+        assert parse_raw_date('1685613600 +0545') == (1685613600, 20700)
+    
+    def test_split_shortstat(self):
+        """Test separating the subject from the --shortstat line git log appends to it"""
+        assert split_shortstat('Fix a | b\n 2 files changed, 3 insertions(+), 1 deletion(-)\n') == ('Fix a | b', 4)
+        assert split_shortstat('Remove file\n 1 file changed, 10 deletions(-)\n') == ('Remove file', 10)
+        assert split_shortstat('Empty commit') == ('Empty commit', 0)
+    
+    def test_iter_git_log_churn(self, temp_git_repo):
+        """Test reading diff stats in the same git log pass and weighting estimates by them"""
+        with open(os.path.join(temp_git_repo, 'test.txt'), 'w') as f:
+            f.write('one\ntwo\nthree\n')
+        subprocess.run(['git', 'commit', '-am', 'Rewrite test file'], cwd=temp_git_repo, check=True,
+                       capture_output=True)
+        subprocess.run(['git', 'commit', '--allow-empty', '-m', 'Empty commit'], cwd=temp_git_repo, check=True,
+                       capture_output=True)
+        
+        plain = list(iter_git_log(temp_git_repo))
+        commits = list(iter_git_log(temp_git_repo, churn=True))
+        
+        assert [commit.churn for commit in plain] == [None, None, None]
+        assert [commit.churn for commit in commits] == [0, 4, 1]
+        assert [commit._replace(churn=None) for commit in commits] == plain
+        
+        # Spread a day apart so no estimate is clamped by the next commit
+        commits = [commit._replace(timestamp=1685613600 - i * 86400) for i, commit in enumerate(commits)]
+        rules = EstimationRules.with_defaults(churn_minutes=10)
+        assert [entry.minutes for entry in estimate_time_spent(commits, 'test-repo')] == [15, 15, 15]
+        assert [entry.minutes for entry in estimate_time_spent(commits, 'test-repo', rules=rules)] == [25, 38, 15]
+        assert [entry.churn for entry in estimate_time_spent(commits, 'test-repo', rules=rules)] == [1, 4, 0]
+    
+    def test_author_matcher(self):
+        """Test author matching follows git log --author basic regex rules"""
+        matches = author_matcher('Author')
+        assert matches('Author Name', 'someone@example.com')
+        assert not matches('author name', 'someone@example.com')
+        
+        # Email addresses are matched as part of "Name <email>"
+        assert author_matcher('<author@example')('Name', 'author@example.com')
+        
+        # A bare | is literal in a basic regex, \| is alternation
+        assert not author_matcher('Alice|Bob')('Bob', 'bob@example.com')
+        assert author_matcher('Alice\\|Bob')('Bob', 'bob@example.com')
\ No newline at end of file
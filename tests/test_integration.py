@@ -1,14 +1,32 @@
 #!/usr/bin/env python3
 import sys
 import os
+import json
 import pytest
 import subprocess
 from datetime import datetime, timedelta
 
 # Add parent directory to path to import the module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from git_timesheet.git_utils import get_git_repos, get_git_log, estimate_time_spent
-from git_timesheet.formatters import format_timesheet
+from tests.conftest import commit
+from git_timesheet.git_utils import get_git_repos, get_git_log, iter_git_log, estimate_time_spent
+from git_timesheet.formatters import format_timesheet, iter_author_timesheets
+from git_timesheet.collector import collect_time_entries, partition_by_author
+
+@pytest.fixture
+def team_repos(temp_git_repos):
+    """The test repositories with commits by a second author between the first author's"""
+    base_dir, repo_dirs = temp_git_repos
+    for repo in repo_dirs:
+        commit(repo, 'Add feature flags', '2023-11-06T09:20:00+0000', name='Other Dev', email='other@example.com')
+        commit(repo, 'Fix login bug', '2023-11-06T09:40:00+0000')
+        commit(repo, 'Update docs', '2023-11-06T10:00:00+0000', name='Other Dev', email='other@example.com')
+    return repo_dirs
+
+def single_author_timesheet(repos, author, output_format):
+    """Format the entries of one author the way ggts generate --author does"""
+    time_entries = sorted(collect_time_entries(repos, author=author), key=lambda entry: entry.date)
+    return format_timesheet(time_entries, output_format, 'US/Eastern', author)
 
 class TestIntegration:
     """Integration tests using real git repositories"""
@@ -26,6 +44,18 @@ class TestIntegration:
         assert len(repos) == 2
         assert set(repos) == set(repo_dirs)
     
+    def test_parallel_collection_matches_serial(self, temp_git_repos):
+        """Test that parallel collection merges results in repository order"""
+        base_dir, repo_dirs = temp_git_repos
+        processed = []
+        
+        serial = collect_time_entries(repo_dirs, jobs=1)
+        parallel = collect_time_entries(repo_dirs, jobs=4, progress=processed.append)
+        
+        assert parallel == serial
+        assert [entry['repo'] for entry in parallel] == ['repo1', 'repo2']
+        assert processed == ['repo1', 'repo2']
+    
     def test_git_log_retrieval(self, temp_git_repo):
         """Test retrieving git log from a repository"""
         # Make a new commit
@@ -43,6 +73,25 @@ class TestIntegration:
         assert 'Initial commit' in log[1]
         assert 'Add more content' in log[0]
     
+    def test_git_log_streaming(self, temp_git_repo):
+        """Test streaming parsed commits, including subjects containing separators"""
+        subprocess.run(['git', 'commit', '--allow-empty', '-m', 'Fix a|b parsing | again'],
+                       cwd=temp_git_repo, check=True, capture_output=True)
+        
+        commits = list(iter_git_log(temp_git_repo))
+        
+        assert [c.message for c in commits] == ['Fix a|b parsing | again', 'Initial commit']
+        assert commits[0].author_name == 'Test User'
+        assert commits[0].author_email == 'test@example.com'
+        assert commits[0].date.tzinfo is not None
+        
+        time_entries = estimate_time_spent(commits, 'repo')
+        assert 'Fix a|b parsing | again' in [entry['message'] for entry in time_entries]
+    
+    def test_git_log_streaming_not_a_repo(self, tmp_path):
+        """Test that streaming from a directory that is not a repository yields nothing"""
+        assert list(iter_git_log(str(tmp_path))) == []
+    
     def test_end_to_end(self, temp_git_repo):
         """Test the entire workflow from git log to formatted output"""
         # Configure git to use a matching author name for the test
@@ -93,4 +142,57 @@ class TestIntegration:
         # Format as markdown
         md_output = format_timesheet(time_entries, 'markdown', 'UTC')
         assert '# Git Activity Timesheet' in md_output
-        assert 'Fix critical bug' in md_output
\ No newline at end of file
+        assert 'Fix critical bug' in md_output
+
+class TestTeamReport:
+    """Test team timesheets collected once for all authors"""
+
+    @pytest.mark.parametrize('output_format', ['text', 'markdown'])
+    def test_sections_match_single_author(self, team_repos, output_format):
+        """Test that each author's section is the timesheet of a run for that author"""
+        time_entries = sorted(collect_time_entries(team_repos, by_author=True), key=lambda entry: entry.date)
+        sections = partition_by_author(time_entries, ['Test', 'Other', 'nobody'])
+        lines = list(iter_author_timesheets(sections, output_format, 'US/Eastern'))
+
+        expected = [single_author_timesheet(team_repos, author, output_format) for author in ['Test', 'Other', 'nobody']]
+        if output_format == 'text':
+            for author, timesheet in zip(['Test', 'Other', 'nobody'], expected):
+                start = lines.index(f'Author: {author}') + 2
+                assert '\n'.join(lines[start:start + timesheet.count('\n') + 1]) == timesheet
+        else:
+            text = '\n'.join(lines)
+            assert text.count('# Git Activity Timesheet: ') == 3
+            for timesheet in expected[:2]:
+                assert timesheet.replace('# Git Activity Timesheet\n', '') in text
+            assert lines[-1] == "No git activity found in the specified time period."
+
+    def test_all_authors(self, team_repos):
+        """Test a section per author name and email, sorted by name"""
+        time_entries = collect_time_entries(team_repos, by_author=True)
+        sections = partition_by_author(time_entries)
+
+        assert [author for author, entries, author_filter in sections] == \
+            ['Other Dev <other@example.com>', 'Test User <test@example.com>']
+        assert sum(len(entries) for author, entries, author_filter in sections) == len(time_entries)
+
+    def test_csv_lists_authors_in_turn(self, team_repos):
+        """Test that CSV team timesheets are one table with each author's rows in turn"""
+        time_entries = collect_time_entries(team_repos, by_author=True)
+        lines = list(iter_author_timesheets(partition_by_author(time_entries, ['Other', 'Test']), 'csv'))
+
+        assert lines[0].startswith('Date,Day,Week')
+        authors = [line.rsplit(',', 1)[1] for line in lines[1:]]
+        assert authors == sorted(authors, key=lambda author: author != '"Other Dev"')
+        assert len(authors) == len(time_entries)
+
+    def test_ndjson_rollups_name_author(self, team_repos):
+        """Test that NDJSON team timesheets stream each author's records with totals naming the author"""
+        time_entries = collect_time_entries(team_repos, by_author=True)
+        sections = partition_by_author(time_entries, ['Other', 'Test'])
+        records = [json.loads(line) for line in iter_author_timesheets(sections, 'ndjson', rollups=True)]
+
+        assert sum(record['type'] == 'entry' for record in records) == len(time_entries)
+        authors = [record['author'] for record in records if record['type'] == 'week']
+        assert authors[0] == 'Other' and set(authors) == {'Other', 'Test'}
+        assert authors == sorted(authors, key=lambda author: author != 'Other')
+
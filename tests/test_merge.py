@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import sys
+import os
+import asyncio
+import pytest
+from operator import attrgetter
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from git_timesheet.models import TimeEntry
+from git_timesheet.merge import EntryRuns, EntrySections
+from git_timesheet.collector import collect_time_entries, collect_entry_runs, partition_by_author
+from git_timesheet.async_collector import collect_entry_runs_async
+from git_timesheet.formatters import format_timesheet, build_timesheet, iter_author_timesheets
+
+def entry(timestamp, repo, message='Fix login bug', author_name='Test User'):
+    """Create a time entry at a Unix timestamp"""
+    return TimeEntry.from_timestamp(timestamp, 0, repo, message, f'{timestamp:07x}', 30, author_name,
+                                    'test@example.com')
+
+@pytest.fixture
+def repo_runs():
+    """Entries of three repositories, each sorted by date, with ties between them"""
+    return [
+        [entry(1699000000, 'repo1'), entry(1699003600, 'repo1'), entry(1699600000, 'repo1')],
+        [entry(1698900000, 'repo2'), entry(1699003600, 'repo2', 'Add feature')],
+        [entry(1699003600 + 86400 * 30, 'repo3', 'Update docs')],
+    ]
+
+class TestEntryRuns:
+    """Test merging per-repository runs of entries"""
+
+    @pytest.mark.parametrize('memory_budget', [None, 1])
+    def test_merge_matches_stable_sort(self, repo_runs, memory_budget):
+        """Test that merged runs, in memory or spilled, are in the order of a stable sort by date"""
+        expected = sorted([entry for run in repo_runs for entry in run], key=attrgetter('timestamp'))
+        with EntryRuns(memory_budget) as runs:
+            for run in repo_runs:
+                runs.add(run)
+            assert runs.spilled == (len(repo_runs) if memory_budget else 0)
+            assert len(runs) == len(expected)
+            assert list(runs.merged()) == expected
+
+    def test_spilled_runs_hold_no_files_open(self, repo_runs):
+        """Test that spilled runs open their files only while a chunk is read"""
+        with EntryRuns(1) as runs:
+            for run in repo_runs:
+                runs.add(run)
+            assert not any(hasattr(run, 'file') for run in runs.runs)
+            merged = runs.merged()
+            next(merged)
+            assert len(list(merged)) == len(runs) - 1
+        assert not any(os.path.exists(run.path) for run in runs.runs)
+
+    def test_unsorted_run(self, repo_runs):
+        """Test that a run out of date order is sorted when added"""
+        with EntryRuns() as runs:
+            runs.add(list(reversed(repo_runs[0])))
+            assert list(runs.merged()) == repo_runs[0]
+
+    @pytest.mark.parametrize('output_format', ['text', 'csv', 'markdown', 'json', 'ndjson'])
+    @pytest.mark.parametrize('timezone_str', ['UTC', 'US/Eastern'])
+    def test_streamed_timesheet_matches_list(self, repo_runs, output_format, timezone_str):
+        """Test that formatting the merged stream gives the timesheet of the sorted list"""
+        time_entries = sorted([entry for run in repo_runs for entry in run], key=attrgetter('timestamp'))
+        with EntryRuns(1) as runs:
+            for run in repo_runs:
+                runs.add(run)
+            assert format_timesheet(runs.merged(), output_format, timezone_str, 'test') == \
+                format_timesheet(time_entries, output_format, timezone_str, 'test')
+
+    def test_streamed_messages(self, repo_runs):
+        """Test the messages for empty streams and streams without the author"""
+        assert build_timesheet(iter([]), 'UTC', 'test').message == \
+            "No git activity found in the specified time period."
+        assert build_timesheet(iter(repo_runs[0]), 'UTC', 'nobody').message == \
+            "No git activity found for the specified author in the given time period."
+
+    def test_collect_entry_runs(self, temp_git_repos):
+        """Test collecting repositories into runs that merge like the collected entries"""
+        base_dir, repo_dirs = temp_git_repos
+
+        runs, skipped = asyncio.run(collect_entry_runs_async(repo_dirs, jobs=2, memory_budget=1))
+        with runs:
+            expected = sorted(collect_time_entries(repo_dirs), key=attrgetter('timestamp'))
+            assert list(runs.merged()) == expected
+            assert skipped == []
+
+    def test_collect_entry_runs_serially(self, temp_git_repos):
+        """Test that collecting on the calling thread gives the runs of the concurrent collector"""
+        base_dir, repo_dirs = temp_git_repos
+        names = []
+
+        runs, skipped = collect_entry_runs(repo_dirs, progress=names.append, memory_budget=1)
+        with runs:
+            expected = sorted(collect_time_entries(repo_dirs), key=attrgetter('timestamp'))
+            assert list(runs.merged()) == expected
+            assert skipped == []
+            assert names == ['repo1', 'repo2']
+
+class TestEntrySections:
+    """Test splitting a merged stream into spilled sections"""
+
+    @pytest.mark.parametrize('authors', [None, ['Test', 'Other', 'nobody']])
+    @pytest.mark.parametrize('output_format', ['text', 'csv', 'ndjson'])
+    def test_sections_match_lists(self, repo_runs, authors, output_format):
+        """Test that spilled sections render the team timesheet of list sections"""
+        repo_runs[1] = [entry(e.timestamp, e.repo, e.message, 'Other User') for e in repo_runs[1]]
+        time_entries = sorted([entry for run in repo_runs for entry in run], key=attrgetter('timestamp'))
+        expected = list(iter_author_timesheets(partition_by_author(time_entries, authors), output_format))
+
+        with EntrySections(1) as sections:
+            spilled = partition_by_author(iter(time_entries), authors, sections)
+            assert sections.spilled > 0
+            assert [list(entries) for author, entries, author_filter in spilled] == \
+                [entries for author, entries, author_filter in partition_by_author(time_entries, authors)]
+            assert list(iter_author_timesheets(spilled, output_format)) == expected
+
+    def test_sections_in_memory(self, repo_runs):
+        """Test that sections within the budget are not spilled"""
+        with EntrySections(10 ** 6) as sections:
+            section = sections.section()
+            for time_entry in repo_runs[0]:
+                section.append(time_entry)
+            assert sections.spilled == 0
+            assert list(section) == repo_runs[0]
+            assert len(section) == len(repo_runs[0])
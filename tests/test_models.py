@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import sys
+import os
+import pytest
+from datetime import datetime
+import pytz
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from git_timesheet.models import TimeEntry
+from git_timesheet.formatters import format_timesheet
+
+class TestTimeEntry:
+    """Test the slotted time entry type"""
+
+    @pytest.fixture
+    def entry(self):
+        """Create a sample time entry"""
+        return TimeEntry(datetime(2023, 6, 1, 10, 0, 0, tzinfo=pytz.UTC), 'test-repo', 'Fix login bug',
+                         'abc1234', 30, 'Test Author', 'test@example.com')
+
+    def test_dict_compatible(self, entry):
+        """Test that entries can be used like the dictionaries they replace"""
+        assert entry['minutes'] == 30
+        assert entry.get('repo') == 'test-repo'
+        assert entry.get('missing', 'default') == 'default'
+        assert 'author_email' in entry
+        assert dict(entry) == {
+            'date': datetime(2023, 6, 1, 10, 0, 0, tzinfo=pytz.UTC),
+            'repo': 'test-repo',
+            'message': 'Fix login bug',
+            'commit': 'abc1234',
+            'minutes': 30,
+            'author_name': 'Test Author',
+            'author_email': 'test@example.com'
+        }
+        assert entry == dict(entry)
+
+        entry['minutes'] = 45
+        assert entry.minutes == 45
+        with pytest.raises(KeyError):
+            entry['unknown']
+
+    def test_compact(self, entry):
+        """Test that entries have no per-instance dict and share interned strings"""
+        assert not hasattr(entry, '__dict__')
+
+        other = TimeEntry.from_mapping(dict(entry), repo=''.join(['test', '-repo']))
+        assert other.repo is entry.repo
+        assert other == entry
+
+    def test_format_does_not_mutate(self, entry):
+        """Test that formatting does not convert the caller's dates in place"""
+        original_date = entry.date
+
+        format_timesheet([entry], 'text', 'US/Eastern', 'test')
+        assert entry.date is original_date
+
+    def test_from_timestamp(self, entry):
+        """Test that entries made from a timestamp build their date only when read"""
+        other = TimeEntry.from_timestamp(1685613600, -14400, 'test-repo', 'Fix login bug', 'abc1234', 30,
+                                         'Test Author', 'test@example.com')
+        assert other._date is None
+        assert other.timestamp == entry.timestamp
+        assert other.date == entry.date
+        assert other.date.isoformat() == '2023-06-01T06:00:00-04:00'
+        assert other.replace(minutes=45).utc_offset == -14400
+
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+import sys
+import os
+import io
+import json
+import time
+import pytest
+from unittest.mock import patch
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from operator import attrgetter
+from git_timesheet.profiling import Profiler, stage, timed_iter
+from git_timesheet.collector import collect_time_entries
+from git_timesheet.formatters import build_timesheet, iter_rollup
+
+class TestProfiling:
+    """Test per-stage timing instrumentation"""
+
+    def test_nested_stages_are_exclusive(self):
+        """Test that an outer stage is not charged for time spent in nested stages"""
+        profiler = Profiler()
+        with profiler.stage('outer'):
+            with profiler.stage('inner') as timing:
+                time.sleep(0.05)
+                timing.items = 3
+
+        stages = profiler.summary()['stages']
+        assert stages['inner']['wall'] >= 0.05
+        assert stages['outer']['wall'] < 0.05
+        assert stages['inner']['items'] == 3
+        assert stages['inner']['calls'] == 1
+
+    def test_disabled_stage(self):
+        """Test that stage() without a profiler does nothing"""
+        with stage(None, 'anything') as timing:
+            timing.items = 10
+
+    def test_collection_records_repositories(self, temp_git_repos):
+        """Test that per-repository stages are recorded during collection"""
+        base_dir, repo_dirs = temp_git_repos
+        profiler = Profiler()
+
+        collect_time_entries(repo_dirs, jobs=2, profiler=profiler)
+
+        summary = profiler.summary()
+        assert summary['stages']['git_log']['calls'] == 2
+        assert summary['stages']['estimate']['items'] == 2
+        assert set(summary['repositories']) == set(repo_dirs)
+        assert summary['repositories'][repo_dirs[0]]['git_log']['items'] == 1
+
+    def test_timed_iter_is_exclusive(self):
+        """Test that a lazy stage is charged only for producing its items, not for what pulls them"""
+        def slow_items():
+            for i in range(3):
+                time.sleep(0.01)
+                yield i
+
+        profiler = Profiler()
+        with profiler.stage('consume'):
+            for _ in timed_iter(profiler, 'produce', slow_items()):
+                time.sleep(0.01)
+
+        stages = profiler.summary()['stages']
+        assert stages['produce']['items'] == 3
+        assert stages['produce']['calls'] == 1
+        assert stages['produce']['wall'] >= 0.03
+        # Without the produce time, which would bring it to 0.06s
+        assert 0.03 <= stages['consume']['wall'] < 0.055
+        assert timed_iter(None, 'produce', [1]) == [1]
+
+    @pytest.mark.parametrize('streamed', [False, True])
+    def test_timesheet_stages(self, temp_git_repos, streamed):
+        """Test that the timezone and group stages are recorded for lists and for streamed entries"""
+        base_dir, repo_dirs = temp_git_repos
+        time_entries = sorted(collect_time_entries(repo_dirs), key=attrgetter('timestamp'))
+        profiler = Profiler()
+
+        rollup = build_timesheet(iter(time_entries) if streamed else time_entries, 'US/Eastern', 'test',
+                                 profiler=profiler)
+        list(iter_rollup(rollup, 'csv'))
+
+        stages = profiler.summary()['stages']
+        assert stages['timezone']['items'] == len(time_entries)
+        assert stages['group']['items'] >= 1
+
+    def test_write_json(self, tmp_path):
+        """Test writing the summary to a file and to stderr"""
+        profiler = Profiler()
+        with profiler.stage('discovery'):
+            pass
+
+        path = tmp_path / 'profile.json'
+        profiler.write_json(str(path))
+        assert 'discovery' in json.loads(path.read_text())['stages']
+
+        with patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            profiler.write_json()
+        assert 'discovery' in json.loads(stderr.getvalue())['stages']
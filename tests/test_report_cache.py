@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+import sys
+import os
+import io
+import pytest
+import subprocess
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.conftest import commit
+from git_timesheet.report_cache import (report_fingerprint, load_report, write_report, storing_report, prune_reports,
+                                        get_report_dir)
+from git_timesheet.formatters import write_lines
+
+INPUTS = {'since': '2023-06-01', 'until': None, 'author': 'Test', 'format': 'text'}
+
+class TestReportCache:
+    """Test storing rendered reports by their inputs and the repositories' refs"""
+
+    def test_fingerprint(self, temp_git_repos):
+        """Test that the fingerprint changes with the inputs, the repositories and their branches"""
+        _, repo_dirs = temp_git_repos
+        fingerprint = report_fingerprint(repo_dirs, INPUTS)
+
+        assert report_fingerprint(repo_dirs, dict(INPUTS)) == fingerprint
+        assert report_fingerprint(repo_dirs, dict(INPUTS, format='csv')) != fingerprint
+        assert report_fingerprint(repo_dirs[:1], INPUTS) != fingerprint
+
+        subprocess.run(['git', 'commit', '--allow-empty', '-m', 'Fix bug'], cwd=repo_dirs[1], check=True,
+                       capture_output=True)
+        assert report_fingerprint(repo_dirs, INPUTS) != fingerprint
+
+    def test_store_and_load(self, tmp_path):
+        """Test that a report is written through to the sink and read back exactly"""
+        lines = ['Week of 2023-05-29', 'Fix bug | 0.50', '']
+        sink = io.StringIO()
+
+        count = storing_report(lambda out: write_lines(lines, out), 'abc', [], cache_dir=tmp_path)(sink)
+
+        assert count == 3
+        body = load_report('abc', cache_dir=tmp_path)
+        assert body == sink.getvalue() == '\n'.join(lines)
+        replay = io.StringIO()
+        assert write_report(body, replay) == count
+        assert replay.getvalue() == body
+        assert load_report('missing', cache_dir=tmp_path) is None
+
+    def test_empty_report(self, tmp_path):
+        """Test that a report without lines is stored and counts no lines, as NDJSON without records"""
+        storing_report(lambda out: write_lines([], out), 'empty', [], cache_dir=tmp_path)(io.StringIO())
+        assert write_report(load_report('empty', cache_dir=tmp_path), io.StringIO()) == 0
+
+    def test_failed_render_not_stored(self, tmp_path):
+        """Test that nothing is stored when rendering fails part way"""
+        def write(out):
+            out.write('partial')
+            raise RuntimeError('render failed')
+
+        with pytest.raises(RuntimeError):
+            storing_report(write, 'broken', [], cache_dir=tmp_path)(io.StringIO())
+        assert load_report('broken', cache_dir=tmp_path) is None
+        assert not get_report_dir(tmp_path).exists()
+
+    def test_date_range_bounds(self, temp_git_repo, tmp_path):
+        """Test that a report is reused only while the resolved dates select the same commits"""
+        commit(temp_git_repo, 'Fix bug', 1685613600)
+        commit(temp_git_repo, 'Add feature', 1685700000)
+        date_range = (1685613600 + 3600, 1685700000)
+
+        storing_report(lambda out: write_lines(['report'], out), 'dated', [temp_git_repo], date_range,
+                       cache_dir=tmp_path)(io.StringIO())
+
+        # Moving since up to the next commit, or until up to just before the one after it, selects the same commits
+        assert load_report('dated', (1685613601, 1685700000), tmp_path) == 'report'
+        assert load_report('dated', (1685700000, 1685700000 + 86400), tmp_path) == 'report'
+        assert load_report('dated', (1685613600, 1685700000), tmp_path) is None
+        assert load_report('dated', (1685700001, 1685700000), tmp_path) is None
+        assert load_report('dated', (1685613601, 1685699999), tmp_path) is None
+
+    def test_date_range_bounds_skewed_history(self, temp_git_repo, tmp_path):
+        """Test that since bounds follow git's walk, which stops at a line's first older commit"""
+        commit(temp_git_repo, 'Fix bug', 1578657600)       # 2020-01-10
+        commit(temp_git_repo, 'Add feature', 1577880000)   # 2020-01-01
+        commit(temp_git_repo, 'Update docs', 1579521600)   # 2020-01-20
+
+        storing_report(lambda out: write_lines(['report'], out), 'skewed', [temp_git_repo], (1578182400, None),
+                       cache_dir=tmp_path)(io.StringIO())
+
+        # The walk shows only the 2020-01-20 commit for any since after 2020-01-01, passing the one dated 2020-01-10
+        assert load_report('skewed', (1579000000, None), tmp_path) == 'report'
+        assert load_report('skewed', (1579521601, None), tmp_path) is None
+        assert load_report('skewed', (1577880000, None), tmp_path) is None
+
+    def test_prune(self, tmp_path):
+        """Test that only the most recently used reports are kept"""
+        for i in range(5):
+            storing_report(lambda out: write_lines([f'report {i}'], out), f'r{i}', [], cache_dir=tmp_path)(io.StringIO())
+            os.utime(get_report_dir(tmp_path) / f'r{i}.txt', ns=(i * 10 ** 9, i * 10 ** 9))
+
+        prune_reports(tmp_path, max_reports=2)
+
+        assert sorted(path.name for path in get_report_dir(tmp_path).iterdir()) == ['r3.txt', 'r4.txt']
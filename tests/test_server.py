@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+import time
+import pytest
+import threading
+import http.client
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.conftest import commit
+from git_timesheet.collector import collect_time_entries
+from git_timesheet.formatters import format_timesheet
+from git_timesheet.server import ReportService, TimesheetServer
+
+def expected_timesheet(repos, output_format='text', timezone_str='UTC', author='test'):
+    """Format the repositories' entries the way ggts generate does"""
+    time_entries = sorted(collect_time_entries(repos, author=author), key=lambda entry: entry.date)
+    return format_timesheet(time_entries, output_format, timezone_str, author) + '\n'
+
+@pytest.fixture
+def server(temp_git_repos):
+    """A report server for the test repositories on a free local port"""
+    base_dir, repo_dirs = temp_git_repos
+    server = TimesheetServer(('127.0.0.1', 0), ReportService(repo_dirs, author='test'))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def request(server, path, headers=None, method='GET'):
+    """Send a request to the server and return the response and its body"""
+    conn = http.client.HTTPConnection(*server.server_address[:2])
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+    finally:
+        conn.close()
+
+class TestReportService:
+    """Test rendering and caching reports for request parameters"""
+
+    @pytest.mark.parametrize('output_format', ['text', 'csv', 'markdown', 'json'])
+    def test_report_matches_generate(self, temp_git_repos, output_format):
+        """Test that served reports are identical to ggts generate"""
+        base_dir, repo_dirs = temp_git_repos
+        service = ReportService(repo_dirs, author='test')
+
+        report = service.get(output_format, timezone_str='US/Eastern')
+        assert report.body.decode('utf-8') == expected_timesheet(repo_dirs, output_format, 'US/Eastern')
+
+    def test_cached_until_refs_change(self, temp_git_repos):
+        """Test that a report is rendered again only after a commit"""
+        base_dir, repo_dirs = temp_git_repos
+        service = ReportService(repo_dirs, author='test')
+
+        report = service.get('csv')
+        assert service.get('csv') is report
+        assert service.renders == 1
+
+        commit(repo_dirs[0], 'Fix cache bug', '2023-11-06T10:00:00+0000')
+        changed = service.get('csv')
+        assert service.renders == 2
+        assert changed.etag != report.etag
+        assert changed.body.decode('utf-8') == expected_timesheet(repo_dirs, 'csv')
+
+    @pytest.mark.parametrize('use_cache', [True, False])
+    def test_relative_dates(self, temp_git_repos, tmp_path, monkeypatch, use_cache):
+        """Test that a relative date resolving to a later time reuses the report while it selects the same commits"""
+        base_dir, repo_dirs = temp_git_repos
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+        commit(repo_dirs[0], 'Fix bug', '2023-06-01T10:00:00+0000')
+        commit(repo_dirs[0], 'Add feature', '2023-06-02T10:00:00+0000')
+        resolved = iter([(1685613600 - 3600, None), (1685613600 - 3540, None), (1685613600 + 1, None)])
+        monkeypatch.setattr('git_timesheet.server.resolve_date_range', lambda *args: next(resolved))
+        service = ReportService(repo_dirs, author='test', use_cache=use_cache)
+
+        report = service.get('csv', since='2 weeks ago')
+        # A minute later the range still starts between the same two commits, unless only the range itself is known
+        assert service.get('csv', since='2 weeks ago') is report or not use_cache
+        assert service.renders == (1 if use_cache else 2)
+        service.get('csv', since='2 weeks ago')
+        assert service.renders == (2 if use_cache else 3)
+        assert service.render_locks == {}
+
+    def test_one_render_at_a_time(self, temp_git_repos):
+        """Test that a request arriving while others wait for a render waits too, even for uncached reports"""
+        base_dir, repo_dirs = temp_git_repos
+        service = ReportService(repo_dirs, author='test')
+        render = service.render
+        started, release = threading.Semaphore(0), threading.Semaphore(0)
+        rendering, overlaps = [], []
+
+        def slow_render(*args):
+            rendering.append(1)
+            overlaps.append(len(rendering))
+            started.release()
+            release.acquire()
+            report, complete = render(*args)
+            rendering.pop()
+            # An incomplete report is not cached, so every request renders it
+            return report, False
+
+        service.render = slow_render
+        threads = [threading.Thread(target=service.get, args=('csv',)) for _ in range(3)]
+        threads[0].start()
+        started.acquire()
+        threads[1].start()
+        while next(iter(service.render_locks.values()))[1] < 2:
+            time.sleep(0.01)
+        # The first render ends while the second request waits; a third arrives during the second render
+        release.release()
+        started.acquire()
+        threads[2].start()
+        while next(iter(service.render_locks.values()))[1] < 2:
+            time.sleep(0.01)
+        release.release()
+        started.acquire()
+        release.release()
+        for thread in threads:
+            thread.join()
+        assert service.renders == 3
+        assert overlaps == [1, 1, 1]
+        assert service.render_locks == {}
+
+    def test_parameters(self, temp_git_repos):
+        """Test selecting repositories and rejecting unknown formats and repositories"""
+        base_dir, repo_dirs = temp_git_repos
+        service = ReportService(repo_dirs, author='test')
+
+        report = service.get('md', repos=['repo2'])
+        assert report.body.decode('utf-8') == expected_timesheet(repo_dirs[1:], 'markdown')
+        with pytest.raises(ValueError):
+            service.get('html')
+        with pytest.raises(ValueError):
+            service.get(repos=['missing'])
+
+class TestServer:
+    """Test the HTTP interface of the report server"""
+
+    def test_conditional_requests(self, server):
+        """Test ETags and 304 responses for unchanged reports"""
+        response, body = request(server, '/timesheet.json')
+        assert response.status == 200
+        assert response.getheader('Content-Type') == 'application/json; charset=utf-8'
+        assert json.loads(body)
+        etag = response.getheader('ETag')
+
+        response, body = request(server, '/timesheet?format=json', {'If-None-Match': etag})
+        assert response.status == 304
+        assert body == b''
+
+        response, body = request(server, '/timesheet?format=json&timezone=US/Eastern', {'If-None-Match': etag})
+        assert response.status == 200
+
+    def test_head_and_errors(self, server):
+        """Test HEAD requests and the responses for bad requests and unknown paths"""
+        response, body = request(server, '/timesheet.csv', method='HEAD')
+        assert response.status == 200
+        assert int(response.getheader('Content-Length')) > 0
+        assert body == b''
+
+        assert request(server, '/timesheet?format=html')[0].status == 400
+        assert request(server, '/timesheet?session_timeout=soon')[0].status == 400
+        assert request(server, '/timesheet.html')[0].status == 404
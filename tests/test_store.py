@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import sys
+import os
+import pytest
+from datetime import datetime
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.conftest import commit
+from git_timesheet.collector import collect_time_entries
+from git_timesheet.formatters import format_timesheet
+from git_timesheet.timezone_utils import get_timezone
+from git_timesheet.store import connect, ingest, iter_report, offset_intervals, resolve_report_range
+
+@pytest.fixture
+def store_repos(temp_git_repos):
+    """Two repositories with interleaved authors around the end of US daylight saving time"""
+    base_dir, repo_dirs = temp_git_repos
+    for repo, offset in zip(repo_dirs, ['-0400', '+0530']):
+        commit(repo, 'Fix login bug', f'2023-11-04T22:30:00{offset}')
+        commit(repo, 'Add feature flags', '2023-11-05T05:50:00+0000', name='Other Dev', email='other@example.com')
+        commit(repo, 'Fix login bug again', '2023-11-05T06:20:00+0000')
+        commit(repo, 'Refactor session handling', '2023-11-05T06:50:00+0000')
+        commit(repo, 'Update docs', '2023-11-06T09:00:00-0500', name='Other Dev', email='other@example.com')
+    return repo_dirs
+
+@pytest.fixture
+def store(tmp_path, store_repos):
+    """A commit store holding the test repositories"""
+    conn = connect(tmp_path / 'timesheet.db')
+    for repo in store_repos:
+        ingest(conn, repo, collect_time_entries([repo], by_author=True))
+    yield conn
+    conn.close()
+
+class TestStore:
+    """Test the SQLite commit store and reports aggregated from it"""
+
+    @pytest.mark.parametrize('output_format', ['text', 'csv', 'markdown', 'ndjson'])
+    @pytest.mark.parametrize('timezone_str', ['UTC', 'US/Eastern', 'Asia/Kolkata'])
+    def test_report_matches_formatter(self, store, store_repos, output_format, timezone_str):
+        """Test that SQL-aggregated reports are identical to formatting the entries"""
+        time_entries = sorted(collect_time_entries(store_repos, by_author=True), key=lambda entry: entry.date)
+        for author in ['test', 'Other', '']:
+            expected = format_timesheet(time_entries, output_format, timezone_str, author)
+            assert '\n'.join(iter_report(store, output_format, timezone_str, author)) == expected
+
+    def test_by_author_matches_author_filter(self, store_repos):
+        """Test that per-author estimation matches collecting a single author"""
+        by_author = collect_time_entries(store_repos, by_author=True)
+        assert [entry for entry in by_author if entry.author_name == 'Other Dev'] == \
+            collect_time_entries(store_repos, author='Other Dev')
+
+    def test_reingest_replaces_repository(self, store, store_repos):
+        """Test that ingesting a repository again replaces its commits"""
+        commit(store_repos[0], 'Later work', '2023-11-07T10:00:00+0000')
+        ingest(store, store_repos[0], collect_time_entries([store_repos[0]], by_author=True))
+
+        assert store.execute('SELECT COUNT(*) FROM commits').fetchone()[0] == 13
+
+    def test_empty_reports(self, store):
+        """Test the messages for no commits in range and no matching author"""
+        assert list(iter_report(store, author_filter='', since=2000000000)) == \
+            ["No git activity found in the specified time period."]
+        assert list(iter_report(store, author_filter='nobody')) == \
+            ["No git activity found for the specified author in the given time period."]
+
+    def test_offset_intervals(self):
+        """Test that UTC offset changes are located to the second"""
+        start = int(datetime(2023, 11, 1).timestamp())
+        intervals = offset_intervals(get_timezone('US/Eastern'), start, start + 10 * 86400)
+
+        assert [interval[2:] for interval in intervals] == [(-4 * 3600, 'EDT'), (-5 * 3600, 'EST')]
+        assert intervals[0][1] == intervals[1][0] == int(datetime.fromisoformat('2023-11-05T06:00:00+00:00').timestamp())
+
+    def test_resolve_report_range(self, store):
+        """Test reading report dates in the report timezone"""
+        since, until = resolve_report_range(store, '2023-11-05', '2023-11-05', 'US/Eastern')
+
+        assert since == int(datetime.fromisoformat('2023-11-05T04:00:00+00:00').timestamp())
+        assert until == int(datetime.fromisoformat('2023-11-06T04:59:59+00:00').timestamp())
+
+        # Other dates are resolved by git in a stored repository
+        since, until = resolve_report_range(store, '2 weeks ago')
+        assert abs(since - (datetime.now().timestamp() - 14 * 86400)) < 60
+        assert until is None
+
+    def test_resolve_report_range_without_repository(self, tmp_path):
+        """Test that relative dates need a stored repository to be resolved"""
+        conn = connect(tmp_path / 'empty.db')
+        with pytest.raises(ValueError):
+            resolve_report_range(conn, '2 weeks ago')
+        conn.close()
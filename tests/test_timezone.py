@@ -3,11 +3,12 @@ import sys
 import os
 import pytest
 from datetime import datetime
+from unittest.mock import patch
 import pytz
 
 # Add parent directory to path to import the module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from git_timesheet.timezone_utils import convert_to_timezone, get_timezone_abbr
+from git_timesheet.timezone_utils import convert_to_timezone, get_timezone, get_timezone_abbr
 
 class TestTimezoneHandling:
     """Test timezone conversion and abbreviation functions"""
@@ -70,4 +71,26 @@ class TestTimezoneHandling:
         
         # UTC
         dt_utc = datetime(2023, 6, 1, 12, 0, 0, tzinfo=pytz.UTC)
-        assert get_timezone_abbr(dt_utc) == 'UTC'
\ No newline at end of file
+        assert get_timezone_abbr(dt_utc) == 'UTC'
+    
+    def test_timezone_resolved_once(self):
+        """Test that timezone resolution is cached across conversions"""
+        get_timezone.cache_clear()
+        dt_utc = datetime(2023, 6, 1, 12, 0, 0, tzinfo=pytz.UTC)
+        
+        with patch('pytz.timezone', wraps=pytz.timezone) as mock_timezone:
+            for _ in range(5):
+                convert_to_timezone(dt_utc, 'US/Pacific')
+            assert mock_timezone.call_count == 1
+    
+    def test_zoneinfo_backend(self):
+        """Test the zoneinfo backend gives the same local times and abbreviations as pytz"""
+        pytest.importorskip('zoneinfo')
+        dates = [datetime(2023, 1, 1, 12, 0, 0, tzinfo=pytz.UTC),
+                 datetime(2023, 6, 1, 12, 0, 0, tzinfo=pytz.UTC)]
+        
+        with_pytz = [convert_to_timezone(date, 'EST') for date in dates]
+        with_zoneinfo = [convert_to_timezone(date, 'EST', backend='zoneinfo') for date in dates]
+        
+        assert [d.strftime('%Y-%m-%d %H:%M') for d in with_zoneinfo] == [d.strftime('%Y-%m-%d %H:%M') for d in with_pytz]
+        assert [get_timezone_abbr(d) for d in with_zoneinfo] == ['EST', 'EDT']
\ No newline at end of file
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import sys
+import os
+import pytest
+import subprocess
+from datetime import date
+
+# Add parent directory to path to import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.conftest import commit
+from git_timesheet.collector import collect_time_entries
+from git_timesheet.formatters import format_timesheet
+from git_timesheet.watcher import TimesheetWatcher, find_git_dirs, ref_signature
+
+def expected_timesheet(repos, output_format='text', timezone_str='UTC', author='test'):
+    """Format the repositories' entries the way ggts generate does"""
+    time_entries = sorted(collect_time_entries(repos, author=author), key=lambda entry: entry.date)
+    return format_timesheet(time_entries, output_format, timezone_str, author)
+
+class TestWatcher:
+    """Test watch mode's change detection and incremental aggregates"""
+
+    @pytest.mark.parametrize('output_format', ['text', 'csv', 'markdown'])
+    def test_updates_match_generate(self, temp_git_repos, output_format):
+        """Test that the timesheet matches a full run after each incremental update"""
+        base_dir, repo_dirs = temp_git_repos
+        watcher = TimesheetWatcher(repo_dirs, author='test', timezone_str='US/Eastern')
+
+        assert watcher.poll() == repo_dirs
+        assert '\n'.join(watcher.iter_timesheet(output_format)) == \
+            expected_timesheet(repo_dirs, output_format, 'US/Eastern')
+        assert watcher.poll() == []
+        # Outputs in several formats share the rollup until the next update
+        rollup = watcher.current_rollup()
+        assert watcher.current_rollup() is rollup
+
+        commit(repo_dirs[1], 'Fix watch bug', '2023-11-05T05:30:00+0000')
+        commit(repo_dirs[1], 'Add feature', '2023-11-05T06:10:00+0000')
+        assert watcher.poll() == [repo_dirs[1]]
+        assert watcher.current_rollup() is not rollup
+        # Only the week the new commits fall on is totalled again
+        kept = {id(week) for week in rollup.weeks}
+        updated = [week for week in watcher.current_rollup().weeks if id(week) not in kept]
+        assert [week.week_start for week in updated] == ['2023-10-30']
+        assert '\n'.join(watcher.iter_timesheet(output_format)) == \
+            expected_timesheet(repo_dirs, output_format, 'US/Eastern')
+
+        # Moving HEAD back drops the commits again
+        subprocess.run(['git', 'reset', '-q', '--hard', 'HEAD~2'], cwd=repo_dirs[1], check=True)
+        assert watcher.poll() == [repo_dirs[1]]
+        assert '\n'.join(watcher.iter_timesheet(output_format)) == \
+            expected_timesheet(repo_dirs, output_format, 'US/Eastern')
+        assert date(2023, 11, 5).toordinal() not in watcher.weeks.get(date(2023, 10, 30).toordinal(), {})
+
+    def test_empty_messages(self, temp_git_repos):
+        """Test the messages for no activity and no activity by the author"""
+        base_dir, repo_dirs = temp_git_repos
+        # git log matches the author as a regular expression, the timesheet as a substring
+        watcher = TimesheetWatcher(repo_dirs, author='^Test')
+        watcher.poll()
+        assert list(watcher.iter_timesheet()) == \
+            ["No git activity found for the specified author in the given time period."]
+
+        watcher = TimesheetWatcher(repo_dirs, since='2000-01-01', until='2000-01-02')
+        watcher.poll()
+        assert list(watcher.iter_timesheet()) == ["No git activity found in the specified time period."]
+
+    def test_packed_refs(self, temp_git_repo):
+        """Test that packing refs and committing on a packed branch are detected"""
+        git_dirs = find_git_dirs(temp_git_repo)
+        before = ref_signature(*git_dirs)
+        subprocess.run(['git', 'pack-refs', '--all'], cwd=temp_git_repo, check=True)
+        packed = ref_signature(*git_dirs)
+        assert packed != before
+
+        commit(temp_git_repo, 'Another commit', '2023-11-06T10:00:00+0000')
+        assert ref_signature(*git_dirs) != packed
+
+    def test_worktree_git_dirs(self, temp_git_repo, tmp_path):
+        """Test finding the refs of a linked worktree"""
+        worktree = str(tmp_path / 'worktree')
+        subprocess.run(['git', 'worktree', 'add', '-q', '-b', 'side', worktree], cwd=temp_git_repo, check=True)
+
+        git_dir, common_dir = find_git_dirs(worktree)
+        assert os.path.samefile(common_dir, os.path.join(temp_git_repo, '.git'))
+        assert os.path.isfile(os.path.join(git_dir, 'HEAD'))
+
+        before = ref_signature(git_dir, common_dir)
+        commit(worktree, 'Work on side', '2023-11-06T10:00:00+0000')
+        assert ref_signature(git_dir, common_dir) != before